@@ -0,0 +1,85 @@
+"""Compare kubernetes model deserialization with the raw-JSON fast path.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_pod_parsing --pods 10000 --repeat 3
+
+Prints one JSON document with the best wall time per strategy.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'devops_platform.settings')
+django.setup()
+
+from kubernetes import client  # noqa: E402
+from k8s_management.k8s_client import KubernetesClient  # noqa: E402
+from k8s_management.tests.fixtures import make_pod_list  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+def models(body: bytes):
+    pod_list = client.ApiClient().deserialize(_Response(body.decode()), 'V1PodList')
+    return [KubernetesClient._pod_to_dict(pod) for pod in pod_list.items]
+
+
+def raw_json(body: bytes):
+    return [KubernetesClient._pod_from_json(pod) for pod in json.loads(body)['items']]
+
+
+def raw_orjson(body: bytes):
+    return [KubernetesClient._pod_from_json(pod) for pod in orjson.loads(body)['items']]
+
+
+def best_of(func, body: bytes, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func(body)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pods', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    body = json.dumps(make_pod_list(args.pods)).encode()
+    strategies = {'models': models, 'raw_json': raw_json}
+    if orjson is not None:
+        strategies['raw_orjson'] = raw_orjson
+    
+    baseline = models(body)
+    results = {}
+    for name, func in strategies.items():
+        if func(body) != baseline:
+            sys.exit(f'{name} produced different output than the model path')
+        results[name] = {'seconds': round(best_of(func, body, args.repeat), 4)}
+    for name, result in results.items():
+        result['speedup'] = round(results['models']['seconds'] / result['seconds'], 2)
+    
+    json.dump({'benchmark': 'pod_parsing', 'pods': args.pods, 'body_bytes': len(body),
+               'results': results}, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Benchmark the Kubernetes sync path against the fake API server.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_sync --scales 1000,10000,100000
+    python -m benchmarks.bench_sync --scales 10000 --database sqlite,postgres --watch
+
+Each scale runs in a worker process of its own, against a fake API server
+process serving that many pods (plus a node per 100 pods, a namespace per 500
+pods, and a Deployment, ReplicaSet and Service per 10 pods), so the reported
+peak RSS is that of the sync alone. The worker times:
+
+- ``initial``: a full sync into an empty database,
+- ``unchanged``: a resync that finds nothing to write,
+- ``churn``: a resync after --churn of the pods were restarted or replaced,
+- ``watch`` (with --watch): a pods informer receiving the same churn as watch
+  events, and the flush that writes it.
+
+Every scenario reports wall time, objects per second, database queries and
+phase timings (as recorded for real sync runs), API requests, bytes received
+and the worker's peak RSS so far. Prints one JSON document.
+
+SQLite runs use a scratch database file per worker; Postgres runs use the
+database configured by PGHOST/DB_HOST and friends. The API rate limit and
+WebSocket push are disabled unless K8S_API_QPS / K8S_PUSH_ENABLED are set;
+--raw-json turns on K8S_RAW_JSON_LISTING.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.request import Request, urlopen
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'devops_platform.settings')
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from k8s_management.models import Cluster  # noqa: E402
+from k8s_management.informers import Informer, InformerStore, ModelDeltaWriter  # noqa: E402
+from k8s_management.instrumentation import SyncRecorder  # noqa: E402
+from k8s_management.k8s_client import KubernetesClient  # noqa: E402
+from k8s_management.registry import RESOURCE_KINDS  # noqa: E402
+from k8s_management.sync import sync_cluster  # noqa: E402
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes (ru_maxrss is in KiB on Linux)"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def measure(func, *args):
+    """Run ``func`` under a SyncRecorder; returns its result and the recorded figures"""
+    recorder = SyncRecorder()
+    with recorder.activate():
+        result = func(*args)
+    summary = recorder.summary()
+    objects = sum(recorder.object_counts.values())
+    return result, {
+        'seconds': summary['duration'],
+        'objects': objects,
+        'objects_per_second': round(objects / summary['duration'], 1) if summary['duration'] else None,
+        'queries': summary['query_count'],
+        'queries_by_phase': summary['queries'],
+        'phases': summary['phases'],
+        'api_requests': summary['api_requests'],
+        'bytes_received': summary['bytes_received'],
+        'peak_rss_bytes': peak_rss(),
+    }
+
+
+def churn(server_url: str, fraction: float) -> dict:
+    request = Request(f'{server_url}/fake/churn?fraction={fraction}', data=b'', method='POST')
+    with urlopen(request) as response:
+        return json.load(response)
+
+
+def watch_scenario(cluster: Cluster, k8s_client: KubernetesClient, server_url: str, fraction: float) -> dict:
+    """Time a pods informer from churn to the flushed database rows"""
+    kind = RESOURCE_KINDS['pods']
+    store = InformerStore(kind.key_fields)
+    writer = ModelDeltaWriter(cluster, 'pods')
+    informer = Informer(k8s_client, 'pods', store, writer, watch_timeout=60)
+    informer.start()
+    try:
+        while not informer.has_synced:
+            time.sleep(0.05)
+        writer.flush()
+        
+        started = time.perf_counter()
+        churned = churn(server_url, fraction)
+        # A replaced pod is two events (DELETED, ADDED)
+        events = churned['pods'] + churned['pods'] // 2
+        target = int(churned['resourceVersion'])
+        while int(informer.resource_version) < target:
+            time.sleep(0.005)
+        delivered = time.perf_counter() - started
+        
+        _, flush = measure(writer.flush)
+        seconds = delivered + flush['seconds']
+        return {
+            'events': events,
+            'delivery_seconds': round(delivered, 6),
+            'seconds': round(seconds, 6),
+            'events_per_second': round(events / seconds, 1) if seconds else None,
+            'flush': {name: flush[name] for name in ('seconds', 'queries', 'queries_by_phase', 'phases')},
+            'peak_rss_bytes': peak_rss(),
+        }
+    finally:
+        informer.stop()
+
+
+def run_worker(args) -> dict:
+    """One scale: start the fake server, run the scenarios, return their figures"""
+    nodes = args.nodes or max(args.pods // 100, 1)
+    namespaces = args.namespaces or max(args.pods // 500, 1)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'k8s_management.tests.fake_apiserver', '--pods', str(args.pods), '--nodes', str(nodes),
+         '--namespaces', str(namespaces), '--no-metrics'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        server_url = server.stdout.readline().strip()
+        if not server_url:
+            raise RuntimeError('The fake API server did not start')
+        
+        call_command('migrate', verbosity=0)
+        Cluster.objects.filter(name=f'bench-sync-{args.pods}').delete()
+        cluster = Cluster(name=f'bench-sync-{args.pods}')
+        cluster.api_server_url = server_url
+        cluster.set_kubeconfig(f'apiVersion: v1\nkind: Config\n'
+                               f'clusters: [{{name: fake, cluster: {{server: "{server_url}"}}}}]\n'
+                               'users: [{name: fake, user: {token: fake-token}}]\n'
+                               'contexts: [{name: fake, context: {cluster: fake, user: fake}}]\n'
+                               'current-context: fake\n')
+        cluster.save()
+        
+        try:
+            k8s_client = KubernetesClient(cluster)
+            scenarios = {}
+            _, scenarios['initial'] = measure(sync_cluster, cluster, k8s_client)
+            _, scenarios['unchanged'] = measure(sync_cluster, cluster, k8s_client)
+            churned = churn(server_url, args.churn)['pods']
+            result, scenarios['churn'] = measure(sync_cluster, cluster, k8s_client)
+            scenarios['churn'].update(churned_pods=churned, changes=result['changes']['pods'])
+            if args.watch:
+                scenarios['watch'] = watch_scenario(cluster, k8s_client, server_url, args.churn)
+        finally:
+            if connection.vendor != 'sqlite':
+                cluster.delete()
+        
+        return {
+            'database': connection.vendor,
+            'pods': args.pods,
+            'nodes': nodes,
+            'namespaces': namespaces,
+            'raw_json': k8s_client.raw_json,
+            'scenarios': scenarios,
+        }
+    finally:
+        server.stdin.close()
+        server.wait(timeout=30)
+
+
+def worker_env(database: str, scratch: str, pods: int, raw_json: bool) -> dict:
+    env = dict(os.environ)
+    env.setdefault('K8S_API_QPS', '0')
+    env.setdefault('K8S_PUSH_ENABLED', 'False')
+    if raw_json:
+        env['K8S_RAW_JSON_LISTING'] = 'True'
+    if database == 'sqlite':
+        env.pop('PGHOST', None)
+        env.pop('DB_HOST', None)
+        env['SQLITE_PATH'] = os.path.join(scratch, f'bench-{pods}.sqlite3')
+    elif not (env.get('PGHOST') or env.get('DB_HOST')):
+        sys.exit('--database postgres needs PGHOST or DB_HOST (and the other connection variables)')
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='1000,10000,100000', help='comma-separated pod counts')
+    parser.add_argument('--database', default='sqlite', help='comma-separated: sqlite, postgres')
+    parser.add_argument('--nodes', type=int, help='default: one per 100 pods')
+    parser.add_argument('--namespaces', type=int, help='default: one per 500 pods')
+    parser.add_argument('--churn', type=float, default=0.01, help='fraction of the pods changed')
+    parser.add_argument('--watch', action='store_true', help='also time the pods informer')
+    parser.add_argument('--raw-json', action='store_true', help='list without building client models')
+    parser.add_argument('--output', help='write the JSON document to this file too')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--pods', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+    
+    scratch = tempfile.mkdtemp(prefix='bench-sync-')
+    results = []
+    try:
+        for database in args.database.split(','):
+            for pods in (int(scale) for scale in args.scales.split(',')):
+                command = [sys.executable, '-m', 'benchmarks.bench_sync', '--worker', '--pods', str(pods),
+                           '--churn', str(args.churn)]
+                command += ['--nodes', str(args.nodes)] if args.nodes else []
+                command += ['--namespaces', str(args.namespaces)] if args.namespaces else []
+                command += ['--watch'] if args.watch else []
+                worker = subprocess.run(command, env=worker_env(database, scratch, pods, args.raw_json),
+                                        stdout=subprocess.PIPE, text=True)
+                if worker.returncode:
+                    results.append({'database': database, 'pods': pods, 'error': f'exit {worker.returncode}'})
+                else:
+                    results.append(json.loads(worker.stdout.strip().splitlines()[-1]))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    
+    document = json.dumps({'benchmark': 'sync', 'churn': args.churn, 'results': results}, indent=2)
+    print(document)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(document + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Time the metrics-server usage collector against the fake API server.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_usage --nodes 100 --pods 10000
+
+Syncs the fake cluster once, then runs the collector twice (first run writes
+every row, second run finds nothing changed) and prints one JSON document
+with wall times and query counts. Runs against a scratch SQLite database,
+migrated on start and removed on exit, never the configured one.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import django
+
+# Point the settings at a scratch database before they are loaded
+SCRATCH = tempfile.mkdtemp(prefix='bench-usage-')
+os.environ.pop('PGHOST', None)
+os.environ.pop('DB_HOST', None)
+os.environ['SQLITE_PATH'] = os.path.join(SCRATCH, 'bench-usage.sqlite3')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'devops_platform.settings')
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from k8s_management.models import Cluster  # noqa: E402
+from k8s_management.k8s_client import KubernetesClient  # noqa: E402
+from k8s_management.sync import sync_cluster  # noqa: E402
+from k8s_management.usage import collect_cluster_usage  # noqa: E402
+from k8s_management.tests.fake_apiserver import FakeApiServer  # noqa: E402
+
+
+def timed(func, *args):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+    return result, {'seconds': round(elapsed, 3), 'queries': len(queries.captured_queries)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=100)
+    parser.add_argument('--pods', type=int, default=10000)
+    args = parser.parse_args()
+    
+    call_command('migrate', verbosity=0)
+    server = FakeApiServer(nodes=args.nodes, pods=args.pods).start()
+    cluster = Cluster(name='bench-usage')
+    cluster.api_server_url = server.url
+    cluster.set_kubeconfig(server.kubeconfig())
+    cluster.save()
+    
+    try:
+        k8s_client = KubernetesClient(cluster)
+        k8s_client.raw_json = True
+        _, sync = timed(sync_cluster, cluster, k8s_client)
+        first_result, first = timed(collect_cluster_usage, cluster, k8s_client)
+        _, second = timed(collect_cluster_usage, cluster, k8s_client)
+        print(json.dumps({
+            'nodes': args.nodes,
+            'pods': args.pods,
+            'sync': sync,
+            'collect': {**first, 'updated_pods': first_result['updated_pods']},
+            'collect_unchanged': second,
+        }, indent=2))
+    finally:
+        server.stop()
+        shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,13 +8,14 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'devops_platform.settings')
 
 django_asgi_app = get_asgi_application()
 
-from ssh_terminal.routing import websocket_urlpatterns
+from ssh_terminal.routing import websocket_urlpatterns as ssh_websocket_urlpatterns
+from k8s_management.routing import websocket_urlpatterns as k8s_websocket_urlpatterns
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
         AuthMiddlewareStack(
-            URLRouter(websocket_urlpatterns)
+            URLRouter(ssh_websocket_urlpatterns + k8s_websocket_urlpatterns)
         )
     ),
 })
@@ -82,7 +82,7 @@ else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
         }
     }
 
@@ -150,6 +150,28 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'schedule-cluster-syncs': {
+        'task': 'k8s_management.tasks.schedule_cluster_syncs',
+        'schedule': float(os.environ.get('K8S_SYNC_SCHEDULER_INTERVAL', '15')),
+    },
+    'schedule-usage-collection': {
+        'task': 'k8s_management.tasks.schedule_usage_collection',
+        'schedule': float(os.environ.get('K8S_USAGE_INTERVAL', '15')),
+    },
+    'rollup-usage-history': {
+        'task': 'k8s_management.tasks.rollup_usage_history',
+        'schedule': float(os.environ.get('K8S_USAGE_ROLLUP_INTERVAL', '300')),
+    },
+    'prune-tombstones': {
+        'task': 'k8s_management.tasks.prune_tombstones_task',
+        'schedule': 3600.0,
+    },
+    'prune-sync-runs': {
+        'task': 'k8s_management.tasks.prune_sync_runs',
+        'schedule': 3600.0,
+    },
+}
 
 # Channels Configuration - Use Redis if available, otherwise in-memory
 if os.environ.get('REDIS_HOST') or os.environ.get('REDIS_URL'):
@@ -170,3 +192,74 @@ else:
 
 # Encryption key for sensitive data
 ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY', 'your-encryption-key-change-in-production')
+
+# Kubernetes client
+K8S_CLIENT_CACHE_SIZE = int(os.environ.get('K8S_CLIENT_CACHE_SIZE', '64'))
+K8S_CLIENT_CACHE_TTL = int(os.environ.get('K8S_CLIENT_CACHE_TTL', '900'))
+K8S_LIST_PAGE_SIZE = int(os.environ.get('K8S_LIST_PAGE_SIZE', '500'))
+K8S_RAW_JSON_LISTING = os.environ.get('K8S_RAW_JSON_LISTING', 'False') == 'True'
+K8S_SYNC_BATCH_SIZE = int(os.environ.get('K8S_SYNC_BATCH_SIZE', '1000'))
+
+# Per-cluster Kubernetes API request policy (token bucket, retries, circuit breaker)
+K8S_API_QPS = float(os.environ.get('K8S_API_QPS', '20'))
+K8S_API_BURST = int(os.environ.get('K8S_API_BURST', '40'))
+K8S_API_MAX_RETRIES = int(os.environ.get('K8S_API_MAX_RETRIES', '3'))
+K8S_API_BACKOFF_BASE = float(os.environ.get('K8S_API_BACKOFF_BASE', '0.5'))
+K8S_API_BACKOFF_MAX = float(os.environ.get('K8S_API_BACKOFF_MAX', '30'))
+K8S_API_BREAKER_THRESHOLD = int(os.environ.get('K8S_API_BREAKER_THRESHOLD', '5'))
+K8S_API_BREAKER_RESET = int(os.environ.get('K8S_API_BREAKER_RESET', '60'))
+
+# Background cluster sync
+K8S_SYNC_INTERVAL = int(os.environ.get('K8S_SYNC_INTERVAL', '60'))
+K8S_SYNC_JITTER = int(os.environ.get('K8S_SYNC_JITTER', '10'))
+K8S_SYNC_MAX_CONCURRENT = int(os.environ.get('K8S_SYNC_MAX_CONCURRENT', '10'))
+K8S_SYNC_MAX_BACKOFF = int(os.environ.get('K8S_SYNC_MAX_BACKOFF', '1800'))
+K8S_SYNC_TIMEOUT = int(os.environ.get('K8S_SYNC_TIMEOUT', '900'))
+# Clusters with at least K8S_SYNC_SHARD_MIN_PODS pods are synced in K8S_SYNC_SHARDS
+# namespace shards (Celery chord); 1 disables sharding
+K8S_SYNC_SHARDS = int(os.environ.get('K8S_SYNC_SHARDS', '1'))
+K8S_SYNC_SHARD_MIN_PODS = int(os.environ.get('K8S_SYNC_SHARD_MIN_PODS', '50000'))
+K8S_SYNC_SHARD_RETRIES = int(os.environ.get('K8S_SYNC_SHARD_RETRIES', '3'))
+# Sync run timings (ClusterSyncRun) are kept this long (seconds)
+K8S_SYNC_RUN_RETENTION = int(os.environ.get('K8S_SYNC_RUN_RETENTION', str(7 * 86400)))
+
+# Node/pod usage from metrics-server, refreshed more often than the full sync
+K8S_USAGE_INTERVAL = int(os.environ.get('K8S_USAGE_INTERVAL', '15'))
+
+# Usage history: 1m samples rolled up into 1h and 1d tiers, retention in seconds
+K8S_USAGE_HISTORY = os.environ.get('K8S_USAGE_HISTORY', 'True') == 'True'
+K8S_USAGE_RETENTION_1M = int(os.environ.get('K8S_USAGE_RETENTION_1M', str(2 * 86400)))
+K8S_USAGE_RETENTION_1H = int(os.environ.get('K8S_USAGE_RETENTION_1H', str(30 * 86400)))
+K8S_USAGE_RETENTION_1D = int(os.environ.get('K8S_USAGE_RETENTION_1D', str(365 * 86400)))
+
+# Tombstones of deleted objects are kept this long (seconds) for ?since= change feeds
+K8S_TOMBSTONE_RETENTION = int(os.environ.get('K8S_TOMBSTONE_RETENTION', str(86400)))
+# Objects and tombstones per ?since= page (the most a client may ask for with ?limit=)
+K8S_CHANGES_PAGE_SIZE = int(os.environ.get('K8S_CHANGES_PAGE_SIZE', '1000'))
+
+# WebSocket push of synced changes (ws/kubernetes/updates/)
+K8S_PUSH_ENABLED = os.environ.get('K8S_PUSH_ENABLED', 'True') == 'True'
+K8S_PUSH_BATCH_SIZE = int(os.environ.get('K8S_PUSH_BATCH_SIZE', '500'))
+K8S_PUSH_COALESCE = float(os.environ.get('K8S_PUSH_COALESCE', '0.5'))
+K8S_PUSH_MAX_PENDING = int(os.environ.get('K8S_PUSH_MAX_PENDING', '5000'))
+
+# Pod log streaming (ws/kubernetes/clusters/<id>/namespaces/<ns>/logs/): lines buffered per
+# socket before the overflow policy (drop or slowdown) applies, containers per socket and
+# per process (each container is read by a thread)
+K8S_LOG_BUFFER_LINES = int(os.environ.get('K8S_LOG_BUFFER_LINES', '1000'))
+K8S_LOG_OVERFLOW = os.environ.get('K8S_LOG_OVERFLOW', 'drop')
+K8S_LOG_MAX_STREAMS = int(os.environ.get('K8S_LOG_MAX_STREAMS', '5'))
+K8S_LOG_MAX_STREAMS_TOTAL = int(os.environ.get('K8S_LOG_MAX_STREAMS_TOTAL', '200'))
+K8S_LOG_MAX_LINE_BYTES = int(os.environ.get('K8S_LOG_MAX_LINE_BYTES', '16384'))
+K8S_LOG_BATCH_LINES = int(os.environ.get('K8S_LOG_BATCH_LINES', '200'))
+K8S_LOG_FLUSH_INTERVAL = float(os.environ.get('K8S_LOG_FLUSH_INTERVAL', '0.1'))
+
+# Pod exec terminals (ws/kubernetes/clusters/<id>/namespaces/<ns>/pods/<pod>/exec/): output
+# buffered per terminal before the pod socket stops being read, input left unread by the
+# pod before the terminal is closed
+K8S_EXEC_MAX_PENDING_BYTES = int(os.environ.get('K8S_EXEC_MAX_PENDING_BYTES', '1048576'))
+K8S_EXEC_MAX_INPUT_BYTES = int(os.environ.get('K8S_EXEC_MAX_INPUT_BYTES', '1048576'))
+
+# Fleet-wide (all clusters) operations
+K8S_FLEET_CONCURRENCY = int(os.environ.get('K8S_FLEET_CONCURRENCY', '20'))
+K8S_FLEET_TIMEOUT = int(os.environ.get('K8S_FLEET_TIMEOUT', '10'))
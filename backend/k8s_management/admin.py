@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cluster, Node, Pod, Deployment, Service
+from .models import Cluster, ClusterSyncRun, Node, Pod, Deployment, ReplicaSet, Service
 
 
 @admin.register(Cluster)
@@ -31,8 +31,23 @@ class DeploymentAdmin(admin.ModelAdmin):
     search_fields = ['name', 'namespace', 'cluster__name']
 
 
+@admin.register(ReplicaSet)
+class ReplicaSetAdmin(admin.ModelAdmin):
+    list_display = ['name', 'cluster', 'namespace', 'replicas', 'ready_replicas', 'owner_name']
+    list_filter = ['cluster', 'namespace']
+    search_fields = ['name', 'namespace', 'owner_name', 'cluster__name']
+
+
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
     list_display = ['name', 'cluster', 'namespace', 'service_type', 'cluster_ip']
     list_filter = ['service_type', 'cluster', 'namespace']
     search_fields = ['name', 'namespace', 'cluster__name']
+
+
+@admin.register(ClusterSyncRun)
+class ClusterSyncRunAdmin(admin.ModelAdmin):
+    list_display = ['cluster', 'mode', 'status', 'started_at', 'duration', 'query_count', 'api_requests',
+                    'bytes_received']
+    list_filter = ['status', 'mode', 'cluster']
+    search_fields = ['cluster__name', 'error']
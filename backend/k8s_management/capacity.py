@@ -0,0 +1,86 @@
+from collections import defaultdict
+from typing import Dict, Iterable
+from django.db.models import Count, Sum
+from .models import Node, Pod
+
+NODE_TOTALS = {
+    'nodes': Count('id'),
+    'cpu_capacity_millicores': Sum('cpu_capacity_millicores'),
+    'memory_capacity_bytes': Sum('memory_capacity_bytes'),
+    'cpu_allocatable_millicores': Sum('cpu_allocatable_millicores'),
+    'memory_allocatable_bytes': Sum('memory_allocatable_bytes'),
+}
+
+POD_TOTALS = {
+    'pods': Count('id'),
+    'cpu_request_millicores': Sum('cpu_request_millicores'),
+    'memory_request_bytes': Sum('memory_request_bytes'),
+    'cpu_usage_millicores': Sum('cpu_usage_millicores'),
+    'memory_usage_bytes': Sum('memory_usage_bytes'),
+}
+
+
+def _empty(*aggregates: Dict) -> Dict:
+    return {name: 0 for totals in aggregates for name in totals}
+
+
+def _add(target: Dict, values: Dict):
+    for name, value in values.items():
+        target[name] += value or 0
+
+
+def cluster_capacity(cluster) -> Dict:
+    """Allocatable, requested and used resources of one cluster.
+    
+    Totals are grouped by node role and by namespace. Every figure is a
+    database aggregate over the parsed quantity columns, so the cost is a
+    handful of grouped queries regardless of the number of nodes and pods.
+    """
+    nodes = Node.objects.filter(cluster=cluster)
+    pods = Pod.objects.filter(cluster=cluster).exclude(status__in=['succeeded', 'failed'])
+    
+    totals = _empty(NODE_TOTALS, POD_TOTALS)
+    _add(totals, nodes.aggregate(**NODE_TOTALS))
+    _add(totals, pods.aggregate(**POD_TOTALS))
+    
+    by_role = defaultdict(lambda: _empty(NODE_TOTALS, POD_TOTALS))
+    for row in nodes.values('role').annotate(**NODE_TOTALS).order_by():
+        _add(by_role[row.pop('role') or 'unknown'], row)
+    
+    # Pods reference their node by name; fold the per-node sums into roles
+    roles = dict(nodes.values_list('name', 'role'))
+    for row in pods.exclude(node='').values('node').annotate(**POD_TOTALS).order_by():
+        _add(by_role[roles.get(row.pop('node')) or 'unknown'], row)
+    
+    by_namespace = {}
+    for row in pods.values('namespace').annotate(**POD_TOTALS).order_by('namespace'):
+        namespace = row.pop('namespace')
+        by_namespace[namespace] = {name: value or 0 for name, value in row.items()}
+    
+    return {
+        'cluster': cluster.pk,
+        'name': cluster.name,
+        'totals': totals,
+        'by_role': dict(by_role),
+        'by_namespace': by_namespace,
+    }
+
+
+def fleet_capacity(clusters: Iterable) -> Dict:
+    """Capacity totals of every cluster, two grouped queries for the whole fleet"""
+    clusters = list(clusters)
+    ids = [cluster.pk for cluster in clusters]
+    
+    results = {cluster.pk: {'cluster': cluster.pk, 'name': cluster.name,
+                            **_empty(NODE_TOTALS, POD_TOTALS)} for cluster in clusters}
+    for row in Node.objects.filter(cluster_id__in=ids).values('cluster').annotate(**NODE_TOTALS).order_by():
+        _add(results[row.pop('cluster')], row)
+    for row in (Pod.objects.filter(cluster_id__in=ids).exclude(status__in=['succeeded', 'failed'])
+                .values('cluster').annotate(**POD_TOTALS).order_by()):
+        _add(results[row.pop('cluster')], row)
+    
+    fleet = _empty(NODE_TOTALS, POD_TOTALS)
+    for entry in results.values():
+        _add(fleet, {name: entry[name] for name in fleet})
+    
+    return {'totals': fleet, 'clusters': list(results.values())}
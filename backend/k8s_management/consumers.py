@@ -0,0 +1,549 @@
+import json
+import asyncio
+import codecs
+import ssl
+from collections import deque
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from django.conf import settings
+from kubernetes.stream.ws_client import ERROR_CHANNEL, RESIZE_CHANNEL, STDIN_CHANNEL
+from websocket import ABNF
+from .models import Cluster
+from .k8s_client import get_kubernetes_client
+from .logs import (OVERFLOW_POLICIES, LogBuffer, LogStream, compile_grep, release_streams, reserve_streams,
+                   resolve_log_targets)
+from .push import group_name
+from .registry import RESOURCE_KINDS
+from .revisions import current_revision
+
+
+class ClusterUpdatesConsumer(AsyncWebsocketConsumer):
+    """Pushes the changes of synced objects to the browser.
+
+    Clients subscribe with ``{"type": "subscribe", "cluster": 1, "kinds":
+    ["pods"], "namespaces": ["default"]}`` (all kinds and namespaces when
+    omitted) and unsubscribe the same way. Incoming changes are coalesced per
+    object for K8S_PUSH_COALESCE seconds and sent as a single ``changes``
+    frame, so a burst of updates costs a handful of frames. A subscription
+    that falls more than K8S_PUSH_MAX_PENDING objects behind gets a
+    ``resync`` entry instead, telling the client to catch up with ``?since=``.
+    """
+    
+    async def connect(self):
+        self.subscriptions = {}
+        self.pending = {}
+        self.flush_task = None
+        
+        if not self.scope['user'].is_authenticated:
+            await self.close()
+            return
+        
+        await self.accept()
+    
+    async def disconnect(self, close_code):
+        if self.flush_task:
+            self.flush_task.cancel()
+        for cluster_id, kind in list(self.subscriptions):
+            await self.channel_layer.group_discard(group_name(cluster_id, kind), self.channel_name)
+        self.subscriptions = {}
+    
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+            
+            if data.get('type') == 'subscribe':
+                await self.subscribe(data)
+            elif data.get('type') == 'unsubscribe':
+                await self.unsubscribe(data)
+            else:
+                raise ValueError(f"Unknown message type: {data.get('type')}")
+        
+        except Exception as e:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': str(e)
+            }))
+    
+    def _parse(self, data):
+        kinds = data.get('kinds') or list(RESOURCE_KINDS)
+        unknown = [kind for kind in kinds if kind not in RESOURCE_KINDS]
+        if unknown:
+            raise ValueError(f"Unknown kinds: {', '.join(unknown)}")
+        return int(data['cluster']), kinds
+    
+    async def subscribe(self, data):
+        cluster_id, kinds = self._parse(data)
+        if not await self.cluster_exists(cluster_id):
+            raise ValueError(f'Cluster {cluster_id} not found')
+        
+        namespaces = set(data.get('namespaces') or ()) or None
+        for kind in kinds:
+            if (cluster_id, kind) not in self.subscriptions:
+                await self.channel_layer.group_add(group_name(cluster_id, kind), self.channel_name)
+            self.subscriptions[(cluster_id, kind)] = namespaces
+        
+        # Changes after this revision are pushed; fetch the ones before with ?since=
+        await self.send(text_data=json.dumps({
+            'type': 'subscribed',
+            'cluster': cluster_id,
+            'kinds': kinds,
+            'namespaces': sorted(namespaces or ()),
+            'revision': await database_sync_to_async(current_revision)(cluster_id),
+        }))
+    
+    async def unsubscribe(self, data):
+        cluster_id, kinds = self._parse(data)
+        for kind in kinds:
+            if self.subscriptions.pop((cluster_id, kind), False) is not False:
+                await self.channel_layer.group_discard(group_name(cluster_id, kind), self.channel_name)
+            self.pending.pop((cluster_id, kind), None)
+        await self.send(text_data=json.dumps({'type': 'unsubscribed', 'cluster': cluster_id, 'kinds': kinds}))
+    
+    async def k8s_changes(self, event):
+        """Buffer a change message of the channel layer until the next flush"""
+        subscription = (event['cluster'], event['kind'])
+        if subscription not in self.subscriptions:
+            return
+        namespaces = self.subscriptions[subscription]
+        kind = RESOURCE_KINDS[event['kind']]
+        
+        buffer = self.pending.setdefault(subscription, {'revision': 0, 'objects': {}, 'overflow': False})
+        buffer['revision'] = max(buffer['revision'], event['revision'])
+        if not buffer['overflow']:
+            for deleted, objects in ((False, event['changed']), (True, event['deleted'])):
+                for obj in objects:
+                    if namespaces and kind.namespaced and obj['namespace'] not in namespaces:
+                        continue
+                    key = tuple(obj[field] for field in kind.key_fields)
+                    # Re-insert so the latest change of an object decides its position
+                    buffer['objects'].pop(key, None)
+                    buffer['objects'][key] = (deleted, obj)
+            
+            if len(buffer['objects']) > getattr(settings, 'K8S_PUSH_MAX_PENDING', 5000):
+                buffer['objects'] = {}
+                buffer['overflow'] = True
+        
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_later())
+    
+    async def flush_later(self):
+        await asyncio.sleep(getattr(settings, 'K8S_PUSH_COALESCE', 0.5))
+        self.flush_task = None
+        pending, self.pending = self.pending, {}
+        
+        changes = []
+        for (cluster_id, kind), buffer in pending.items():
+            entry = {'cluster': cluster_id, 'kind': kind, 'revision': buffer['revision']}
+            if buffer['overflow']:
+                changes.append({**entry, 'resync': True})
+            elif buffer['objects']:
+                changes.append({
+                    **entry,
+                    'changed': [obj for deleted, obj in buffer['objects'].values() if not deleted],
+                    'deleted': [obj for deleted, obj in buffer['objects'].values() if deleted],
+                })
+        
+        if changes:
+            await self.send(text_data=json.dumps({'type': 'changes', 'changes': changes}, default=str))
+    
+    @database_sync_to_async
+    def cluster_exists(self, cluster_id):
+        return Cluster.objects.filter(id=cluster_id).exists()
+
+
+class PodLogConsumer(AsyncWebsocketConsumer):
+    """Streams the logs of a pod, or of every pod matching a label selector, to the browser.
+
+    Connect to ``ws/kubernetes/clusters/<id>/namespaces/<ns>/logs/`` with
+    ``pod`` or ``selector``, and optionally ``container`` (default: all),
+    ``follow`` (default true), ``tailLines``, ``sinceSeconds``, ``grep``
+    (a substring matched server side, or a regular expression with
+    ``regex=true``), ``ignoreCase`` and ``overflow`` (``drop`` or
+    ``slowdown``) in the query string.
+
+    Every container is read by a LogStream thread into one bounded LogBuffer;
+    the lines of all of them are merged in arrival order and sent in ``logs``
+    frames of up to K8S_LOG_BATCH_LINES lines, each line tagged with its pod,
+    container and timestamp. Lost lines are reported in ``dropped`` frames,
+    finished containers in ``stream_end`` frames, and the socket is closed
+    after an ``end`` frame once every stream has finished.
+    """
+    
+    async def connect(self):
+        self.cluster_id = self.scope['url_route']['kwargs']['cluster_id']
+        self.namespace = self.scope['url_route']['kwargs']['namespace']
+        self.streams = []
+        self.buffer = None
+        self.send_task = None
+        
+        if not self.scope['user'].is_authenticated:
+            await self.close()
+            return
+        
+        await self.accept()
+        
+        try:
+            await self.start_streams(parse_qs(self.scope['query_string'].decode()))
+        except Exception as e:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': f'Log stream failed: {str(e)}'
+            }))
+            await self.close()
+    
+    async def disconnect(self, close_code):
+        self.stop_streams()
+        if self.send_task:
+            self.send_task.cancel()
+    
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+            
+            if data.get('type') == 'stop':
+                self.stop_streams()
+            else:
+                raise ValueError(f"Unknown message type: {data.get('type')}")
+        
+        except Exception as e:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': str(e)
+            }))
+    
+    async def start_streams(self, query):
+        def param(name, default=None):
+            return query.get(name, [default])[0]
+        
+        def number(name):
+            value = param(name)
+            return int(value) if value not in (None, '') else None
+        
+        overflow = param('overflow', getattr(settings, 'K8S_LOG_OVERFLOW', 'drop'))
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}")
+        grep = compile_grep(param('grep'), param('ignoreCase', 'false').lower() == 'true',
+                            param('regex', 'false').lower() == 'true')
+        follow = param('follow', 'true').lower() == 'true'
+        tail_lines, since_seconds = number('tailLines'), number('sinceSeconds')
+        
+        cluster = await self.get_cluster()
+        # Building a client parses the kubeconfig and resolving targets calls the API: keep both off the loop
+        k8s_client = await sync_to_async(get_kubernetes_client, thread_sensitive=False)(cluster)
+        targets = await sync_to_async(resolve_log_targets, thread_sensitive=False)(
+            k8s_client, self.namespace, param('pod'), param('selector'), param('container'))
+        if not targets:
+            raise ValueError('No matching pods or containers')
+        max_streams = getattr(settings, 'K8S_LOG_MAX_STREAMS', 5)
+        if len(targets) > max_streams:
+            raise ValueError(f'{len(targets)} containers match, at most {max_streams} can be streamed at once')
+        if not reserve_streams(len(targets)):
+            raise ValueError('Too many log streams are open on this server, try again later')
+        
+        self.buffer = LogBuffer(asyncio.get_running_loop(), getattr(settings, 'K8S_LOG_BUFFER_LINES', 1000),
+                                overflow)
+        self.streams = [LogStream(k8s_client, self.namespace, pod, container, self.buffer, follow=follow,
+                                  tail_lines=tail_lines, since_seconds=since_seconds, grep=grep)
+                        for pod, container in targets]
+        
+        try:
+            await self.send(text_data=json.dumps({
+                'type': 'connection',
+                'status': 'connected',
+                'streams': [{'pod': pod, 'container': container} for pod, container in targets],
+            }))
+        except BaseException:
+            # The streams never start, so they will not give their slots back
+            release_streams(len(targets))
+            raise
+        for stream in self.streams:
+            stream.start()
+        self.send_task = asyncio.create_task(self.send_logs())
+    
+    def stop_streams(self):
+        for stream in self.streams:
+            stream.stop()
+        if self.buffer:
+            self.buffer.close()
+    
+    async def send_logs(self):
+        """Drain the buffer into frames until every stream has ended"""
+        batch_lines = getattr(settings, 'K8S_LOG_BATCH_LINES', 200)
+        interval = getattr(settings, 'K8S_LOG_FLUSH_INTERVAL', 0.1)
+        running = len(self.streams)
+        
+        while running:
+            batch, dropped = await self.buffer.get_batch(batch_lines)
+            lines = [{'pod': pod, 'container': container, 'timestamp': timestamp, 'line': text}
+                     for kind, pod, container, timestamp, text in (item for item in batch if item[0] == 'line')]
+            if dropped:
+                await self.send(text_data=json.dumps({'type': 'dropped', 'count': dropped}))
+            if lines:
+                await self.send(text_data=json.dumps({'type': 'logs', 'lines': lines}))
+            for _, pod, container, error in (item for item in batch if item[0] == 'end'):
+                running -= 1
+                await self.send(text_data=json.dumps({
+                    'type': 'stream_end', 'pod': pod, 'container': container, 'error': error,
+                }))
+            if len(batch) < batch_lines // 2:
+                # Let a trickle of lines accumulate instead of sending a frame per line
+                await asyncio.sleep(interval)
+        
+        await self.send(text_data=json.dumps({'type': 'end'}))
+        await self.close()
+    
+    @database_sync_to_async
+    def get_cluster(self):
+        return Cluster.objects.get(id=self.cluster_id)
+
+
+# Prefer bash, fall back to sh
+DEFAULT_SHELL = ['/bin/sh', '-c', 'command -v bash >/dev/null 2>&1 && exec bash || exec sh']
+
+
+class PodExecConsumer(AsyncWebsocketConsumer):
+    """Browser terminal in a pod container, speaking the SSH terminal's message protocol.
+
+    Connect to ``ws/kubernetes/clusters/<id>/namespaces/<ns>/pods/<pod>/exec/``
+    with optional ``container``, ``command`` (repeat for each argument; a
+    shell by default) or ``attach=true`` in the query string, then exchange
+    ``command`` (stdin), ``resize`` and ``output`` messages as with
+    ``ws/ssh/<machine_id>/``.
+
+    The Kubernetes exec websocket is opened in a worker thread, then driven
+    from the event loop: its socket is registered with ``loop.add_reader``
+    and switched to non-blocking mode, so no thread is held and nothing polls
+    while a shell is idle. Output is queued for the browser; past
+    K8S_EXEC_MAX_PENDING_BYTES the socket stops being read until the browser
+    catches up. Input is framed into a per-session queue drained with
+    ``loop.add_writer`` whenever the socket accepts more; a session whose pod
+    leaves more than K8S_EXEC_MAX_INPUT_BYTES of it unread is closed.
+    """
+    
+    async def connect(self):
+        kwargs = self.scope['url_route']['kwargs']
+        self.cluster_id = kwargs['cluster_id']
+        self.namespace = kwargs['namespace']
+        self.pod = kwargs['pod']
+        self.ws_client = None
+        self.loop = None
+        self.fd = None
+        self.reading = False
+        self.writing = False
+        self.closed = False
+        self.input = deque()
+        self.input_bytes = 0
+        self.output = deque()
+        self.pending_bytes = 0
+        self.output_ready = asyncio.Event()
+        self.decoders = {}
+        self.send_task = None
+        
+        if not self.scope['user'].is_authenticated:
+            await self.close()
+            return
+        
+        await self.accept()
+        
+        try:
+            query = parse_qs(self.scope['query_string'].decode())
+            container = query.get('container', [None])[0]
+            attach = query.get('attach', ['false'])[0].lower() == 'true'
+            
+            cluster = await self.get_cluster()
+            k8s_client = await sync_to_async(get_kubernetes_client, thread_sensitive=False)(cluster)
+            self.ws_client = await sync_to_async(k8s_client.open_exec, thread_sensitive=False)(
+                self.namespace, self.pod, query.get('command') or DEFAULT_SHELL, container, attach=attach)
+            
+            await self.send(text_data=json.dumps({
+                'type': 'connection',
+                'status': 'connected',
+                'message': f"Connected to {self.pod}{f' ({container})' if container else ''}"
+            }))
+            
+            self.loop = asyncio.get_running_loop()
+            self.ws_client.sock.settimeout(0)
+            self.fd = self.ws_client.sock.sock.fileno()
+            self.send_task = asyncio.create_task(self.send_output())
+            self.resume_reading()
+        
+        except Exception as e:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': f'Connection failed: {str(e)}'
+            }))
+            await self.close()
+    
+    async def disconnect(self, close_code):
+        self.pause_reading()
+        self.stop_writing()
+        if self.send_task:
+            self.send_task.cancel()
+        if self.ws_client:
+            # timeout=0: send the close frame without waiting for the server's
+            self.ws_client.close(timeout=0)
+            self.ws_client = None
+    
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+            
+            if data.get('type') == 'command':
+                self.write(STDIN_CHANNEL, data.get('data', '').encode('utf-8'))
+            elif data.get('type') == 'resize':
+                cols = data.get('cols', 80)
+                rows = data.get('rows', 24)
+                self.write(RESIZE_CHANNEL, json.dumps({'Width': cols, 'Height': rows}).encode())
+        
+        except Exception as e:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': str(e)
+            }))
+    
+    def write(self, channel: int, data: bytes):
+        """Queue a frame for the pod and send as much of the queue as the socket takes now"""
+        if self.ws_client is None or self.closed:
+            return
+        frame = ABNF.create_frame(bytes([channel]) + data, ABNF.OPCODE_BINARY).format()
+        self.input.append(frame)
+        self.input_bytes += len(frame)
+        if self.input_bytes > getattr(settings, 'K8S_EXEC_MAX_INPUT_BYTES', 1048576):
+            self.finish('The pod is not reading its input, closing the session')
+            return
+        self.flush_input()
+    
+    def flush_input(self):
+        """Write queued frames without blocking (also the add_writer callback)"""
+        sock = self.ws_client.sock.sock if self.ws_client else None
+        while self.input and sock is not None and not self.closed:
+            try:
+                sent = sock.send(self.input[0])
+            except (BlockingIOError, ssl.SSLWantWriteError, ssl.SSLWantReadError):
+                # Come back when the socket is writable; the same bytes are retried as TLS requires
+                if not self.writing:
+                    self.writing = True
+                    self.loop.add_writer(self.fd, self.flush_input)
+                return
+            except OSError as e:
+                self.finish(f'Connection lost: {e}')
+                return
+            self.input_bytes -= sent
+            if sent < len(self.input[0]):
+                self.input[0] = self.input[0][sent:]
+            else:
+                self.input.popleft()
+        self.stop_writing()
+    
+    def stop_writing(self):
+        if self.writing:
+            self.writing = False
+            self.loop.remove_writer(self.fd)
+    
+    def resume_reading(self):
+        if not self.reading and not self.closed:
+            self.reading = True
+            self.loop.add_reader(self.fd, self.read_frames)
+            # Data may already sit in the TLS or frame buffers without the socket turning readable
+            self.loop.call_soon(self.read_frames)
+    
+    def pause_reading(self):
+        if self.reading:
+            self.reading = False
+            self.loop.remove_reader(self.fd)
+    
+    def read_frames(self):
+        """Read the frames available on the exec websocket without blocking (add_reader callback)"""
+        # A bounded number per call keeps one chatty shell from starving the others
+        for _ in range(64):
+            if not self.reading:
+                return
+            try:
+                opcode, frame = self.ws_client.sock.recv_data_frame(True)
+            except (BlockingIOError, ssl.SSLWantReadError):
+                # Partial frames stay buffered in the websocket client until the rest arrives
+                return
+            except Exception as e:
+                self.finish(None if self.closed else f'Connection lost: {e}')
+                return
+            
+            if opcode == ABNF.OPCODE_CLOSE:
+                self.finish(None)
+                return
+            if opcode in (ABNF.OPCODE_BINARY, ABNF.OPCODE_TEXT) and len(frame.data) > 1:
+                self.channel_data(frame.data[0], frame.data[1:])
+        # Budget used up: what is left may already be buffered, so come back on the next loop pass
+        self.loop.call_soon(self.read_frames)
+    
+    def channel_data(self, channel: int, data: bytes):
+        if channel == ERROR_CHANNEL:
+            # The exit status: {"status": "Success"} or a Failure with a message
+            status = json.loads(data)
+            self.finish(None if status.get('status') == 'Success' else status.get('message', 'Command failed'))
+            return
+        
+        # Incremental decoding keeps multi-byte characters split across frames intact
+        decoder = self.decoders.get(channel)
+        if decoder is None:
+            decoder = self.decoders[channel] = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        text = decoder.decode(data)
+        if text:
+            self.queue_output(('output', text), len(data))
+    
+    def queue_output(self, message: tuple, size: int = 0):
+        self.output.append(message)
+        self.pending_bytes += size
+        self.output_ready.set()
+        if self.pending_bytes > getattr(settings, 'K8S_EXEC_MAX_PENDING_BYTES', 1048576):
+            self.pause_reading()
+    
+    def finish(self, error):
+        """The session is over: stop reading and let the sender report it"""
+        if self.closed:
+            return
+        self.pause_reading()
+        self.stop_writing()
+        self.closed = True
+        self.input.clear()
+        if error:
+            self.queue_output(('error', error))
+        self.queue_output(('closed', None))
+    
+    async def send_output(self):
+        """Send queued output in as few messages as possible, in order"""
+        max_pending = getattr(settings, 'K8S_EXEC_MAX_PENDING_BYTES', 1048576)
+        while True:
+            await self.output_ready.wait()
+            self.output_ready.clear()
+            messages, self.output = self.output, deque()
+            self.pending_bytes = 0
+            
+            text = []
+            for kind, value in messages:
+                if kind == 'output':
+                    text.append(value)
+                    continue
+                if text:
+                    await self.send(text_data=json.dumps({'type': 'output', 'data': ''.join(text)}))
+                    text = []
+                if kind == 'error':
+                    await self.send(text_data=json.dumps({'type': 'error', 'message': value}))
+                elif kind == 'closed':
+                    await self.send(text_data=json.dumps({
+                        'type': 'connection',
+                        'status': 'disconnected',
+                        'message': 'Session ended'
+                    }))
+                    await self.close()
+                    return
+            if text:
+                await self.send(text_data=json.dumps({'type': 'output', 'data': ''.join(text)}))
+            
+            if not self.reading and not self.closed and self.pending_bytes < max_pending // 2:
+                self.resume_reading()
+    
+    @database_sync_to_async
+    def get_cluster(self):
+        return Cluster.objects.get(id=self.cluster_id)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable
+from django.conf import settings
+from django.db import connections
+from .models import Cluster
+from .k8s_client import get_kubernetes_client
+
+
+def _call(func: Callable, cluster: Cluster):
+    try:
+        return func(cluster)
+    finally:
+        # Worker threads open their own database connections
+        connections.close_all()
+
+
+async def _run_one(loop, executor, semaphore, func, cluster: Cluster, timeout: float) -> Dict:
+    async with semaphore:
+        started = time.monotonic()
+        entry = {'cluster': cluster.pk, 'name': cluster.name}
+        try:
+            result = await asyncio.wait_for(loop.run_in_executor(executor, _call, func, cluster), timeout)
+            entry.update(ok=True, result=result)
+        except asyncio.TimeoutError:
+            entry.update(ok=False, error=f'Timed out after {timeout}s')
+        except Exception as e:
+            entry.update(ok=False, error=str(e))
+        entry['duration'] = round(time.monotonic() - started, 3)
+        return entry
+
+
+async def run_fleet_async(clusters: Iterable[Cluster], func: Callable, timeout: float,
+                          concurrency: int) -> Dict:
+    """Run ``func(cluster)`` for every cluster concurrently.
+
+    At most ``concurrency`` calls are in flight and each one is abandoned after
+    ``timeout`` seconds, so the total latency stays close to the slowest
+    cluster. Failures and timeouts are reported per cluster next to the
+    successful results instead of failing the whole operation.
+    """
+    clusters = list(clusters)
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    # Calls that time out keep their worker thread until the underlying
+    # request returns, hence the executor is not shared between runs.
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(clusters))),
+                                  thread_name_prefix='fleet')
+    try:
+        results = await asyncio.gather(*(
+            _run_one(loop, executor, semaphore, func, cluster, timeout) for cluster in clusters
+        ))
+    finally:
+        executor.shutdown(wait=False)
+    
+    succeeded = sum(1 for entry in results if entry['ok'])
+    return {
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'duration': round(time.monotonic() - started, 3),
+        'results': results,
+    }
+
+
+def run_fleet(clusters: Iterable[Cluster], func: Callable, timeout: float, concurrency: int) -> Dict:
+    """Synchronous entry point for :func:`run_fleet_async`"""
+    return asyncio.run(run_fleet_async(clusters, func, timeout, concurrency))
+
+
+def check_cluster_health(cluster: Cluster) -> Dict:
+    """Connectivity check and version refresh for one cluster"""
+    request_timeout = getattr(settings, 'K8S_FLEET_TIMEOUT', 10)
+    k8s_client = get_kubernetes_client(cluster)
+    if not k8s_client.test_connection(request_timeout=request_timeout):
+        raise Exception('Failed to connect to cluster')
+    return {'version': k8s_client.get_cluster_version(request_timeout=request_timeout)}
+
@@ -0,0 +1,326 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+from .models import Cluster
+from .k8s_client import KubernetesClient, get_kubernetes_client
+from .labels import refresh_label_index
+from .inventory import refresh_inventory
+from .ownership import resolve_ownership
+from .reconcile import Reconciler, bulk_delete, bulk_upsert
+from .registry import RESOURCE_KINDS
+from .push import publish_changes
+from .revisions import reserve_revision
+
+logger = logging.getLogger(__name__)
+
+
+class InformerStore:
+    """Thread-safe in-memory store of converted objects keyed by their key fields.
+
+    ``indexers`` maps an index name to a function returning the index value for
+    an object (e.g. ``{'node': lambda pod: pod['node']}``), so lookups such as
+    "all pods on node X" do not scan the whole store.
+    """
+    
+    def __init__(self, key_fields, indexers: Optional[Dict[str, Callable]] = None):
+        self.key_fields = key_fields
+        self.indexers = indexers or {}
+        self._items = {}
+        self._indexes = {name: {} for name in self.indexers}
+        self._lock = threading.RLock()
+    
+    def key(self, obj: Dict) -> tuple:
+        return tuple(obj[field] for field in self.key_fields)
+    
+    def _index(self, key, obj):
+        for name, func in self.indexers.items():
+            self._indexes[name].setdefault(func(obj), set()).add(key)
+    
+    def _unindex(self, key, obj):
+        for name, func in self.indexers.items():
+            keys = self._indexes[name].get(func(obj))
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._indexes[name][func(obj)]
+    
+    def replace(self, objects: List[Dict]):
+        """Replace the whole store content (after a full list)"""
+        with self._lock:
+            self._items = {}
+            self._indexes = {name: {} for name in self.indexers}
+            for obj in objects:
+                key = self.key(obj)
+                self._items[key] = obj
+                self._index(key, obj)
+    
+    def upsert(self, obj: Dict):
+        with self._lock:
+            key = self.key(obj)
+            old = self._items.get(key)
+            if old is not None:
+                self._unindex(key, old)
+            self._items[key] = obj
+            self._index(key, obj)
+    
+    def delete(self, obj: Dict):
+        with self._lock:
+            key = self.key(obj)
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._unindex(key, old)
+    
+    def get(self, key: tuple) -> Optional[Dict]:
+        with self._lock:
+            return self._items.get(key)
+    
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return list(self._items.values())
+    
+    def by_index(self, name: str, value) -> List[Dict]:
+        with self._lock:
+            return [self._items[key] for key in self._indexes[name].get(value, ())]
+    
+    def __len__(self):
+        return len(self._items)
+
+
+class ModelDeltaWriter:
+    """Buffers informer deltas for one kind and writes them to the database in batches.
+
+    Deltas are coalesced by key, so an object modified many times between two
+    flushes is written once.
+    """
+    
+    def __init__(self, cluster: Cluster, kind: str):
+        resource = RESOURCE_KINDS[kind]
+        self.kind = resource
+        self.model = resource.model
+        self.key_fields = resource.key_fields
+        self.fields = resource.fields
+        self.row = resource.row_builder
+        self.cluster = cluster
+        self._pending = {}
+        self._replace = None
+        self._lock = threading.Lock()
+    
+    def upsert(self, key: tuple, obj: Dict):
+        with self._lock:
+            self._pending[key] = obj
+    
+    def delete(self, key: tuple):
+        with self._lock:
+            self._pending[key] = None
+    
+    def replace(self, objects: List[Dict]):
+        """Schedule a full reconciliation (after a (re)list)"""
+        with self._lock:
+            self._replace = objects
+            self._pending = {}
+    
+    def flush(self) -> bool:
+        """Write the buffered deltas; returns whether there was anything to write"""
+        with self._lock:
+            replace, pending = self._replace, self._pending
+            self._replace, self._pending = None, {}
+        if replace is None and not pending:
+            return False
+        
+        close_old_connections()
+        try:
+            with transaction.atomic():
+                changed = []
+                if replace is not None:
+                    reconciler = Reconciler(self.model, self.cluster, self.key_fields, self.fields)
+                    reconciler.apply(self.row(obj) for obj in replace)
+                    reconciler.finish()
+                    changed = reconciler.changed_keys
+                upserts = [self.row(obj) for obj in pending.values() if obj is not None]
+                deletes = [key for key, obj in pending.items() if obj is None]
+                revision = reserve_revision(self.cluster) if upserts or deletes else None
+                if upserts:
+                    bulk_upsert(self.model, self.cluster, upserts, self.key_fields, self.fields,
+                                revision=revision)
+                    changed += [key for key, obj in pending.items() if obj is not None]
+                refresh_label_index(self.kind, self.cluster, changed)
+                if deletes:
+                    bulk_delete(self.model, self.cluster, deletes, self.key_fields, revision=revision)
+                if revision is not None:
+                    publish_changes(self.model, self.cluster, revision, upserts, deletes)
+        except Exception:
+            # Put the deltas back (newer ones win) so the next flush retries them
+            with self._lock:
+                if self._replace is None:
+                    self._replace = replace
+                    self._pending = {**pending, **self._pending}
+            raise
+        return True
+
+
+class Informer(threading.Thread):
+    """List-then-watch loop for one resource kind of one cluster.
+
+    Does a single full list, then follows a watch stream from the list's
+    ``resourceVersion`` with bookmarks enabled, applying every event to the
+    store and the delta writer. A 410 Gone (expired resourceVersion) triggers
+    a fresh list.
+    """
+    
+    def __init__(self, k8s_client: KubernetesClient, kind: str, store: InformerStore,
+                 writer: ModelDeltaWriter, watch_timeout: int = 300):
+        super().__init__(name=f'informer-{k8s_client.cluster.pk}-{kind}', daemon=True)
+        api_attr, list_name, _, converter = KubernetesClient._FULL_LISTERS[kind]
+        self.list_method = getattr(getattr(k8s_client, api_attr), list_name)
+        self.convert = getattr(KubernetesClient, converter)
+        self.k8s_client = k8s_client
+        self.kind = kind
+        self.store = store
+        self.writer = writer
+        self.watch_timeout = watch_timeout
+        self.resource_version = None
+        self._watch = None
+        self._stopped = threading.Event()
+    
+    @property
+    def has_synced(self) -> bool:
+        return self.resource_version is not None
+    
+    def stop(self):
+        self._stopped.set()
+        if self._watch:
+            self._watch.stop()
+    
+    def _list(self):
+        objects = []
+        _continue = None
+        while True:
+            page = self.list_method(limit=self.k8s_client.page_size, _continue=_continue)
+            objects.extend(self.convert(item) for item in page.items)
+            _continue = page.metadata._continue
+            if not _continue:
+                break
+        self.store.replace(objects)
+        self.writer.replace(objects)
+        self.resource_version = page.metadata.resource_version
+    
+    def _watch_once(self):
+        self._watch = watch.Watch()
+        for event in self._watch.stream(self.list_method,
+                                        resource_version=self.resource_version,
+                                        allow_watch_bookmarks=True,
+                                        timeout_seconds=self.watch_timeout):
+            if self._stopped.is_set():
+                break
+            
+            if event['type'] == 'BOOKMARK':
+                # Bookmarks are left undecoded by the watch; only their resourceVersion matters
+                self.resource_version = event['raw_object']['metadata']['resourceVersion']
+                continue
+            
+            obj = event['object']
+            self.resource_version = obj.metadata.resource_version
+            data = self.convert(obj)
+            key = self.store.key(data)
+            if event['type'] == 'DELETED':
+                self.store.delete(data)
+                self.writer.delete(key)
+            else:
+                self.store.upsert(data)
+                self.writer.upsert(key, data)
+    
+    def run(self):
+        backoff = 1
+        while not self._stopped.is_set():
+            try:
+                if self.resource_version is None:
+                    self._list()
+                self._watch_once()
+                backoff = 1
+            except ApiException as e:
+                if e.status == 410:
+                    logger.info('%s: resourceVersion expired, re-listing', self.name)
+                    self.resource_version = None
+                    continue
+                logger.warning('%s: watch failed: %s', self.name, e)
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 60)
+            except Exception as e:
+                logger.warning('%s: watch failed: %s', self.name, e)
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 60)
+
+
+class ClusterInformers:
+    """Runs one informer per kind for a cluster and periodically flushes their deltas"""
+    
+    def __init__(self, cluster: Cluster, kinds=None, flush_interval: float = 2.0):
+        self.cluster = cluster
+        self.flush_interval = flush_interval
+        self.stores = {}
+        self.writers = {}
+        self.informers = []
+        self._counters = {}
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(name=f'informer-{cluster.pk}-flush',
+                                         target=self._flush_loop, daemon=True)
+        
+        k8s_client = get_kubernetes_client(cluster)
+        for kind in kinds or RESOURCE_KINDS:
+            key_fields = RESOURCE_KINDS[kind].key_fields
+            indexers = {'namespace': lambda obj: obj.get('namespace')}
+            if kind == 'pods':
+                indexers['node'] = lambda obj: obj.get('node')
+            self.stores[kind] = InformerStore(key_fields, indexers)
+            self.writers[kind] = ModelDeltaWriter(cluster, kind)
+            self.informers.append(Informer(k8s_client, kind, self.stores[kind], self.writers[kind]))
+    
+    def start(self):
+        for informer in self.informers:
+            informer.start()
+        self._flusher.start()
+    
+    def stop(self):
+        self._stopped.set()
+        for informer in self.informers:
+            informer.stop()
+        self._flusher.join()
+    
+    def flush(self):
+        flushed = set()
+        for kind, writer in self.writers.items():
+            try:
+                if writer.flush():
+                    flushed.add(kind)
+            except Exception as e:
+                logger.warning('informer-%s-%s: flush failed: %s', self.cluster.pk, kind, e)
+        
+        if flushed & {'pods', 'replicasets', 'deployments'}:
+            try:
+                resolve_ownership(self.cluster)
+            except Exception as e:
+                logger.warning('informer-%s: ownership resolution failed: %s', self.cluster.pk, e)
+        if flushed:
+            try:
+                refresh_inventory(self.cluster)
+            except Exception as e:
+                logger.warning('informer-%s: inventory refresh failed: %s', self.cluster.pk, e)
+        
+        # Keep the cluster counters in step with the stores once the initial lists are done; an
+        # idle cluster costs no write, so last_synced is when its rows last changed
+        counters = {}
+        for informer in self.informers:
+            if informer.kind in ('nodes', 'pods') and informer.has_synced:
+                counters[f'{informer.kind[:-1]}_count'] = len(self.stores[informer.kind])
+        if counters and (flushed or counters != self._counters):
+            Cluster.objects.filter(pk=self.cluster.pk).update(last_synced=timezone.now(), **counters)
+            self._counters = counters
+    
+    def _flush_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+        self.flush()
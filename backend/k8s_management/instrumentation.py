@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+from django.db import connection
+from django.db.models import Count, OuterRef, Subquery
+from django.utils import timezone
+from .models import Cluster, ClusterSyncRun
+
+_local = threading.local()
+
+
+def active_recorder() -> Optional['SyncRecorder']:
+    """The recorder of the sync running in this thread, if any"""
+    return getattr(_local, 'recorder', None)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block as ``name`` in the active recorder; a no-op outside a recorded sync"""
+    recorder = active_recorder()
+    if recorder is None:
+        yield
+        return
+    with recorder.phase(name):
+        yield
+
+
+def record_bytes(count: int):
+    recorder = active_recorder()
+    if recorder is not None:
+        recorder.bytes_received += count
+
+
+def record_objects(kind: str, count: int):
+    recorder = active_recorder()
+    if recorder is not None:
+        recorder.object_counts[kind] += count
+
+
+class SyncRecorder:
+    """Per-phase wall time, DB queries, API requests and bytes received of one sync run.
+
+    Phases nest and are timed exclusively: time spent in ``api`` while inside
+    ``list`` is charged to ``api`` only, so the phase durations add up to the
+    run duration. Queries are counted with a connection execute wrapper and
+    charged to the innermost phase as well.
+    """
+    
+    def __init__(self):
+        self.durations = Counter()
+        self.queries = Counter()
+        self.api_requests = 0
+        self.bytes_received = 0
+        self.object_counts = Counter()
+        self.changes = {}
+        self.started_at = timezone.now()
+        self._stack = ['other']
+        self._mark = time.perf_counter()
+        self._start = self._mark
+    
+    def _charge(self):
+        now = time.perf_counter()
+        self.durations[self._stack[-1]] += now - self._mark
+        self._mark = now
+    
+    @contextmanager
+    def phase(self, name: str):
+        self._charge()
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._charge()
+            self._stack.pop()
+    
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries[self._stack[-1]] += 1
+        return execute(sql, params, many, context)
+    
+    @contextmanager
+    def activate(self):
+        """Record the queries and phases of this thread until the block exits"""
+        previous = active_recorder()
+        _local.recorder = self
+        try:
+            with connection.execute_wrapper(self._count_query):
+                yield self
+        finally:
+            self._charge()
+            _local.recorder = previous
+    
+    @property
+    def duration(self) -> float:
+        return time.perf_counter() - self._start
+    
+    def summary(self) -> Dict:
+        return {
+            'duration': round(self.duration, 6),
+            'phases': {name: round(seconds, 6) for name, seconds in self.durations.items()},
+            'queries': dict(self.queries),
+            'query_count': sum(self.queries.values()),
+            'api_requests': self.api_requests,
+            'bytes_received': self.bytes_received,
+        }
+
+
+@contextmanager
+def record_sync_run(cluster, mode: str = 'full'):
+    """Record the block as a sync run of the cluster, stored as a ClusterSyncRun even when it fails.
+    
+    The caller may set ``changes`` on the yielded recorder.
+    """
+    recorder = SyncRecorder()
+    status, error = 'success', ''
+    try:
+        with recorder.activate():
+            yield recorder
+    except Exception as e:
+        status, error = 'failed', str(e)
+        raise
+    finally:
+        summary = recorder.summary()
+        ClusterSyncRun.objects.create(
+            cluster=cluster, mode=mode, status=status, error=error,
+            started_at=recorder.started_at, duration=summary['duration'],
+            phases=summary['phases'], queries=summary['queries'], query_count=summary['query_count'],
+            api_requests=summary['api_requests'], bytes_received=summary['bytes_received'],
+            object_counts=dict(recorder.object_counts), changes=recorder.changes,
+        )
+
+
+# Runs reported by prometheus_metrics: the latest of each mode per cluster (shards are
+# only listed through the sync-runs endpoint, the latest one alone would be misleading)
+PROMETHEUS_MODES = ('full', 'sharded', 'finish')
+
+PROMETHEUS_METRICS = (
+    ('k8s_sync_duration_seconds', 'Wall time of the latest sync run'),
+    ('k8s_sync_phase_seconds', 'Wall time per phase of the latest sync run'),
+    ('k8s_sync_db_queries', 'Database queries per phase of the latest sync run'),
+    ('k8s_sync_api_requests', 'Kubernetes API requests of the latest sync run'),
+    ('k8s_sync_bytes_received', 'Bytes received from the API server by the latest sync run'),
+    ('k8s_sync_objects', 'Objects listed per kind by the latest sync run'),
+    ('k8s_sync_last_run_timestamp_seconds', 'Start time of the latest sync run'),
+    ('k8s_sync_runs', 'Retained sync runs by status'),
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(name: str, value, **labels) -> str:
+    rendered = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+    return f'{name}{{{rendered}}} {value}'
+
+
+def prometheus_metrics(clusters: Iterable) -> str:
+    """Prometheus text exposition of the latest sync runs of the clusters"""
+    clusters = list(clusters)
+    names = {cluster.pk: cluster.name for cluster in clusters}
+    
+    latest_ids = []
+    for mode in PROMETHEUS_MODES:
+        latest = ClusterSyncRun.objects.filter(cluster=OuterRef('pk'), mode=mode).order_by('-started_at')
+        latest_ids += [pk for pk in Cluster.objects.filter(pk__in=names).annotate(
+            run=Subquery(latest.values('pk')[:1])
+        ).values_list('run', flat=True) if pk]
+    
+    samples: Dict[str, List[str]] = {name: [] for name, _ in PROMETHEUS_METRICS}
+    for run in ClusterSyncRun.objects.filter(pk__in=latest_ids).order_by('cluster_id', 'mode'):
+        labels = {'cluster': names[run.cluster_id], 'mode': run.mode}
+        samples['k8s_sync_duration_seconds'].append(_sample('k8s_sync_duration_seconds', run.duration, **labels))
+        for phase_name, seconds in sorted(run.phases.items()):
+            samples['k8s_sync_phase_seconds'].append(
+                _sample('k8s_sync_phase_seconds', seconds, **labels, phase=phase_name))
+        for phase_name, count in sorted(run.queries.items()):
+            samples['k8s_sync_db_queries'].append(_sample('k8s_sync_db_queries', count, **labels, phase=phase_name))
+        samples['k8s_sync_api_requests'].append(_sample('k8s_sync_api_requests', run.api_requests, **labels))
+        samples['k8s_sync_bytes_received'].append(
+            _sample('k8s_sync_bytes_received', run.bytes_received, **labels))
+        for kind, count in sorted(run.object_counts.items()):
+            samples['k8s_sync_objects'].append(_sample('k8s_sync_objects', count, **labels, kind=kind))
+        samples['k8s_sync_last_run_timestamp_seconds'].append(_sample(
+            'k8s_sync_last_run_timestamp_seconds', run.started_at.timestamp(), **labels, status=run.status))
+    
+    runs = (ClusterSyncRun.objects.filter(cluster_id__in=names).values('cluster_id', 'status')
+            .annotate(count=Count('id')).order_by('cluster_id', 'status'))
+    for row in runs:
+        samples['k8s_sync_runs'].append(
+            _sample('k8s_sync_runs', row['count'], cluster=names[row['cluster_id']], status=row['status']))
+    
+    lines = []
+    for name, help_text in PROMETHEUS_METRICS:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', *samples[name]]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,108 @@
+from typing import Dict, List
+from django.conf import settings
+from django.db.models import Case, CharField, Count, F, Q, Sum, Value, When
+from .models import Cluster, Deployment, InventorySummary, Node, Pod, Service
+from .reconcile import Reconciler
+
+MEASURES = ('count', 'not_ready', 'restarts', 'replicas', 'ready_replicas')
+
+# Measures reported per kind
+KIND_MEASURES = {
+    'pods': ('count', 'not_ready', 'restarts'),
+    'deployments': ('count', 'replicas', 'ready_replicas'),
+    'nodes': ('count', 'not_ready'),
+    'services': ('count',),
+}
+
+# Dimension name -> InventorySummary lookup
+DIMENSIONS = {
+    'cluster': 'cluster',
+    'cluster_name': 'cluster__name',
+    'environment': 'cluster__environment',
+    'provider': 'cluster__provider',
+    'region': 'cluster__region',
+    'namespace': 'namespace',
+    'status': 'status',
+}
+
+
+def _summary_rows(cluster: Cluster) -> List[Dict]:
+    """Aggregate the entity tables of a cluster into summary rows, one grouped query per kind"""
+    rows = []
+    
+    for row in (Pod.objects.filter(cluster=cluster).values('namespace', 'status')
+                .annotate(count=Count('id'), not_ready=Count('id', filter=Q(ready=False)),
+                          restarts=Sum('restarts')).order_by()):
+        rows.append({'kind': 'pods', **row})
+    
+    deployment_status = Case(When(ready_replicas__lt=F('replicas'), then=Value('degraded')),
+                             default=Value('available'), output_field=CharField())
+    for row in (Deployment.objects.filter(cluster=cluster).annotate(rollout=deployment_status)
+                .values('namespace', 'rollout')
+                .annotate(count=Count('id'), replicas=Sum('replicas'), ready_replicas=Sum('ready_replicas'))
+                .order_by()):
+        rows.append({'kind': 'deployments', 'status': row.pop('rollout'), **row})
+    
+    for row in (Node.objects.filter(cluster=cluster).values('status')
+                .annotate(count=Count('id')).order_by()):
+        rows.append({'kind': 'nodes', 'namespace': '',
+                     'not_ready': row['count'] if row['status'] != 'ready' else 0, **row})
+    
+    for row in (Service.objects.filter(cluster=cluster).values('namespace', 'service_type')
+                .annotate(count=Count('id')).order_by()):
+        rows.append({'kind': 'services', 'status': row.pop('service_type'), **row})
+    
+    return [{'namespace': '', 'status': '', **{measure: 0 for measure in MEASURES},
+             **{key: (value or 0) if key in MEASURES else (value or '') for key, value in row.items()}}
+            for row in rows]
+
+
+def refresh_inventory(cluster: Cluster) -> Dict:
+    """Rebuild the inventory summary of a cluster, writing only the rows that changed"""
+    reconciler = Reconciler(InventorySummary, cluster, ('kind', 'namespace', 'status'), MEASURES,
+                            batch_size=getattr(settings, 'K8S_SYNC_BATCH_SIZE', 1000))
+    reconciler.apply(_summary_rows(cluster))
+    return reconciler.finish()
+
+
+def query_inventory(params, clusters=None) -> Dict:
+    """Filter, group and sum the inventory summary across clusters in one query.
+    
+    ``params`` is a mapping (e.g. query parameters): ``kind`` is required,
+    ``group_by`` is a comma-separated list of dimensions and every dimension
+    can be used as a filter with one or more comma-separated values.
+    Raises ValueError on invalid parameters.
+    """
+    kind = params.get('kind')
+    if kind not in KIND_MEASURES:
+        raise ValueError(f"kind must be one of: {', '.join(KIND_MEASURES)}")
+    
+    group_by = [name for name in (params.get('group_by') or '').split(',') if name]
+    unknown = [name for name in group_by if name not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown group_by dimension(s): {', '.join(unknown)}")
+    
+    queryset = InventorySummary.objects.filter(kind=kind)
+    if clusters is not None:
+        queryset = queryset.filter(cluster__in=clusters)
+    for name, lookup in DIMENSIONS.items():
+        value = params.get(name)
+        if value:
+            queryset = queryset.filter(**{f'{lookup}__in': value.split(',')})
+    
+    measures = KIND_MEASURES[kind]
+    native = [name for name in group_by if DIMENSIONS[name] == name]
+    joined = {name: F(DIMENSIONS[name]) for name in group_by if DIMENSIONS[name] != name}
+    sums = {measure: Sum(measure) for measure in measures}
+    if group_by:
+        results = list(queryset.values(*native, **joined).annotate(**sums).order_by(*group_by))
+    else:
+        # values() with no fields would group by every column, i.e. not at all
+        results = [queryset.aggregate(**sums)]
+    
+    return {
+        'kind': kind,
+        'group_by': group_by,
+        'totals': {measure: sum(row[measure] or 0 for row in results) for measure in measures},
+        'results': results,
+    }
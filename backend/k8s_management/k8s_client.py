@@ -1,9 +1,62 @@
-import tempfile
-import os
+import hashlib
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+import yaml
+from django.conf import settings
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
-from typing import Dict, List, Optional
+from kubernetes.stream import stream
+from typing import Dict, Iterator, List, Optional, Tuple
 from .models import Cluster
+from .quantities import cpu_millicores, memory_bytes, sum_requests
+from .instrumentation import phase, record_bytes
+from .throttle import ThrottledApiClient, policy_for
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+
+# kind -> (cluster-wide path, namespaced path)
+RESOURCE_PATHS = {
+    'nodes': ('/api/v1/nodes', None),
+    'namespaces': ('/api/v1/namespaces', None),
+    'pods': ('/api/v1/pods', '/api/v1/namespaces/{namespace}/pods'),
+    'deployments': ('/apis/apps/v1/deployments', '/apis/apps/v1/namespaces/{namespace}/deployments'),
+    'replicasets': ('/apis/apps/v1/replicasets', '/apis/apps/v1/namespaces/{namespace}/replicasets'),
+    'services': ('/api/v1/services', '/api/v1/namespaces/{namespace}/services'),
+    'node_metrics': ('/apis/metrics.k8s.io/v1beta1/nodes', None),
+    'pod_metrics': ('/apis/metrics.k8s.io/v1beta1/pods', '/apis/metrics.k8s.io/v1beta1/namespaces/{namespace}/pods'),
+}
+
+PROJECTIONS = ('full', 'metadata', 'table')
+
+PROJECTION_ACCEPT = {
+    'metadata': 'application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json',
+    'table': 'application/json;as=Table;g=meta.k8s.io;v=v1,application/json',
+}
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Kubernetes RFC 3339 timestamp"""
+    return datetime.fromisoformat(value) if value else None
+
+
+def _controller(owner_references) -> Tuple[str, str]:
+    """(kind, name) of the controlling owner reference, ('', '') when there is none"""
+    for ref in owner_references or []:
+        if isinstance(ref, dict):
+            if ref.get('controller'):
+                return ref.get('kind') or '', ref.get('name') or ''
+        elif ref.controller:
+            return ref.kind or '', ref.name or ''
+    return '', ''
 
 
 class KubernetesClient:
@@ -11,184 +64,612 @@ class KubernetesClient:
     
     def __init__(self, cluster: Cluster):
         self.cluster = cluster
+        self.fingerprint = kubeconfig_fingerprint(cluster)
+        self.configuration = None
         self.api_client = None
         self.core_v1 = None
         self.apps_v1 = None
+        self.policy = None
+        self.page_size = getattr(settings, 'K8S_LIST_PAGE_SIZE', 500)
+        self.raw_json = getattr(settings, 'K8S_RAW_JSON_LISTING', False)
         self._initialize_client()
     
     def _initialize_client(self):
-        """Initialize Kubernetes client with cluster kubeconfig"""
+        """Initialize Kubernetes client with cluster kubeconfig.
+        
+        The kubeconfig is loaded straight from memory into a Configuration owned
+        by this client, so the kubernetes package's global default configuration
+        is never touched and clients for different clusters can be used
+        concurrently from threads, processes or asyncio tasks. Requests are
+        rate limited and retried by the cluster's RequestPolicy.
+        """
         try:
-            kubeconfig_content = self.cluster.get_kubeconfig()
+            kubeconfig = yaml.safe_load(self.cluster.get_kubeconfig())
             
-            # Write kubeconfig to temporary file
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.yaml') as f:
-                f.write(kubeconfig_content)
-                kubeconfig_path = f.name
-            
-            # Load kubeconfig
-            config.load_kube_config(config_file=kubeconfig_path)
+            self.configuration = client.Configuration()
+            config.load_kube_config_from_dict(
+                config_dict=kubeconfig,
+                client_configuration=self.configuration,
+                persist_config=False,
+            )
             
             # Initialize API clients
-            self.api_client = client.ApiClient()
+            self.policy = policy_for(self.cluster.pk)
+            self.api_client = ThrottledApiClient(self.policy, configuration=self.configuration)
+            # The pool may drop a client other threads still use; it is closed once the last one lets go
+            self._finalizer = weakref.finalize(self, _release_api_client, self.api_client)
             self.core_v1 = client.CoreV1Api(self.api_client)
             self.apps_v1 = client.AppsV1Api(self.api_client)
             
-            # Clean up temp file
-            os.unlink(kubeconfig_path)
-            
         except Exception as e:
             raise Exception(f"Failed to initialize Kubernetes client: {str(e)}")
     
-    def get_cluster_version(self) -> str:
+    def close(self):
+        """Release pooled connections held by the API client; only for clients not shared through the pool"""
+        if self.api_client:
+            self._finalizer()
+    
+    def get_cluster_version(self, request_timeout: Optional[float] = None) -> str:
         """Get Kubernetes cluster version"""
         try:
             version_api = client.VersionApi(self.api_client)
-            version_info = version_api.get_code()
+            version_info = version_api.get_code(_request_timeout=request_timeout)
             return f"v{version_info.major}.{version_info.minor}"
         except ApiException as e:
             raise Exception(f"Failed to get cluster version: {str(e)}")
     
-    def list_nodes(self) -> List[Dict]:
-        """List all nodes in the cluster"""
+    def _paginate(self, list_method, page_size: Optional[int] = None, **kwargs) -> Iterator:
+        """Yield the items of a list call one page at a time.
+        
+        Walks the API server's ``limit``/``continue`` chunks so that only one
+        page of objects is held in memory at a time.
+        """
+        page_size = page_size or self.page_size
+        _continue = None
+        while True:
+            page = list_method(limit=page_size, _continue=_continue, **kwargs)
+            yield page.items
+            _continue = page.metadata._continue
+            if not _continue:
+                break
+    
+    @staticmethod
+    def _node_to_dict(node) -> Dict:
+        # Get node status
+        conditions = {c.type: c.status for c in node.status.conditions or []}
+        is_ready = conditions.get('Ready', 'Unknown') == 'True'
+        
+        # Get node role
+        labels = node.metadata.labels or {}
+        role = 'worker'
+        if 'node-role.kubernetes.io/master' in labels or 'node-role.kubernetes.io/control-plane' in labels:
+            role = 'master'
+        
+        # Get resource capacity and usage
+        capacity = node.status.capacity or {}
+        allocatable = node.status.allocatable or {}
+        
+        return {
+            'name': node.metadata.name,
+            'status': 'ready' if is_ready else 'not_ready',
+            'role': role,
+            'version': node.status.node_info.kubelet_version,
+            'os': node.status.node_info.os_image,
+            'cpu_capacity': capacity.get('cpu', '0'),
+            'memory_capacity': capacity.get('memory', '0'),
+            'cpu_allocatable': allocatable.get('cpu', '0'),
+            'memory_allocatable': allocatable.get('memory', '0'),
+            'created_at': node.metadata.creation_timestamp,
+            'labels': node.metadata.labels or {},
+            'annotations': node.metadata.annotations or {},
+        }
+    
+    @staticmethod
+    def _pod_to_dict(pod) -> Dict:
+        # Get pod status
+        phase = (pod.status.phase or 'Unknown').lower()
+        
+        # Count containers
+        containers = len(pod.spec.containers)
+        ready_containers = sum(1 for c in pod.status.container_statuses or [] if c.ready)
+        
+        # Sum resource requests
+        cpu_requests, memory_requests = sum_requests(
+            {'requests': c.resources.requests if c.resources else None} for c in pod.spec.containers
+        )
+        
+        owner_kind, owner_name = _controller(pod.metadata.owner_references)
+        
+        return {
+            'name': pod.metadata.name,
+            'namespace': pod.metadata.namespace,
+            'status': phase,
+            'node': pod.spec.node_name,
+            'containers': f"{ready_containers}/{containers}",
+            'restarts': sum(c.restart_count for c in pod.status.container_statuses or []),
+            'age': pod.metadata.creation_timestamp,
+            'ip': pod.status.pod_ip,
+            'ready': containers > 0 and ready_containers == containers,
+            'owner_kind': owner_kind,
+            'owner_name': owner_name,
+            'cpu_requests': cpu_requests,
+            'memory_requests': memory_requests,
+            'labels': pod.metadata.labels or {},
+            'annotations': pod.metadata.annotations or {},
+        }
+    
+    @staticmethod
+    def _deployment_to_dict(deployment) -> Dict:
+        return {
+            'name': deployment.metadata.name,
+            'namespace': deployment.metadata.namespace,
+            'replicas': deployment.spec.replicas,
+            'ready_replicas': deployment.status.ready_replicas or 0,
+            'available_replicas': deployment.status.available_replicas or 0,
+            'updated_replicas': deployment.status.updated_replicas or 0,
+            'created_at': deployment.metadata.creation_timestamp,
+            'labels': deployment.metadata.labels or {},
+            'annotations': deployment.metadata.annotations or {},
+        }
+    
+    @staticmethod
+    def _replicaset_to_dict(replica_set) -> Dict:
+        owner_kind, owner_name = _controller(replica_set.metadata.owner_references)
+        return {
+            'name': replica_set.metadata.name,
+            'namespace': replica_set.metadata.namespace,
+            'replicas': replica_set.spec.replicas or 0,
+            'ready_replicas': replica_set.status.ready_replicas or 0,
+            'available_replicas': replica_set.status.available_replicas or 0,
+            'owner_kind': owner_kind,
+            'owner_name': owner_name,
+            'created_at': replica_set.metadata.creation_timestamp,
+            'labels': replica_set.metadata.labels or {},
+            'annotations': replica_set.metadata.annotations or {},
+        }
+    
+    @staticmethod
+    def _service_to_dict(service) -> Dict:
+        ingress = service.status.load_balancer.ingress if service.status.load_balancer else None
+        return {
+            'name': service.metadata.name,
+            'namespace': service.metadata.namespace,
+            'type': service.spec.type,
+            'cluster_ip': service.spec.cluster_ip,
+            'external_ip': ','.join(i.ip or i.hostname or '' for i in ingress) if ingress else None,
+            'ports': [f"{p.port}/{p.protocol}" for p in service.spec.ports or []],
+            'created_at': service.metadata.creation_timestamp,
+            'labels': service.metadata.labels or {},
+            'annotations': service.metadata.annotations or {},
+        }
+    
+    # Extractors for the raw-JSON fast path; they produce the same dicts as the
+    # _*_to_dict converters, reading only the fields the models need.
+    
+    @staticmethod
+    def _node_from_json(node: Dict) -> Dict:
+        metadata = node['metadata']
+        status = node.get('status') or {}
+        conditions = {c['type']: c['status'] for c in status.get('conditions') or []}
+        labels = metadata.get('labels') or {}
+        role = 'worker'
+        if 'node-role.kubernetes.io/master' in labels or 'node-role.kubernetes.io/control-plane' in labels:
+            role = 'master'
+        capacity = status.get('capacity') or {}
+        allocatable = status.get('allocatable') or {}
+        node_info = status.get('nodeInfo') or {}
+        
+        return {
+            'name': metadata['name'],
+            'status': 'ready' if conditions.get('Ready', 'Unknown') == 'True' else 'not_ready',
+            'role': role,
+            'version': node_info.get('kubeletVersion'),
+            'os': node_info.get('osImage'),
+            'cpu_capacity': capacity.get('cpu', '0'),
+            'memory_capacity': capacity.get('memory', '0'),
+            'cpu_allocatable': allocatable.get('cpu', '0'),
+            'memory_allocatable': allocatable.get('memory', '0'),
+            'created_at': _parse_time(metadata.get('creationTimestamp')),
+            'labels': metadata.get('labels') or {},
+            'annotations': metadata.get('annotations') or {},
+        }
+    
+    @staticmethod
+    def _pod_from_json(pod: Dict) -> Dict:
+        metadata = pod['metadata']
+        spec = pod.get('spec') or {}
+        status = pod.get('status') or {}
+        container_statuses = status.get('containerStatuses') or []
+        ready_containers = sum(1 for c in container_statuses if c.get('ready'))
+        containers = len(spec.get('containers') or [])
+        cpu_requests, memory_requests = sum_requests(
+            c.get('resources') or {} for c in spec.get('containers') or []
+        )
+        owner_kind, owner_name = _controller(metadata.get('ownerReferences'))
+        
+        return {
+            'name': metadata['name'],
+            'namespace': metadata.get('namespace'),
+            'status': (status.get('phase') or 'Unknown').lower(),
+            'node': spec.get('nodeName'),
+            'containers': f"{ready_containers}/{containers}",
+            'restarts': sum(c.get('restartCount', 0) for c in container_statuses),
+            'age': _parse_time(metadata.get('creationTimestamp')),
+            'ip': status.get('podIP'),
+            'ready': containers > 0 and ready_containers == containers,
+            'owner_kind': owner_kind,
+            'owner_name': owner_name,
+            'cpu_requests': cpu_requests,
+            'memory_requests': memory_requests,
+            'labels': metadata.get('labels') or {},
+            'annotations': metadata.get('annotations') or {},
+        }
+    
+    @staticmethod
+    def _deployment_from_json(deployment: Dict) -> Dict:
+        metadata = deployment['metadata']
+        status = deployment.get('status') or {}
+        return {
+            'name': metadata['name'],
+            'namespace': metadata.get('namespace'),
+            'replicas': (deployment.get('spec') or {}).get('replicas'),
+            'ready_replicas': status.get('readyReplicas') or 0,
+            'available_replicas': status.get('availableReplicas') or 0,
+            'updated_replicas': status.get('updatedReplicas') or 0,
+            'created_at': _parse_time(metadata.get('creationTimestamp')),
+            'labels': metadata.get('labels') or {},
+            'annotations': metadata.get('annotations') or {},
+        }
+    
+    @staticmethod
+    def _replicaset_from_json(replica_set: Dict) -> Dict:
+        metadata = replica_set['metadata']
+        status = replica_set.get('status') or {}
+        owner_kind, owner_name = _controller(metadata.get('ownerReferences'))
+        return {
+            'name': metadata['name'],
+            'namespace': metadata.get('namespace'),
+            'replicas': (replica_set.get('spec') or {}).get('replicas') or 0,
+            'ready_replicas': status.get('readyReplicas') or 0,
+            'available_replicas': status.get('availableReplicas') or 0,
+            'owner_kind': owner_kind,
+            'owner_name': owner_name,
+            'created_at': _parse_time(metadata.get('creationTimestamp')),
+            'labels': metadata.get('labels') or {},
+            'annotations': metadata.get('annotations') or {},
+        }
+    
+    @staticmethod
+    def _service_from_json(service: Dict) -> Dict:
+        metadata = service['metadata']
+        spec = service.get('spec') or {}
+        ingress = ((service.get('status') or {}).get('loadBalancer') or {}).get('ingress')
+        return {
+            'name': metadata['name'],
+            'namespace': metadata.get('namespace'),
+            'type': spec.get('type'),
+            'cluster_ip': spec.get('clusterIP'),
+            'external_ip': ','.join(i.get('ip') or i.get('hostname') or '' for i in ingress) if ingress else None,
+            'ports': [f"{p.get('port')}/{p.get('protocol', 'TCP')}" for p in spec.get('ports') or []],
+            'created_at': _parse_time(metadata.get('creationTimestamp')),
+            'labels': metadata.get('labels') or {},
+            'annotations': metadata.get('annotations') or {},
+        }
+    
+    def _raw_pages(self, kind: str, namespace: Optional[str] = None, page_size: Optional[int] = None,
+                   accept: str = 'application/json', **query) -> Iterator[Dict]:
+        """Yield parsed JSON list pages for a resource kind without building model objects"""
+        cluster_path, namespaced_path = RESOURCE_PATHS[kind]
+        path = namespaced_path if namespace else cluster_path
+        query = [(key, value) for key, value in query.items() if value is not None]
+        query.append(('limit', page_size or self.page_size))
+        
+        _continue = None
+        while True:
+            response = self.api_client.call_api(
+                path, 'GET',
+                path_params={'namespace': namespace} if namespace else {},
+                query_params=query + ([('continue', _continue)] if _continue else []),
+                header_params={'Accept': accept},
+                auth_settings=['BearerToken'],
+                _return_http_data_only=True,
+                _preload_content=False,
+            )
+            try:
+                with phase('api'):
+                    data = response.data
+                record_bytes(len(data))
+                with phase('decode'):
+                    page = json_loads(data)
+            finally:
+                response.release_conn()
+            yield page
+            _continue = (page.get('metadata') or {}).get('continue')
+            if not _continue:
+                break
+    
+    @staticmethod
+    def _metadata_to_dict(item: Dict) -> Dict:
+        metadata = item.get('metadata') or {}
+        return {
+            'name': metadata.get('name'),
+            'namespace': metadata.get('namespace'),
+            'labels': metadata.get('labels') or {},
+            'annotations': metadata.get('annotations') or {},
+            'resource_version': metadata.get('resourceVersion'),
+            'created_at': _parse_time(metadata.get('creationTimestamp')),
+        }
+    
+    @staticmethod
+    def _table_to_dicts(table: Dict) -> List[Dict]:
+        columns = [column['name'].lower().replace(' ', '_') for column in table.get('columnDefinitions') or []]
+        rows = []
+        for row in table.get('rows') or []:
+            metadata = (row.get('object') or {}).get('metadata') or {}
+            data = dict(zip(columns, row.get('cells') or []))
+            data['name'] = metadata.get('name', data.get('name'))
+            data['namespace'] = metadata.get('namespace')
+            rows.append(data)
+        return rows
+    
+    def iter_resources(self, kind: str, namespace: Optional[str] = None, page_size: Optional[int] = None,
+                       label_selector: Optional[str] = None, field_selector: Optional[str] = None,
+                       projection: str = 'full', raw_json: Optional[bool] = None) -> Iterator[List[Dict]]:
+        """Yield objects of a kind one page (list of dicts) at a time.
+        
+        ``label_selector``/``field_selector`` are evaluated by the API server.
+        ``projection`` selects how much of each object is fetched:
+        
+        - ``full``: complete objects converted with the per-kind converter
+        - ``metadata``: PartialObjectMetadataList (name, namespace, labels, ...)
+        - ``table``: server-side Table rows (the columns kubectl prints)
+        
+        With ``raw_json`` (default ``K8S_RAW_JSON_LISTING``) full objects skip
+        the kubernetes model deserialization: the response body is parsed with
+        orjson when installed and only the needed fields are extracted.
+        """
+        if raw_json is None:
+            raw_json = self.raw_json
+        if projection not in PROJECTIONS:
+            raise ValueError(f"Unknown projection: {projection}")
+        
         try:
-            nodes = self.core_v1.list_node()
-            node_list = []
+            if projection == 'full' and raw_json:
+                extractor = getattr(self, self._JSON_EXTRACTORS[kind])
+                pages = self._raw_pages(kind, namespace, page_size,
+                                        labelSelector=label_selector, fieldSelector=field_selector)
+                for page in pages:
+                    yield [extractor(item) for item in page.get('items') or []]
+                return
             
-            for node in nodes.items:
-                # Get node status
-                conditions = {c.type: c.status for c in node.status.conditions}
-                is_ready = conditions.get('Ready', 'Unknown') == 'True'
-                
-                # Get node role
-                labels = node.metadata.labels or {}
-                role = 'worker'
-                if 'node-role.kubernetes.io/master' in labels or 'node-role.kubernetes.io/control-plane' in labels:
-                    role = 'master'
-                
-                # Get resource capacity and usage
-                capacity = node.status.capacity
-                allocatable = node.status.allocatable
-                
-                node_list.append({
-                    'name': node.metadata.name,
-                    'status': 'ready' if is_ready else 'not_ready',
-                    'role': role,
-                    'version': node.status.node_info.kubelet_version,
-                    'os': node.status.node_info.os_image,
-                    'cpu_capacity': capacity.get('cpu', '0'),
-                    'memory_capacity': capacity.get('memory', '0'),
-                    'cpu_allocatable': allocatable.get('cpu', '0'),
-                    'memory_allocatable': allocatable.get('memory', '0'),
-                    'created_at': node.metadata.creation_timestamp,
-                })
+            if projection == 'full':
+                api_attr, cluster_method, namespaced_method, converter = self._FULL_LISTERS[kind]
+                api = getattr(self, api_attr)
+                kwargs = {'label_selector': label_selector, 'field_selector': field_selector}
+                if namespace:
+                    pages = self._paginate(getattr(api, namespaced_method), page_size,
+                                           namespace=namespace, **kwargs)
+                else:
+                    pages = self._paginate(getattr(api, cluster_method), page_size, **kwargs)
+                for items in pages:
+                    yield [getattr(self, converter)(item) for item in items]
+                return
             
-            return node_list
+            pages = self._raw_pages(kind, namespace, page_size, accept=PROJECTION_ACCEPT[projection],
+                                    labelSelector=label_selector, fieldSelector=field_selector)
+            for page in pages:
+                if projection == 'metadata':
+                    yield [self._metadata_to_dict(item) for item in page.get('items') or []]
+                else:
+                    yield self._table_to_dicts(page)
         except ApiException as e:
-            raise Exception(f"Failed to list nodes: {str(e)}")
+            raise Exception(f"Failed to list {kind}: {str(e)}")
+    
+    # kind -> (API group attribute, cluster-wide list method, namespaced list method, converter)
+    _FULL_LISTERS = {
+        'nodes': ('core_v1', 'list_node', None, '_node_to_dict'),
+        'pods': ('core_v1', 'list_pod_for_all_namespaces', 'list_namespaced_pod', '_pod_to_dict'),
+        'deployments': ('apps_v1', 'list_deployment_for_all_namespaces', 'list_namespaced_deployment',
+                        '_deployment_to_dict'),
+        'replicasets': ('apps_v1', 'list_replica_set_for_all_namespaces', 'list_namespaced_replica_set',
+                        '_replicaset_to_dict'),
+        'services': ('core_v1', 'list_service_for_all_namespaces', 'list_namespaced_service',
+                     '_service_to_dict'),
+    }
+    
+    _JSON_EXTRACTORS = {
+        'nodes': '_node_from_json',
+        'pods': '_pod_from_json',
+        'deployments': '_deployment_from_json',
+        'replicasets': '_replicaset_from_json',
+        'services': '_service_from_json',
+    }
+    
+    def iter_nodes(self, page_size: Optional[int] = None, **options) -> Iterator[List[Dict]]:
+        """Yield nodes in the cluster one page (list of dicts) at a time"""
+        return self.iter_resources('nodes', None, page_size, **options)
+    
+    def iter_pods(self, namespace: Optional[str] = None, page_size: Optional[int] = None,
+                  **options) -> Iterator[List[Dict]]:
+        """Yield pods in cluster or specific namespace one page at a time"""
+        return self.iter_resources('pods', namespace, page_size, **options)
+    
+    def iter_deployments(self, namespace: Optional[str] = None, page_size: Optional[int] = None,
+                         **options) -> Iterator[List[Dict]]:
+        """Yield deployments in cluster or specific namespace one page at a time"""
+        return self.iter_resources('deployments', namespace, page_size, **options)
+    
+    def iter_replicasets(self, namespace: Optional[str] = None, page_size: Optional[int] = None,
+                         **options) -> Iterator[List[Dict]]:
+        """Yield replica sets in cluster or specific namespace one page at a time"""
+        return self.iter_resources('replicasets', namespace, page_size, **options)
     
-    def list_pods(self, namespace: Optional[str] = None) -> List[Dict]:
+    def iter_services(self, namespace: Optional[str] = None, page_size: Optional[int] = None,
+                      **options) -> Iterator[List[Dict]]:
+        """Yield services in cluster or specific namespace one page at a time"""
+        return self.iter_resources('services', namespace, page_size, **options)
+    
+    def list_nodes(self, **options) -> List[Dict]:
+        """List all nodes in the cluster"""
+        return [node for page in self.iter_nodes(**options) for node in page]
+    
+    def list_pods(self, namespace: Optional[str] = None, **options) -> List[Dict]:
         """List pods in cluster or specific namespace"""
-        try:
-            if namespace:
-                pods = self.core_v1.list_namespaced_pod(namespace)
-            else:
-                pods = self.core_v1.list_pod_for_all_namespaces()
-            
-            pod_list = []
-            for pod in pods.items:
-                # Get pod status
-                phase = pod.status.phase.lower()
-                
-                # Count containers
-                containers = len(pod.spec.containers)
-                ready_containers = sum(1 for c in pod.status.container_statuses or [] if c.ready)
-                
-                pod_list.append({
-                    'name': pod.metadata.name,
-                    'namespace': pod.metadata.namespace,
-                    'status': phase,
-                    'node': pod.spec.node_name,
-                    'containers': f"{ready_containers}/{containers}",
-                    'restarts': sum(c.restart_count for c in pod.status.container_statuses or []),
-                    'age': pod.metadata.creation_timestamp,
-                    'ip': pod.status.pod_ip,
-                })
-            
-            return pod_list
-        except ApiException as e:
-            raise Exception(f"Failed to list pods: {str(e)}")
+        return [pod for page in self.iter_pods(namespace, **options) for pod in page]
     
-    def list_deployments(self, namespace: Optional[str] = None) -> List[Dict]:
+    def list_deployments(self, namespace: Optional[str] = None, **options) -> List[Dict]:
         """List deployments in cluster or specific namespace"""
-        try:
-            if namespace:
-                deployments = self.apps_v1.list_namespaced_deployment(namespace)
-            else:
-                deployments = self.apps_v1.list_deployment_for_all_namespaces()
-            
-            deployment_list = []
-            for deployment in deployments.items:
-                deployment_list.append({
-                    'name': deployment.metadata.name,
-                    'namespace': deployment.metadata.namespace,
-                    'replicas': deployment.spec.replicas,
-                    'ready_replicas': deployment.status.ready_replicas or 0,
-                    'available_replicas': deployment.status.available_replicas or 0,
-                    'updated_replicas': deployment.status.updated_replicas or 0,
-                    'created_at': deployment.metadata.creation_timestamp,
-                })
-            
-            return deployment_list
-        except ApiException as e:
-            raise Exception(f"Failed to list deployments: {str(e)}")
+        return [deployment for page in self.iter_deployments(namespace, **options) for deployment in page]
     
-    def list_services(self, namespace: Optional[str] = None) -> List[Dict]:
+    def list_replicasets(self, namespace: Optional[str] = None, **options) -> List[Dict]:
+        """List replica sets in cluster or specific namespace"""
+        return [replica_set for page in self.iter_replicasets(namespace, **options) for replica_set in page]
+    
+    def list_services(self, namespace: Optional[str] = None, **options) -> List[Dict]:
         """List services in cluster or specific namespace"""
+        return [service for page in self.iter_services(namespace, **options) for service in page]
+    
+    def count_namespaces(self) -> int:
+        """Count namespaces in the cluster"""
         try:
-            if namespace:
-                services = self.core_v1.list_namespaced_service(namespace)
-            else:
-                services = self.core_v1.list_service_for_all_namespaces()
-            
-            service_list = []
-            for service in services.items:
-                service_list.append({
-                    'name': service.metadata.name,
-                    'namespace': service.metadata.namespace,
-                    'type': service.spec.type,
-                    'cluster_ip': service.spec.cluster_ip,
-                    'external_ip': ','.join(service.status.load_balancer.ingress or []) if service.status.load_balancer else None,
-                    'ports': [f"{p.port}/{p.protocol}" for p in service.spec.ports or []],
-                    'created_at': service.metadata.creation_timestamp,
-                })
-            
-            return service_list
+            pages = self._raw_pages('namespaces', accept=PROJECTION_ACCEPT['metadata'])
+            return sum(len(page.get('items') or []) for page in pages)
         except ApiException as e:
-            raise Exception(f"Failed to list services: {str(e)}")
+            raise Exception(f"Failed to list namespaces: {str(e)}")
     
-    def get_cluster_metrics(self) -> Dict:
-        """Get cluster-level metrics"""
+    def get_resource_usage(self, namespace: Optional[str] = None) -> Optional[Dict]:
+        """Current node and pod usage from the metrics.k8s.io API (metrics-server).
+        
+        One list call per kind. Returns ``{'nodes': {name: (cpu_millicores, memory_bytes)},
+        'pods': {(namespace, name): (cpu_millicores, memory_bytes)}}`` with pod
+        usage summed over containers, or None when the metrics API is not served.
+        """
         try:
-            nodes = self.core_v1.list_node()
-            pods = self.core_v1.list_pod_for_all_namespaces()
-            namespaces = self.core_v1.list_namespace()
+            nodes = {}
+            if namespace is None:
+                for page in self._raw_pages('node_metrics'):
+                    for item in page.get('items') or []:
+                        usage = item.get('usage') or {}
+                        nodes[item['metadata']['name']] = (cpu_millicores(usage.get('cpu')),
+                                                           memory_bytes(usage.get('memory')))
             
-            return {
-                'node_count': len(nodes.items),
-                'pod_count': len(pods.items),
-                'namespace_count': len(namespaces.items),
-                'running_pods': sum(1 for p in pods.items if p.status.phase == 'Running'),
-                'pending_pods': sum(1 for p in pods.items if p.status.phase == 'Pending'),
-                'failed_pods': sum(1 for p in pods.items if p.status.phase == 'Failed'),
-            }
+            pods = {}
+            for page in self._raw_pages('pod_metrics', namespace):
+                for item in page.get('items') or []:
+                    cpu = memory = 0
+                    for container in item.get('containers') or []:
+                        usage = container.get('usage') or {}
+                        cpu += cpu_millicores(usage.get('cpu')) or 0
+                        memory += memory_bytes(usage.get('memory')) or 0
+                    metadata = item['metadata']
+                    pods[(metadata['namespace'], metadata['name'])] = (cpu, memory)
+            
+            return {'nodes': nodes, 'pods': pods}
         except ApiException as e:
-            raise Exception(f"Failed to get cluster metrics: {str(e)}")
+            if e.status in (404, 503):
+                return None
+            raise Exception(f"Failed to get resource usage: {str(e)}")
     
-    def test_connection(self) -> bool:
+    def test_connection(self, request_timeout: Optional[float] = None) -> bool:
         """Test connection to Kubernetes cluster"""
         try:
-            self.core_v1.list_namespace(limit=1)
+            self.core_v1.list_namespace(limit=1, _request_timeout=request_timeout)
             return True
         except Exception:
             return False
+    
+    def open_exec(self, namespace: str, pod: str, command: List[str], container: Optional[str] = None,
+                  tty: bool = True, attach: bool = False):
+        """Open an interactive exec (or attach) session in a pod; returns the connected ``WSClient``.
+        
+        kubernetes.stream swaps the ``request`` method of the ApiClient it is
+        given for the duration of the call, which would divert concurrent
+        requests of other threads, so the session is opened through a throwaway
+        ApiClient on this client's configuration rather than the shared one.
+        """
+        self.policy.bucket.acquire()
+        self.policy.count('requests')
+        api_client = client.ApiClient(self.configuration)
+        try:
+            core_v1 = client.CoreV1Api(api_client)
+            options = {'container': container, 'stdin': True, 'stdout': True, 'stderr': True, 'tty': tty,
+                       '_preload_content': False}
+            if attach:
+                return stream(core_v1.connect_get_namespaced_pod_attach, pod, namespace, **options)
+            return stream(core_v1.connect_get_namespaced_pod_exec, pod, namespace, command=command, **options)
+        finally:
+            api_client.close()
+
+
+def _release_api_client(api_client: client.ApiClient):
+    api_client.rest_client.pool_manager.clear()
+    api_client.close()
+
+
+def kubeconfig_fingerprint(cluster: Cluster) -> str:
+    """Fingerprint of the stored (encrypted) kubeconfig, changes whenever it is replaced"""
+    return hashlib.sha256(bytes(cluster.encrypted_kubeconfig or b'')).hexdigest()
+
+
+class KubernetesClientPool:
+    """Process-wide cache of KubernetesClient instances keyed by cluster id.
+    
+    Entries are rebuilt when the cluster kubeconfig fingerprint changes or the
+    entry is older than ``ttl`` seconds; the least recently used entry is evicted
+    once ``max_size`` clients are cached. Reusing a client reuses its urllib3
+    connection pool, so repeated calls skip kubeconfig parsing and TLS handshakes.
+    
+    Cached clients are shared and never modified. A client only reads the
+    kubeconfig and id of the Cluster it was built from, and a new kubeconfig
+    means a new client. Evicted or invalidated clients are only dropped from
+    the cache: a sync or informer still holding one keeps using it, and its
+    connections are closed when the last reference goes.
+    """
+    
+    def __init__(self, max_size: int = 64, ttl: int = 900):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, cluster: Cluster) -> KubernetesClient:
+        """Return a cached client for the cluster, building one if needed"""
+        fingerprint = kubeconfig_fingerprint(cluster)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._clients.get(cluster.pk)
+            if entry and entry[0] == fingerprint and now - entry[1] < self.ttl:
+                self._clients.move_to_end(cluster.pk)
+                return entry[2]
+        
+        # Build outside the lock so a slow cluster does not block the others
+        k8s_client = KubernetesClient(cluster)
+        
+        with self._lock:
+            self._clients.pop(cluster.pk, None)
+            self._clients[cluster.pk] = (fingerprint, now, k8s_client)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+        return k8s_client
+    
+    def invalidate(self, cluster_id):
+        """Drop the cached client for a cluster (e.g. after its kubeconfig changed)"""
+        with self._lock:
+            self._clients.pop(cluster_id, None)
+    
+    def clear(self):
+        """Drop every cached client"""
+        with self._lock:
+            self._clients.clear()
+
+
+client_pool = KubernetesClientPool(
+    max_size=getattr(settings, 'K8S_CLIENT_CACHE_SIZE', 64),
+    ttl=getattr(settings, 'K8S_CLIENT_CACHE_TTL', 900),
+)
+
+
+def get_kubernetes_client(cluster: Cluster) -> KubernetesClient:
+    """Return the shared, cached KubernetesClient for a cluster"""
+    return client_pool.get(cluster)
@@ -0,0 +1,131 @@
+import re
+from functools import reduce
+from operator import and_, or_
+from typing import Iterable, List, Optional, Tuple
+from django.db import connection, transaction
+from django.db.models import Q
+from .registry import ResourceKind
+
+_KEY = r'[A-Za-z0-9](?:[-A-Za-z0-9_./]*[A-Za-z0-9])?'
+_VALUE = r'(?:[A-Za-z0-9](?:[-A-Za-z0-9_.]*[A-Za-z0-9])?)?'
+_EQUALITY = re.compile(rf'^({_KEY})\s*(==|=|!=)\s*({_VALUE})$')
+_SET = re.compile(rf'^({_KEY})\s+(in|notin)\s+\(([^()]*)\)$')
+_EXISTS = re.compile(rf'^(!?)\s*({_KEY})$')
+_VALUE_ONLY = re.compile(rf'^{_VALUE}$')
+
+
+def uses_gin_index() -> bool:
+    """Whether label selectors run against the GIN-indexed JSON column instead of the side table"""
+    return connection.vendor == 'postgresql'
+
+
+def _split(selector: str) -> List[str]:
+    terms, depth, current = [], 0, ''
+    for char in selector:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            terms.append(current)
+            current = ''
+        else:
+            current += char
+    terms.append(current)
+    return [term.strip() for term in terms]
+
+
+def parse_selector(selector: str) -> List[Tuple[str, str, Tuple[str, ...]]]:
+    """Parse a Kubernetes label selector into ``(key, operator, values)`` requirements.
+
+    Supports equality (``a=b``, ``a==b``, ``a!=b``), set-based (``a in (b,c)``,
+    ``a notin (b)``) and existence (``a``, ``!a``) requirements. Raises
+    ValueError on invalid input.
+    """
+    requirements = []
+    if not selector or not selector.strip():
+        return requirements
+    
+    for term in _split(selector):
+        match = _EQUALITY.match(term)
+        if match:
+            key, operator, value = match.groups()
+            requirements.append((key, 'notin' if operator == '!=' else 'in', (value,)))
+            continue
+        
+        match = _SET.match(term)
+        if match:
+            key, operator, values = match.groups()
+            values = tuple(value.strip() for value in values.split(','))
+            if not all(_VALUE_ONLY.match(value) for value in values):
+                raise ValueError(f'Invalid values in label selector requirement: {term}')
+            requirements.append((key, operator, values))
+            continue
+        
+        match = _EXISTS.match(term)
+        if match:
+            negated, key = match.groups()
+            requirements.append((key, '!' if negated else 'exists', ()))
+            continue
+        
+        raise ValueError(f'Invalid label selector requirement: {term!r}')
+    
+    return requirements
+
+
+def _requirement_q(kind: ResourceKind, key: str, operator: str, values: Tuple[str, ...]) -> Q:
+    if uses_gin_index():
+        if operator in ('in', 'notin'):
+            matches = reduce(or_, (Q(labels__contains={key: value}) for value in values))
+        else:
+            matches = Q(labels__has_key=key)
+    else:
+        index = kind.label_model.objects.filter(key=key)
+        if operator in ('in', 'notin'):
+            index = index.filter(value__in=values)
+        matches = Q(pk__in=index.values('obj'))
+    
+    return ~matches if operator in ('notin', '!') else matches
+
+
+def selector_q(kind: ResourceKind, selector: str) -> Q:
+    """Q object matching the rows of ``kind`` selected by a label selector"""
+    requirements = parse_selector(selector)
+    if not requirements:
+        return Q()
+    return reduce(and_, (_requirement_q(kind, *requirement) for requirement in requirements))
+
+
+def refresh_label_index(kind: ResourceKind, cluster, keys: Optional[Iterable[tuple]] = None,
+                        batch_size: int = 500) -> int:
+    """Rebuild the side-table index rows of the given objects (all of the cluster if ``keys`` is None).
+
+    Nothing to do on PostgreSQL, where selectors use the GIN index directly.
+    Returns the number of index rows written.
+    """
+    if kind.label_model is None or uses_gin_index():
+        return 0
+    
+    queryset = kind.model.objects.filter(cluster=cluster)
+    if keys is None:
+        pks = list(queryset.values_list('pk', flat=True))
+        batches = [queryset.filter(pk__in=pks[start:start + batch_size])
+                   for start in range(0, len(pks), batch_size)]
+    else:
+        keys = list(keys)
+        batches = [
+            queryset.filter(reduce(or_, (Q(**dict(zip(kind.key_fields, key)))
+                                         for key in keys[start:start + batch_size])))
+            for start in range(0, len(keys), batch_size)
+        ]
+    
+    written = 0
+    for batch in batches:
+        objects = list(batch.values_list('pk', 'labels'))
+        with transaction.atomic():
+            kind.label_model.objects.filter(obj_id__in=[pk for pk, _ in objects]).delete()
+            rows = [kind.label_model(obj_id=pk, key=key, value=value or '')
+                    for pk, labels in objects for key, value in (labels or {}).items()]
+            kind.label_model.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+    return written
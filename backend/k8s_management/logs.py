@@ -0,0 +1,230 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+from django.conf import settings
+from .k8s_client import KubernetesClient
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+OVERFLOW_POLICIES = ('drop', 'slowdown')
+
+# LogStream threads running in this process, bounded by K8S_LOG_MAX_STREAMS_TOTAL
+_active_streams = 0
+_active_lock = threading.Lock()
+
+
+def split_timestamp(line: str) -> Tuple[Optional[str], str]:
+    """Split the RFC 3339 timestamp the API server prefixes with ``timestamps=true``"""
+    timestamp, separator, text = line.partition(' ')
+    if separator and timestamp[:4].isdigit() and timestamp.endswith('Z'):
+        return timestamp, text
+    return None, line
+
+
+class LogBuffer:
+    """Bounded buffer between the log reader threads of one socket and its sender task.
+
+    Reader threads ``put`` lines; the sender awaits ``get_batch``. When
+    ``max_lines`` are waiting, the ``drop`` policy discards new lines (and
+    counts them) while ``slowdown`` blocks the reader thread, which stops
+    reading from the API server until the browser catches up. Either way a
+    noisy pod costs at most ``max_lines`` lines of memory and never blocks the
+    event loop. End-of-stream markers bypass the bound and survive ``close``.
+    """
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_lines: int, policy: str = 'drop'):
+        self.loop = loop
+        self.max_lines = max_lines
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._lines = 0
+        self._cond = threading.Condition()
+        self._ready = asyncio.Event()
+    
+    def put(self, item: tuple, force: bool = False):
+        """Queue an item from a reader thread"""
+        with self._cond:
+            while (not force and self.policy == 'slowdown' and self._lines >= self.max_lines
+                   and not self.closed):
+                self._cond.wait(1)
+            if self.closed and not force:
+                return
+            if not force and self._lines >= self.max_lines:
+                self.dropped += 1
+                return
+            # Only the first item wakes the sender; later ones ride along with it
+            wake = not self._items
+            self._items.append(item)
+            if not force:
+                self._lines += 1
+        if wake:
+            self.loop.call_soon_threadsafe(self._ready.set)
+    
+    async def get_batch(self, max_items: int) -> Tuple[List[tuple], int]:
+        """Wait for items; returns up to ``max_items`` of them and the lines dropped since the last batch"""
+        while True:
+            with self._cond:
+                if self._items or self.dropped:
+                    batch = [self._items.popleft() for _ in range(min(max_items, len(self._items)))]
+                    self._lines -= sum(1 for item in batch if item[0] == 'line')
+                    dropped, self.dropped = self.dropped, 0
+                    self._ready.clear()
+                    self._cond.notify_all()
+                    return batch, dropped
+                self._ready.clear()
+            await self._ready.wait()
+    
+    def close(self):
+        """Release blocked readers and discard their lines from now on; end markers still get through"""
+        with self._cond:
+            self.closed = True
+            self._items = deque(item for item in self._items if item[0] != 'line')
+            self._lines = 0
+            self._cond.notify_all()
+
+
+class LogStream(threading.Thread):
+    """Follows the log of one container and feeds its lines to a LogBuffer.
+
+    Lines are split out of the raw chunks as they arrive, truncated to
+    K8S_LOG_MAX_LINE_BYTES and, with ``grep``, filtered before they are
+    buffered. Puts ``('line', pod, container, timestamp, text)`` items and
+    finally one ``('end', pod, container, error)``. Gives back the slot taken
+    with ``reserve_streams`` when it finishes.
+    """
+    
+    def __init__(self, k8s_client: KubernetesClient, namespace: str, pod: str, container: str,
+                 buffer: LogBuffer, follow: bool = True, tail_lines: Optional[int] = None,
+                 since_seconds: Optional[int] = None, grep: Optional[Callable[[str], bool]] = None):
+        super().__init__(name=f'logs-{namespace}-{pod}-{container}', daemon=True)
+        self.k8s_client = k8s_client
+        self.namespace = namespace
+        self.pod = pod
+        self.container = container
+        self.buffer = buffer
+        self.follow = follow
+        self.tail_lines = tail_lines
+        self.since_seconds = since_seconds
+        self.grep = grep
+        self.max_line_bytes = getattr(settings, 'K8S_LOG_MAX_LINE_BYTES', 16384)
+        self.response = None
+        self._stopped = threading.Event()
+    
+    def stop(self):
+        self._stopped.set()
+        response = self.response
+        if response is not None and hasattr(response, 'shutdown'):
+            # Interrupts a read blocked on a quiet container
+            try:
+                response.shutdown()
+            except (RuntimeError, ValueError):
+                # Already finished, closed or released to the pool
+                pass
+    
+    def _emit(self, raw: bytes):
+        line = raw[:self.max_line_bytes].decode('utf-8', errors='replace').rstrip('\r')
+        timestamp, text = split_timestamp(line)
+        if self.grep is None or self.grep(text):
+            self.buffer.put(('line', self.pod, self.container, timestamp, text))
+    
+    def run(self):
+        error = None
+        try:
+            self.response = self.k8s_client.core_v1.read_namespaced_pod_log(
+                self.pod, self.namespace, container=self.container, follow=self.follow,
+                tail_lines=self.tail_lines, since_seconds=self.since_seconds, timestamps=True,
+                _preload_content=False,
+            )
+            if self._stopped.is_set():
+                return
+            partial = b''
+            for chunk in self.response.stream(8192, decode_content=True):
+                if self._stopped.is_set():
+                    break
+                lines = (partial + chunk).split(b'\n')
+                partial = lines.pop()
+                if len(partial) > self.max_line_bytes:
+                    # Emit overlong lines in pieces rather than buffering them whole
+                    lines.append(partial)
+                    partial = b''
+                for raw in lines:
+                    self._emit(raw)
+            if partial and not self._stopped.is_set():
+                self._emit(partial)
+        except Exception as e:
+            if not self._stopped.is_set():
+                error = str(e)
+        finally:
+            if self.response is not None:
+                self.response.release_conn()
+            self.buffer.put(('end', self.pod, self.container, error), force=True)
+            release_streams(1)
+
+
+def compile_grep(pattern: Optional[str], ignore_case: bool = False,
+                 regex: bool = False) -> Optional[Callable[[str], bool]]:
+    """Line filter for ``grep``: a plain substring, or with ``regex`` a regular expression.
+
+    Regular expressions run on RE2 (the google-re2 package), which matches in
+    linear time, so a pattern from the browser cannot stall a reader thread;
+    without it only substrings are accepted.
+    """
+    if not pattern:
+        return None
+    if len(pattern) > 256:
+        raise ValueError('grep pattern is too long')
+    if not regex:
+        if ignore_case:
+            needle = pattern.lower()
+            return lambda text: needle in text.lower()
+        return lambda text: pattern in text
+    if re2 is None:
+        raise ValueError('Regular expression grep is not available on this server, use a plain substring')
+    try:
+        return re2.compile(f'(?i){pattern}' if ignore_case else pattern).search
+    except re2.error as e:
+        raise ValueError(f'Invalid grep pattern: {e}')
+
+
+def reserve_streams(count: int) -> bool:
+    """Take ``count`` of the K8S_LOG_MAX_STREAMS_TOTAL stream slots of this process, all or none"""
+    global _active_streams
+    with _active_lock:
+        if _active_streams + count > getattr(settings, 'K8S_LOG_MAX_STREAMS_TOTAL', 200):
+            return False
+        _active_streams += count
+        return True
+
+
+def release_streams(count: int):
+    global _active_streams
+    with _active_lock:
+        _active_streams -= count
+
+
+def resolve_log_targets(k8s_client: KubernetesClient, namespace: str, pod: Optional[str] = None,
+                        selector: Optional[str] = None, container: Optional[str] = None) -> List[Tuple[str, str]]:
+    """(pod, container) pairs to stream: one pod or every pod matching a label selector,
+    with the given container or all of their containers"""
+    if pod:
+        pods = [k8s_client.core_v1.read_namespaced_pod(pod, namespace)]
+    elif selector:
+        pods = k8s_client.core_v1.list_namespaced_pod(namespace, label_selector=selector).items
+    else:
+        raise ValueError('Either pod or selector is required')
+    
+    targets = []
+    for item in pods:
+        names = [c.name for c in item.spec.containers]
+        if container:
+            if container in names:
+                targets.append((item.metadata.name, container))
+        else:
+            targets.extend((item.metadata.name, name) for name in names)
+    return targets
@@ -0,0 +1,72 @@
+import signal
+import threading
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from k8s_management.models import Cluster
+from k8s_management.informers import ClusterInformers
+from k8s_management.k8s_client import kubeconfig_fingerprint
+from k8s_management.registry import RESOURCE_KINDS
+
+
+class Command(BaseCommand):
+    help = 'Run watch-based informers that keep synced Kubernetes entities up to date'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--cluster', type=int, action='append', dest='clusters',
+                            help='Cluster id to watch (repeatable, defaults to all clusters)')
+        parser.add_argument('--kind', action='append', dest='kinds', choices=list(RESOURCE_KINDS),
+                            help='Resource kind to watch (repeatable, defaults to all kinds)')
+        parser.add_argument('--flush-interval', type=float, default=2.0,
+                            help='Seconds between database flushes of buffered deltas')
+        parser.add_argument('--rescan-interval', type=float, default=30.0,
+                            help='Seconds between checks for added, deleted or re-credentialed clusters')
+    
+    def handle(self, *args, **options):
+        # Cluster id -> (kubeconfig fingerprint, running ClusterInformers or None when it failed to start)
+        self.running = {}
+        stopped = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+        try:
+            self.rescan(options)
+            while not stopped.wait(options['rescan_interval']):
+                self.rescan(options)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for _, informers in self.running.values():
+                if informers:
+                    informers.stop()
+    
+    def rescan(self, options):
+        """Start informers for new clusters, stop those of deleted ones and restart those whose kubeconfig changed"""
+        close_old_connections()
+        clusters = Cluster.objects.all()
+        if options['clusters']:
+            clusters = clusters.filter(pk__in=options['clusters'])
+        clusters = {cluster.pk: cluster for cluster in clusters}
+        
+        for cluster_id in set(self.running) - set(clusters):
+            _, informers = self.running.pop(cluster_id)
+            if informers:
+                informers.stop()
+                self.stdout.write(f'Stopped watching deleted cluster {informers.cluster.name}')
+        
+        for cluster_id, cluster in clusters.items():
+            fingerprint = kubeconfig_fingerprint(cluster)
+            previous = self.running.get(cluster_id)
+            if previous and previous[0] == fingerprint:
+                continue
+            if previous and previous[1]:
+                previous[1].stop()
+                self.stdout.write(f'Kubeconfig of cluster {cluster.name} changed, restarting its informers')
+            
+            # A cluster that fails to start is retried once its kubeconfig is replaced
+            try:
+                informers = ClusterInformers(cluster, options['kinds'], options['flush_interval'])
+            except Exception as e:
+                self.stderr.write(f'Skipping cluster {cluster.name}: {e}')
+                self.running[cluster_id] = (fingerprint, None)
+                continue
+            informers.start()
+            self.running[cluster_id] = (fingerprint, informers)
+            self.stdout.write(f'Watching cluster {cluster.name}')
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('k8s_management', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cluster',
+            name='last_sync_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='cluster',
+            name='next_sync_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cluster',
+            name='sync_failures',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cluster',
+            name='sync_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cluster',
+            name='sync_task_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
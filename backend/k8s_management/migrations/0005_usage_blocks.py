@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('k8s_management', '0004_resource_quantities'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('node', 'Node'), ('pod', 'Pod')], max_length=10)),
+                ('entity', models.CharField(help_text='Node name or namespace/pod name', max_length=511)),
+                ('tier', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=5)),
+                ('start', models.DateTimeField()),
+                ('data', models.BinaryField()),
+                ('rolled_up', models.BooleanField(default=False)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_blocks', to='k8s_management.cluster')),
+            ],
+            options={
+                'db_table': 'kubernetes_usage_blocks',
+                'ordering': ['cluster', 'kind', 'entity', 'tier', 'start'],
+                'indexes': [models.Index(fields=['tier', 'rolled_up', 'start'], name='kubernetes__tier_1f02ce_idx')],
+                'unique_together': {('cluster', 'kind', 'entity', 'tier', 'start')},
+            },
+        ),
+    ]
@@ -0,0 +1,124 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+LABELED_TABLES = ['kubernetes_nodes', 'kubernetes_pods', 'kubernetes_deployments', 'kubernetes_services']
+
+
+def create_gin_indexes(apps, schema_editor):
+    """GIN indexes over the labels column; PostgreSQL only, other databases use the side tables"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in LABELED_TABLES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {table}_labels_gin ON {table} USING gin (labels)')
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in LABELED_TABLES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_labels_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('k8s_management', '0005_usage_blocks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deployment',
+            name='annotations',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='deployment',
+            name='labels',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='annotations',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='labels',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='pod',
+            name='annotations',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='pod',
+            name='labels',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='annotations',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='labels',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='DeploymentLabel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=317)),
+                ('value', models.CharField(blank=True, max_length=63)),
+                ('obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='label_index', to='k8s_management.deployment')),
+            ],
+            options={
+                'db_table': 'kubernetes_deployment_labels',
+                'indexes': [models.Index(fields=['key', 'value', 'obj'], name='kubernetes__key_8c6c7f_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='NodeLabel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=317)),
+                ('value', models.CharField(blank=True, max_length=63)),
+                ('obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='label_index', to='k8s_management.node')),
+            ],
+            options={
+                'db_table': 'kubernetes_node_labels',
+                'indexes': [models.Index(fields=['key', 'value', 'obj'], name='kubernetes__key_dadc00_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PodLabel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=317)),
+                ('value', models.CharField(blank=True, max_length=63)),
+                ('obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='label_index', to='k8s_management.pod')),
+            ],
+            options={
+                'db_table': 'kubernetes_pod_labels',
+                'indexes': [models.Index(fields=['key', 'value', 'obj'], name='kubernetes__key_f8aa44_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ServiceLabel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=317)),
+                ('value', models.CharField(blank=True, max_length=63)),
+                ('obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='label_index', to='k8s_management.service')),
+            ],
+            options={
+                'db_table': 'kubernetes_service_labels',
+                'indexes': [models.Index(fields=['key', 'value', 'obj'], name='kubernetes__key_4dadf4_idx')],
+            },
+        ),
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:19
+
+import django.db.models.deletion
+import k8s_management.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('k8s_management', '0006_labels'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('namespace', models.CharField(default='default', max_length=255)),
+                ('replicas', models.IntegerField(default=0)),
+                ('ready_replicas', models.IntegerField(default=0)),
+                ('available_replicas', models.IntegerField(default=0)),
+                ('owner_kind', models.CharField(blank=True, max_length=100)),
+                ('owner_name', models.CharField(blank=True, max_length=255)),
+                ('labels', models.JSONField(blank=True, default=dict)),
+                ('annotations', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'kubernetes_replicasets',
+                'ordering': ['cluster', 'namespace', 'name'],
+                'indexes': [k8s_management.models.LabelsGinIndex(fields=['labels'], name='kubernetes_rs_labels_gin')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReplicaSetLabel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=317)),
+                ('value', models.CharField(blank=True, max_length=63)),
+            ],
+            options={
+                'db_table': 'kubernetes_replicaset_labels',
+            },
+        ),
+        migrations.AddField(
+            model_name='pod',
+            name='deployment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pods', to='k8s_management.deployment'),
+        ),
+        migrations.AddField(
+            model_name='pod',
+            name='owner_kind',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='pod',
+            name='owner_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='pod',
+            name='ready',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='pod',
+            name='workload_kind',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='pod',
+            name='workload_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='pod',
+            index=models.Index(fields=['cluster', 'namespace', 'workload_kind', 'workload_name'], name='kubernetes__cluster_0406a1_idx'),
+        ),
+        migrations.AddField(
+            model_name='replicaset',
+            name='cluster',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replica_sets', to='k8s_management.cluster'),
+        ),
+        migrations.AddField(
+            model_name='replicaset',
+            name='deployment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='replica_sets', to='k8s_management.deployment'),
+        ),
+        migrations.AddField(
+            model_name='replicasetlabel',
+            name='obj',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='label_index', to='k8s_management.replicaset'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='replicaset',
+            unique_together={('cluster', 'namespace', 'name')},
+        ),
+        migrations.AddIndex(
+            model_name='replicasetlabel',
+            index=models.Index(fields=['key', 'value', 'obj'], name='kubernetes__key_cc22ac_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('k8s_management', '0007_ownership_graph'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('namespace', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(blank=True, max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('not_ready', models.IntegerField(default=0)),
+                ('restarts', models.BigIntegerField(default=0)),
+                ('replicas', models.IntegerField(default=0)),
+                ('ready_replicas', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='k8s_management.cluster')),
+            ],
+            options={
+                'db_table': 'kubernetes_inventory_summary',
+                'ordering': ['cluster', 'kind', 'namespace', 'status'],
+                'indexes': [models.Index(fields=['kind', 'status'], name='kubernetes__kind_6a3425_idx')],
+                'unique_together': {('cluster', 'kind', 'namespace', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('k8s_management', '0008_inventory_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevisionCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+                ('pruned_through', models.BigIntegerField(default=0)),
+                ('cluster', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='revision_counter', to='k8s_management.cluster')),
+            ],
+            options={
+                'db_table': 'kubernetes_revision_counter',
+            },
+        ),
+        migrations.AddField(
+            model_name='deployment',
+            name='revision',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='revision',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='pod',
+            name='revision',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='replicaset',
+            name='revision',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='revision',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('namespace', models.CharField(blank=True, max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('revision', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='k8s_management.cluster')),
+            ],
+            options={
+                'db_table': 'kubernetes_tombstones',
+                'ordering': ['revision'],
+                'indexes': [models.Index(fields=['cluster', 'kind', 'revision'], name='kubernetes__cluster_074b79_idx'), models.Index(fields=['deleted_at'], name='kubernetes__deleted_e2e8e5_idx')],
+            },
+        ),
+    ]
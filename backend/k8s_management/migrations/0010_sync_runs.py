@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('k8s_management', '0009_change_revisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClusterSyncRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('full', 'Full'), ('sharded', 'Sharded (cluster-scoped part)'), ('shard', 'Namespace shard'), ('finish', 'Sharded rollup')], default='full', max_length=20)),
+                ('status', models.CharField(choices=[('success', 'Success'), ('failed', 'Failed')], max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField()),
+                ('duration', models.FloatField(help_text='Wall time in seconds')),
+                ('phases', models.JSONField(default=dict)),
+                ('queries', models.JSONField(default=dict)),
+                ('query_count', models.IntegerField(default=0)),
+                ('api_requests', models.IntegerField(default=0)),
+                ('bytes_received', models.BigIntegerField(default=0)),
+                ('object_counts', models.JSONField(default=dict)),
+                ('changes', models.JSONField(default=dict)),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_runs', to='k8s_management.cluster')),
+            ],
+            options={
+                'db_table': 'kubernetes_sync_runs',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['cluster', '-started_at'], name='kubernetes__cluster_cf6e01_idx'), models.Index(fields=['started_at'], name='kubernetes__started_6b156e_idx')],
+            },
+        ),
+    ]
@@ -1,8 +1,27 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.conf import settings
 from cryptography.fernet import Fernet
 
 
+class LabelsGinIndex(GinIndex):
+    """GIN index over a labels column, created on PostgreSQL only.
+    
+    Other databases answer label selectors from the side tables (see labels.py),
+    so no index is created there and the model state still matches on both.
+    """
+    
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ''
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+    
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ''
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+
 class Cluster(models.Model):
     STATUS_CHOICES = [
         ('healthy', 'Healthy'),
@@ -50,6 +69,13 @@ class Cluster(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     last_synced = models.DateTimeField(null=True, blank=True)
     
+    # Background sync scheduling
+    sync_task_id = models.CharField(max_length=255, blank=True)
+    sync_started_at = models.DateTimeField(null=True, blank=True)
+    next_sync_at = models.DateTimeField(null=True, blank=True)
+    sync_failures = models.IntegerField(default=0)
+    last_sync_error = models.TextField(blank=True)
+    
     class Meta:
         db_table = 'kubernetes_clusters'
         ordering = ['-created_at']
@@ -61,6 +87,10 @@ class Cluster(models.Model):
         """Encrypt and store kubeconfig"""
         cipher = Fernet(settings.ENCRYPTION_KEY.encode())
         self.encrypted_kubeconfig = cipher.encrypt(kubeconfig.encode())
+        
+        if self.pk:
+            from .k8s_client import client_pool
+            client_pool.invalidate(self.pk)
     
     def get_kubeconfig(self) -> str:
         """Decrypt and return kubeconfig"""
@@ -90,11 +120,22 @@ class Node(models.Model):
     # Capacity
     cpu_capacity = models.CharField(max_length=50, blank=True)
     memory_capacity = models.CharField(max_length=50, blank=True)
+    cpu_capacity_millicores = models.BigIntegerField(null=True, blank=True)
+    memory_capacity_bytes = models.BigIntegerField(null=True, blank=True)
+    cpu_allocatable_millicores = models.BigIntegerField(null=True, blank=True)
+    memory_allocatable_bytes = models.BigIntegerField(null=True, blank=True)
     
     # Usage
     cpu_usage = models.FloatField(null=True, blank=True, help_text='CPU usage percentage')
     memory_usage = models.FloatField(null=True, blank=True, help_text='Memory usage percentage')
     
+    # Metadata
+    labels = models.JSONField(default=dict, blank=True)
+    annotations = models.JSONField(default=dict, blank=True)
+    
+    # Change tracking: revision of the last sync write (see revisions.py)
+    revision = models.BigIntegerField(default=0, db_index=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -122,12 +163,32 @@ class Pod(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Unknown')
     node = models.CharField(max_length=255, blank=True)
     ip = models.GenericIPAddressField(null=True, blank=True)
+    ready = models.BooleanField(default=False)
+    
+    # Ownership: the controlling ownerReference and the top-level workload it resolves to
+    owner_kind = models.CharField(max_length=100, blank=True)
+    owner_name = models.CharField(max_length=255, blank=True)
+    workload_kind = models.CharField(max_length=100, blank=True)
+    workload_name = models.CharField(max_length=255, blank=True)
+    deployment = models.ForeignKey('Deployment', on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='pods')
     
-    # Resource usage
+    # Resource requests and usage
+    cpu_request_millicores = models.BigIntegerField(null=True, blank=True)
+    memory_request_bytes = models.BigIntegerField(null=True, blank=True)
     cpu_usage = models.CharField(max_length=50, blank=True)
     memory_usage = models.CharField(max_length=50, blank=True)
+    cpu_usage_millicores = models.BigIntegerField(null=True, blank=True)
+    memory_usage_bytes = models.BigIntegerField(null=True, blank=True)
     restarts = models.IntegerField(default=0)
     
+    # Metadata
+    labels = models.JSONField(default=dict, blank=True)
+    annotations = models.JSONField(default=dict, blank=True)
+    
+    # Change tracking: revision of the last sync write (see revisions.py)
+    revision = models.BigIntegerField(default=0, db_index=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -135,6 +196,9 @@ class Pod(models.Model):
         db_table = 'kubernetes_pods'
         ordering = ['cluster', 'namespace', 'name']
         unique_together = ['cluster', 'namespace', 'name']
+        indexes = [
+            models.Index(fields=['cluster', 'namespace', 'workload_kind', 'workload_name']),
+        ]
     
     def __str__(self):
         return f"{self.cluster.name} - {self.namespace}/{self.name}"
@@ -149,6 +213,13 @@ class Deployment(models.Model):
     available_replicas = models.IntegerField(default=0)
     image = models.CharField(max_length=500, blank=True)
     
+    # Metadata
+    labels = models.JSONField(default=dict, blank=True)
+    annotations = models.JSONField(default=dict, blank=True)
+    
+    # Change tracking: revision of the last sync write (see revisions.py)
+    revision = models.BigIntegerField(default=0, db_index=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -161,6 +232,40 @@ class Deployment(models.Model):
         return f"{self.cluster.name} - {self.namespace}/{self.name}"
 
 
+class ReplicaSet(models.Model):
+    cluster = models.ForeignKey(Cluster, on_delete=models.CASCADE, related_name='replica_sets')
+    name = models.CharField(max_length=255)
+    namespace = models.CharField(max_length=255, default='default')
+    replicas = models.IntegerField(default=0)
+    ready_replicas = models.IntegerField(default=0)
+    available_replicas = models.IntegerField(default=0)
+    
+    # Ownership: the controlling ownerReference, resolved to the deployment row
+    owner_kind = models.CharField(max_length=100, blank=True)
+    owner_name = models.CharField(max_length=255, blank=True)
+    deployment = models.ForeignKey(Deployment, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='replica_sets')
+    
+    # Metadata
+    labels = models.JSONField(default=dict, blank=True)
+    annotations = models.JSONField(default=dict, blank=True)
+    
+    # Change tracking: revision of the last sync write (see revisions.py)
+    revision = models.BigIntegerField(default=0, db_index=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'kubernetes_replicasets'
+        ordering = ['cluster', 'namespace', 'name']
+        unique_together = ['cluster', 'namespace', 'name']
+        indexes = [LabelsGinIndex(fields=['labels'], name='kubernetes_rs_labels_gin')]
+    
+    def __str__(self):
+        return f"{self.cluster.name} - {self.namespace}/{self.name}"
+
+
 class Service(models.Model):
     SERVICE_TYPE_CHOICES = [
         ('ClusterIP', 'ClusterIP'),
@@ -177,6 +282,13 @@ class Service(models.Model):
     external_ip = models.CharField(max_length=255, blank=True)
     ports = models.JSONField(default=list, blank=True)
     
+    # Metadata
+    labels = models.JSONField(default=dict, blank=True)
+    annotations = models.JSONField(default=dict, blank=True)
+    
+    # Change tracking: revision of the last sync write (see revisions.py)
+    revision = models.BigIntegerField(default=0, db_index=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -187,3 +299,208 @@ class Service(models.Model):
     
     def __str__(self):
         return f"{self.cluster.name} - {self.namespace}/{self.name}"
+
+
+class UsageBlock(models.Model):
+    """A fixed window of usage samples for one node or pod in one resolution tier.
+    
+    ``data`` packs one float64 array per column (see ``timeseries.TIERS``),
+    column after column, with NaN for slots that have no sample.
+    """
+    KIND_CHOICES = [
+        ('node', 'Node'),
+        ('pod', 'Pod'),
+    ]
+    
+    TIER_CHOICES = [
+        ('1m', '1 minute'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+    
+    cluster = models.ForeignKey(Cluster, on_delete=models.CASCADE, related_name='usage_blocks')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    entity = models.CharField(max_length=511, help_text='Node name or namespace/pod name')
+    tier = models.CharField(max_length=5, choices=TIER_CHOICES)
+    start = models.DateTimeField()
+    data = models.BinaryField()
+    rolled_up = models.BooleanField(default=False)
+    
+    class Meta:
+        db_table = 'kubernetes_usage_blocks'
+        ordering = ['cluster', 'kind', 'entity', 'tier', 'start']
+        unique_together = ['cluster', 'kind', 'entity', 'tier', 'start']
+        indexes = [
+            models.Index(fields=['tier', 'rolled_up', 'start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.cluster.name} - {self.kind} {self.entity} [{self.tier}] {self.start}"
+
+
+class LabelIndex(models.Model):
+    """Inverted index of the labels of one synced model: one row per (object, key, value).
+
+    Selector queries on databases without a GIN-indexed JSON column resolve
+    label requirements here (see ``labels.py``). Rows are removed together
+    with their object.
+    """
+    key = models.CharField(max_length=317)
+    value = models.CharField(max_length=63, blank=True)
+    
+    class Meta:
+        abstract = True
+    
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+
+class NodeLabel(LabelIndex):
+    obj = models.ForeignKey(Node, on_delete=models.CASCADE, related_name='label_index')
+    
+    class Meta:
+        db_table = 'kubernetes_node_labels'
+        indexes = [models.Index(fields=['key', 'value', 'obj'])]
+
+
+class PodLabel(LabelIndex):
+    obj = models.ForeignKey(Pod, on_delete=models.CASCADE, related_name='label_index')
+    
+    class Meta:
+        db_table = 'kubernetes_pod_labels'
+        indexes = [models.Index(fields=['key', 'value', 'obj'])]
+
+
+class DeploymentLabel(LabelIndex):
+    obj = models.ForeignKey(Deployment, on_delete=models.CASCADE, related_name='label_index')
+    
+    class Meta:
+        db_table = 'kubernetes_deployment_labels'
+        indexes = [models.Index(fields=['key', 'value', 'obj'])]
+
+
+class ReplicaSetLabel(LabelIndex):
+    obj = models.ForeignKey(ReplicaSet, on_delete=models.CASCADE, related_name='label_index')
+    
+    class Meta:
+        db_table = 'kubernetes_replicaset_labels'
+        indexes = [models.Index(fields=['key', 'value', 'obj'])]
+
+
+class ServiceLabel(LabelIndex):
+    obj = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='label_index')
+    
+    class Meta:
+        db_table = 'kubernetes_service_labels'
+        indexes = [models.Index(fields=['key', 'value', 'obj'])]
+
+
+class InventorySummary(models.Model):
+    """Per-cluster counts of synced objects by kind, namespace and status.
+
+    Rebuilt from the entity tables after every sync so fleet-wide inventory
+    queries aggregate a few rows per cluster instead of every object.
+    """
+    cluster = models.ForeignKey(Cluster, on_delete=models.CASCADE, related_name='inventory')
+    kind = models.CharField(max_length=50)
+    namespace = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=50, blank=True)
+    
+    count = models.IntegerField(default=0)
+    not_ready = models.IntegerField(default=0)
+    restarts = models.BigIntegerField(default=0)
+    replicas = models.IntegerField(default=0)
+    ready_replicas = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'kubernetes_inventory_summary'
+        ordering = ['cluster', 'kind', 'namespace', 'status']
+        unique_together = ['cluster', 'kind', 'namespace', 'status']
+        indexes = [
+            models.Index(fields=['kind', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.cluster.name} - {self.kind} {self.namespace}/{self.status}: {self.count}"
+
+
+class RevisionCounter(models.Model):
+    """Per-cluster counter handing out the revisions stamped on synced objects.
+    
+    ``pruned_through`` is the highest revision whose tombstones were pruned;
+    change feeds older than that can no longer be served.
+    """
+    cluster = models.OneToOneField(Cluster, on_delete=models.CASCADE, related_name='revision_counter')
+    value = models.BigIntegerField(default=0)
+    pruned_through = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'kubernetes_revision_counter'
+    
+    def __str__(self):
+        return f"{self.cluster.name} revision {self.value}"
+
+
+class Tombstone(models.Model):
+    """Record of a synced object deleted at a revision, served by the change feed"""
+    cluster = models.ForeignKey(Cluster, on_delete=models.CASCADE, related_name='tombstones')
+    kind = models.CharField(max_length=50)
+    namespace = models.CharField(max_length=255, blank=True)
+    name = models.CharField(max_length=255)
+    revision = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'kubernetes_tombstones'
+        ordering = ['revision']
+        indexes = [
+            models.Index(fields=['cluster', 'kind', 'revision']),
+            models.Index(fields=['deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.namespace}/{self.name} @ {self.revision}"
+
+
+class ClusterSyncRun(models.Model):
+    """Timing and cost of one sync of a cluster (or one part of a sharded sync)"""
+    MODE_CHOICES = [
+        ('full', 'Full'),
+        ('sharded', 'Sharded (cluster-scoped part)'),
+        ('shard', 'Namespace shard'),
+        ('finish', 'Sharded rollup'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+    ]
+    
+    cluster = models.ForeignKey(Cluster, on_delete=models.CASCADE, related_name='sync_runs')
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='full')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField()
+    duration = models.FloatField(help_text='Wall time in seconds')
+    
+    # Seconds and DB queries per phase (connect, api, decode, list, write, ...)
+    phases = models.JSONField(default=dict)
+    queries = models.JSONField(default=dict)
+    query_count = models.IntegerField(default=0)
+    api_requests = models.IntegerField(default=0)
+    bytes_received = models.BigIntegerField(default=0)
+    object_counts = models.JSONField(default=dict)
+    changes = models.JSONField(default=dict)
+    
+    class Meta:
+        db_table = 'kubernetes_sync_runs'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['cluster', '-started_at']),
+            models.Index(fields=['started_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.cluster.name} {self.mode} sync at {self.started_at} ({self.status})"
@@ -0,0 +1,89 @@
+from typing import Dict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from .models import Cluster, Deployment, Pod, ReplicaSet
+from .push import OMITTED_FIELDS, publish_changes
+from .registry import kind_for_model
+from .revisions import reserve_revision
+
+
+def resolve_ownership(cluster: Cluster) -> Dict:
+    """Resolve the synced ownerReferences of a cluster into its ownership graph.
+    
+    Each replica set is linked to its deployment. Each pod gets its top-level
+    workload (Pod -> ReplicaSet -> Deployment collapses to the deployment;
+    StatefulSet, DaemonSet, Job, ... pods keep their direct owner) and, when
+    that is a deployment, a link to the deployment row. The graph is read
+    with one query per model and only rows whose links changed are written,
+    stamped with a new revision and pushed to subscribers.
+    """
+    batch_size = getattr(settings, 'K8S_SYNC_BATCH_SIZE', 1000)
+    deployments = {
+        (namespace, name): pk
+        for pk, namespace, name in Deployment.objects.filter(cluster=cluster).values_list('pk', 'namespace', 'name')
+    }
+    
+    replica_sets, changed_replica_sets = {}, []
+    rows = ReplicaSet.objects.filter(cluster=cluster).values_list(
+        'pk', 'namespace', 'name', 'owner_kind', 'owner_name', 'deployment_id'
+    )
+    for pk, namespace, name, owner_kind, owner_name, deployment_id in rows:
+        resolved = deployments.get((namespace, owner_name)) if owner_kind == 'Deployment' else None
+        replica_sets[(namespace, name)] = (owner_kind, owner_name, resolved)
+        if resolved != deployment_id:
+            changed_replica_sets.append(ReplicaSet(pk=pk, deployment_id=resolved))
+    
+    changed_pods = []
+    rows = Pod.objects.filter(cluster=cluster).values_list(
+        'pk', 'namespace', 'owner_kind', 'owner_name', 'workload_kind', 'workload_name', 'deployment_id'
+    )
+    for pk, namespace, owner_kind, owner_name, *current in rows.iterator(chunk_size=5000):
+        workload = (owner_kind, owner_name, None)
+        if owner_kind == 'ReplicaSet' and (namespace, owner_name) in replica_sets:
+            replica_set_owner_kind, replica_set_owner_name, deployment_id = replica_sets[(namespace, owner_name)]
+            if replica_set_owner_kind:
+                workload = (replica_set_owner_kind, replica_set_owner_name, deployment_id)
+        if workload != tuple(current):
+            changed_pods.append(Pod(pk=pk, workload_kind=workload[0], workload_name=workload[1],
+                                    deployment_id=workload[2]))
+    
+    if not changed_replica_sets and not changed_pods:
+        return {'replica_sets': 0, 'pods': 0}
+    
+    with transaction.atomic():
+        revision = reserve_revision(cluster)
+        for obj in (*changed_replica_sets, *changed_pods):
+            obj.revision = revision
+        ReplicaSet.objects.bulk_update(changed_replica_sets, ['deployment', 'revision'], batch_size=batch_size)
+        Pod.objects.bulk_update(changed_pods, ['workload_kind', 'workload_name', 'deployment', 'revision'],
+                                batch_size=batch_size)
+        if getattr(settings, 'K8S_PUSH_ENABLED', True):
+            publish_changes(ReplicaSet, cluster, revision,
+                            _pushed_rows(ReplicaSet, changed_replica_sets, ['deployment'], batch_size))
+            publish_changes(Pod, cluster, revision,
+                            _pushed_rows(Pod, changed_pods, ['workload_kind', 'workload_name', 'deployment'],
+                                         batch_size))
+    
+    return {'replica_sets': len(changed_replica_sets), 'pods': len(changed_pods)}
+
+
+def _pushed_rows(model, objects, link_fields, batch_size: int):
+    """Whole rows, as the sync pushes them, of relinked objects: subscribers replace rows, not merge them"""
+    kind = kind_for_model(model)
+    fields = [*kind.key_fields, *(field for field in kind.fields if field not in OMITTED_FIELDS), *link_fields]
+    pks = [obj.pk for obj in objects]
+    rows = []
+    for start in range(0, len(pks), batch_size):
+        rows.extend(model.objects.filter(pk__in=pks[start:start + batch_size]).values(*fields))
+    return rows
+
+
+def workload_rollup(pods) -> list:
+    """Pod count, not-ready pods and restarts per top-level workload of a pod queryset"""
+    return list(
+        pods.exclude(workload_kind='')
+        .values('cluster', 'namespace', 'workload_kind', 'workload_name', 'deployment')
+        .annotate(pods=Count('id'), not_ready=Count('id', filter=Q(ready=False)), restarts=Sum('restarts'))
+        .order_by('namespace', 'workload_kind', 'workload_name')
+    )
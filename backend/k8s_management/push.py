@@ -0,0 +1,58 @@
+import logging
+from typing import Dict, List, Sequence
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from .registry import kind_for_model
+
+logger = logging.getLogger(__name__)
+
+# Left out of pushed rows: bulky (last-applied-configuration and friends) and not needed
+# by list views, which is what pushes update; the detail endpoint still has them
+OMITTED_FIELDS = frozenset({'annotations'})
+
+
+def group_name(cluster_id: int, kind: str) -> str:
+    """Channel-layer group of the change messages of one kind of one cluster"""
+    return f'k8s-{cluster_id}-{kind}'
+
+
+def publish_changes(model, cluster, revision: int, rows: Sequence[Dict] = (),
+                    deleted: Sequence[tuple] = ()):
+    """Send the rows written and the keys deleted at ``revision`` to the kind's group.
+
+    Sent once the surrounding transaction commits, so subscribers never see
+    changes that were rolled back. OMITTED_FIELDS are dropped from the rows.
+    Large batches are split into messages of K8S_PUSH_BATCH_SIZE objects to
+    stay below the channel layer message size.
+    """
+    kind = kind_for_model(model)
+    if kind is None or not (rows or deleted) or not getattr(settings, 'K8S_PUSH_ENABLED', True):
+        return
+    
+    changed = [{**{field: value for field, value in row.items() if field not in OMITTED_FIELDS},
+                'revision': revision} for row in rows]
+    deleted = [{**dict(zip(kind.key_fields, key)), 'revision': revision} for key in deleted]
+    transaction.on_commit(lambda: _send(group_name(cluster.pk, kind.name), {
+        'cluster': cluster.pk, 'kind': kind.name, 'revision': revision,
+    }, changed, deleted))
+
+
+def _send(group: str, header: Dict, changed: List[Dict], deleted: List[Dict]):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    
+    batch_size = getattr(settings, 'K8S_PUSH_BATCH_SIZE', 500)
+    try:
+        for start in range(0, max(len(changed), len(deleted)), batch_size):
+            async_to_sync(channel_layer.group_send)(group, {
+                'type': 'k8s.changes', **header,
+                'changed': changed[start:start + batch_size],
+                'deleted': deleted[start:start + batch_size],
+            })
+    except Exception:
+        # Clients catch up through the ?since= feed; a push failure must not fail the sync
+        logger.exception('Failed to publish changes to %s', group)
+
@@ -0,0 +1,36 @@
+import math
+from typing import Iterable, Optional
+from kubernetes.utils import parse_quantity
+
+
+def cpu_millicores(value) -> Optional[int]:
+    """Parse a CPU quantity ("3800m", "4", "0.5") into millicores"""
+    if value in (None, ''):
+        return None
+    try:
+        return math.ceil(parse_quantity(value) * 1000)
+    except ValueError:
+        return None
+
+
+def memory_bytes(value) -> Optional[int]:
+    """Parse a memory quantity ("16Gi", "512M", "1e9") into bytes"""
+    if value in (None, ''):
+        return None
+    try:
+        return math.ceil(parse_quantity(value))
+    except ValueError:
+        return None
+
+
+def sum_requests(containers: Iterable[dict]) -> tuple:
+    """Sum the cpu (millicores) and memory (bytes) requests of a pod's containers.
+    
+    ``containers`` are plain dicts with an optional ``requests`` mapping.
+    """
+    cpu = memory = 0
+    for container in containers:
+        requests = container.get('requests') or {}
+        cpu += cpu_millicores(requests.get('cpu')) or 0
+        memory += memory_bytes(requests.get('memory')) or 0
+    return cpu, memory
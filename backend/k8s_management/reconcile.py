@@ -0,0 +1,151 @@
+import hashlib
+import json
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterable, List, Optional, Sequence
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .push import publish_changes
+from .revisions import is_revisioned, record_tombstones, reserve_revision
+
+
+def bulk_upsert(model, cluster, rows: List[Dict], key_fields: Sequence[str],
+                fields: Sequence[str], batch_size: int = 1000, revision: Optional[int] = None):
+    """Insert rows, updating the existing ones on (cluster, key) conflicts.
+    
+    With a ``revision`` every written row is stamped with it.
+    """
+    extra = {} if revision is None else {'revision': revision}
+    model.objects.bulk_create(
+        [model(cluster=cluster, **row, **extra) for row in rows],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['cluster', *key_fields],
+        update_fields=[*fields, *extra, 'updated_at'],
+    )
+
+
+def bulk_delete(model, cluster, keys: List[tuple], key_fields: Sequence[str],
+                batch_size: int = 500, revision: Optional[int] = None) -> int:
+    """Delete rows of the cluster by key, one query per batch of keys.
+    
+    With a ``revision`` a tombstone is recorded for every key.
+    """
+    if revision is not None:
+        record_tombstones(model, cluster, keys, key_fields, revision)
+    deleted = 0
+    for start in range(0, len(keys), batch_size):
+        condition = reduce(or_, (Q(**dict(zip(key_fields, key))) for key in keys[start:start + batch_size]))
+        deleted += model.objects.filter(condition, cluster=cluster).delete()[0]
+    return deleted
+
+
+def content_digest(values: Sequence) -> bytes:
+    """Digest of a row's compared field values, independent of the key order of JSON values"""
+    encoded = json.dumps(values, sort_keys=True, separators=(',', ':'), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+
+class Reconciler:
+    """Bulk reconciliation of one synced model for one cluster.
+
+    The existing rows of the cluster (optionally narrowed by ``scope``) are
+    streamed in a single query of the key, pk and compared fields, and kept as
+    ``key -> (pk, digest of the values)``, so labels and annotations are not
+    held in memory for the whole reconciliation. Every batch passed to
+    :meth:`apply` is diffed against that map: new keys are inserted with
+    ``bulk_create``, changed rows are written with ``bulk_update`` and
+    unchanged rows are skipped. :meth:`finish` deletes the rows whose keys were
+    not seen, so it must only be called once the listing completed.
+    ``changed_keys`` collects the keys of the created and updated rows.
+    
+    Models with a ``revision`` column get every batch stamped with a fresh
+    revision and a tombstone per deleted row, for the change feed, and the
+    changes are pushed to the WebSocket subscribers of the kind.
+    """
+    
+    def __init__(self, model, cluster, key_fields: Sequence[str], fields: Sequence[str],
+                 scope: Optional[Dict] = None, batch_size: int = 1000):
+        self.model = model
+        self.cluster = cluster
+        self.key_fields = tuple(key_fields)
+        self.fields = tuple(fields)
+        self.batch_size = batch_size
+        self.revisioned = is_revisioned(model)
+        self.stats = {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        self.changed_keys = []
+        self._seen = set()
+        
+        queryset = model.objects.filter(cluster=cluster, **(scope or {}))
+        width = len(self.key_fields)
+        self._existing = {
+            row[1:width + 1]: (row[0], content_digest(row[width + 1:]))
+            for row in queryset.values_list('pk', *self.key_fields, *self.fields).iterator(chunk_size=5000)
+        }
+    
+    def apply(self, rows: Iterable[Dict]):
+        """Insert or update a batch of rows (dicts of model field values)"""
+        now = timezone.now()
+        to_create, to_update, changed = [], [], []
+        
+        for row in rows:
+            key = tuple(row[field] for field in self.key_fields)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            
+            current = self._existing.get(key)
+            if current is None:
+                to_create.append(row)
+                changed.append(row)
+                self.changed_keys.append(key)
+            elif current[1] != content_digest(tuple(row[field] for field in self.fields)):
+                obj = self.model(pk=current[0], cluster=self.cluster, **row)
+                obj.updated_at = now
+                to_update.append(obj)
+                changed.append(row)
+                self.changed_keys.append(key)
+            else:
+                self.stats['unchanged'] += 1
+        
+        if not to_create and not to_update:
+            return
+        
+        with transaction.atomic():
+            revision = reserve_revision(self.cluster) if self.revisioned else None
+            if to_create:
+                # Upsert covers rows inserted concurrently by another sync
+                bulk_upsert(self.model, self.cluster, to_create, self.key_fields, self.fields,
+                            self.batch_size, revision)
+            if to_update:
+                update_fields = [*self.fields, 'updated_at']
+                if revision is not None:
+                    for obj in to_update:
+                        obj.revision = revision
+                    update_fields.append('revision')
+                self.model.objects.bulk_update(to_update, update_fields, batch_size=self.batch_size)
+            if revision is not None:
+                publish_changes(self.model, self.cluster, revision, changed)
+        
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+    
+    def finish(self) -> Dict:
+        """Delete the rows that were not part of the listing and return the stats"""
+        stale = [(key, pk) for key, (pk, _) in self._existing.items() if key not in self._seen]
+        self._delete(stale)
+        return self.stats
+    
+    def _delete(self, stale: List[tuple]):
+        if not stale:
+            return
+        pks = [pk for _, pk in stale]
+        with transaction.atomic():
+            if self.revisioned:
+                keys, revision = [key for key, _ in stale], reserve_revision(self.cluster)
+                record_tombstones(self.model, self.cluster, keys, self.key_fields, revision)
+                publish_changes(self.model, self.cluster, revision, deleted=keys)
+            for start in range(0, len(pks), self.batch_size):
+                self.model.objects.filter(pk__in=pks[start:start + self.batch_size]).delete()
+        self.stats['deleted'] += len(pks)
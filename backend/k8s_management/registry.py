@@ -0,0 +1,142 @@
+from typing import Callable, Dict, Optional, Sequence
+from .models import (Node, Pod, Deployment, ReplicaSet, Service, NodeLabel, PodLabel, DeploymentLabel,
+                     ReplicaSetLabel, ServiceLabel)
+from .quantities import cpu_millicores, memory_bytes
+
+
+class ResourceKind:
+    """How one Kubernetes kind is synced into a model.
+
+    ``name`` is the kind as understood by ``KubernetesClient.iter_resources``
+    (and therefore its lister), ``row_builder`` turns a listed object into model
+    field values, ``key_fields`` identify a row within a cluster and ``fields``
+    are the synced columns compared and written by the reconciler.
+    ``label_model`` is the inverted index of the model's labels, if any.
+    """
+    
+    def __init__(self, name: str, model, key_fields: Sequence[str], fields: Sequence[str],
+                 row_builder: Callable[[Dict], Dict], label_model=None):
+        self.name = name
+        self.model = model
+        self.key_fields = tuple(key_fields)
+        self.fields = tuple(fields)
+        self.row_builder = row_builder
+        self.label_model = label_model
+    
+    @property
+    def namespaced(self) -> bool:
+        return 'namespace' in self.key_fields
+    
+    def __repr__(self):
+        return f'ResourceKind({self.name!r})'
+
+
+# Kinds synced for every cluster, in sync order
+RESOURCE_KINDS: Dict[str, ResourceKind] = {}
+
+
+def register(kind: ResourceKind) -> ResourceKind:
+    RESOURCE_KINDS[kind.name] = kind
+    return kind
+
+
+def kind_for_model(model) -> Optional[ResourceKind]:
+    for kind in RESOURCE_KINDS.values():
+        if kind.model is model:
+            return kind
+    return None
+
+
+def metadata_row(data: Dict) -> Dict:
+    return {'labels': data['labels'], 'annotations': data['annotations']}
+
+
+def node_row(data: Dict) -> Dict:
+    return {
+        'name': data['name'],
+        'status': data['status'],
+        'role': data['role'],
+        'version': data['version'],
+        'os': data['os'],
+        'cpu_capacity': data['cpu_capacity'],
+        'memory_capacity': data['memory_capacity'],
+        'cpu_capacity_millicores': cpu_millicores(data['cpu_capacity']),
+        'memory_capacity_bytes': memory_bytes(data['memory_capacity']),
+        'cpu_allocatable_millicores': cpu_millicores(data['cpu_allocatable']),
+        'memory_allocatable_bytes': memory_bytes(data['memory_allocatable']),
+        **metadata_row(data),
+    }
+
+
+def pod_row(data: Dict) -> Dict:
+    return {
+        'name': data['name'],
+        'namespace': data['namespace'],
+        'status': data['status'],
+        'node': data['node'] or '',
+        'ip': data['ip'],
+        'restarts': data['restarts'],
+        'ready': data['ready'],
+        'owner_kind': data['owner_kind'],
+        'owner_name': data['owner_name'],
+        'cpu_request_millicores': data['cpu_requests'],
+        'memory_request_bytes': data['memory_requests'],
+        **metadata_row(data),
+    }
+
+
+def deployment_row(data: Dict) -> Dict:
+    return {
+        'name': data['name'],
+        'namespace': data['namespace'],
+        'replicas': data['replicas'],
+        'ready_replicas': data['ready_replicas'],
+        'available_replicas': data['available_replicas'],
+        **metadata_row(data),
+    }
+
+
+def replicaset_row(data: Dict) -> Dict:
+    return {
+        'name': data['name'],
+        'namespace': data['namespace'],
+        'replicas': data['replicas'],
+        'ready_replicas': data['ready_replicas'],
+        'available_replicas': data['available_replicas'],
+        'owner_kind': data['owner_kind'],
+        'owner_name': data['owner_name'],
+        **metadata_row(data),
+    }
+
+
+def service_row(data: Dict) -> Dict:
+    return {
+        'name': data['name'],
+        'namespace': data['namespace'],
+        'service_type': data['type'],
+        'cluster_ip': data['cluster_ip'] if data['cluster_ip'] not in (None, 'None') else None,
+        'external_ip': data['external_ip'] or '',
+        'ports': data['ports'],
+        **metadata_row(data),
+    }
+
+
+register(ResourceKind('nodes', Node, ('name',),
+                      ('status', 'role', 'version', 'os', 'cpu_capacity', 'memory_capacity',
+                       'cpu_capacity_millicores', 'memory_capacity_bytes',
+                       'cpu_allocatable_millicores', 'memory_allocatable_bytes', 'labels', 'annotations'),
+                      node_row, NodeLabel))
+register(ResourceKind('pods', Pod, ('namespace', 'name'),
+                      ('status', 'node', 'ip', 'restarts', 'ready', 'owner_kind', 'owner_name',
+                       'cpu_request_millicores', 'memory_request_bytes', 'labels', 'annotations'),
+                      pod_row, PodLabel))
+register(ResourceKind('deployments', Deployment, ('namespace', 'name'),
+                      ('replicas', 'ready_replicas', 'available_replicas', 'labels', 'annotations'),
+                      deployment_row, DeploymentLabel))
+register(ResourceKind('replicasets', ReplicaSet, ('namespace', 'name'),
+                      ('replicas', 'ready_replicas', 'available_replicas', 'owner_kind', 'owner_name',
+                       'labels', 'annotations'),
+                      replicaset_row, ReplicaSetLabel))
+register(ResourceKind('services', Service, ('namespace', 'name'),
+                      ('service_type', 'cluster_ip', 'external_ip', 'ports', 'labels', 'annotations'),
+                      service_row, ServiceLabel))
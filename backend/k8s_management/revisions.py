@@ -0,0 +1,59 @@
+from typing import List, Sequence
+from django.db import transaction
+from django.db.models import F, Max
+from .models import RevisionCounter, Tombstone
+
+
+def is_revisioned(model) -> bool:
+    """Whether writes to the model are stamped with revisions"""
+    return any(field.name == 'revision' for field in model._meta.concrete_fields)
+
+
+def reserve_revision(cluster) -> int:
+    """Take the next revision of the cluster.
+    
+    Revisions are counted per cluster, so syncs of different clusters never
+    wait on each other. Must be called inside the transaction that writes the
+    stamped rows: the cluster's counter row stays locked until that
+    transaction commits, so its revisions become visible in order and a reader
+    never skips a lower revision that commits late.
+    """
+    counter = RevisionCounter.objects.filter(cluster=cluster)
+    if not counter.update(value=F('value') + 1):
+        RevisionCounter.objects.get_or_create(cluster=cluster)
+        counter.update(value=F('value') + 1)
+    return counter.values_list('value', flat=True).get()
+
+
+def current_revision(cluster) -> int:
+    """Highest committed revision of the cluster"""
+    return RevisionCounter.objects.filter(cluster=cluster).values_list('value', flat=True).first() or 0
+
+
+def pruned_through(cluster) -> int:
+    """Highest revision of the cluster whose tombstones have been pruned"""
+    return RevisionCounter.objects.filter(cluster=cluster).values_list('pruned_through', flat=True).first() or 0
+
+
+def record_tombstones(model, cluster, keys: List[tuple], key_fields: Sequence[str], revision: int):
+    """Write a tombstone for every deleted key of a synced model"""
+    Tombstone.objects.bulk_create([
+        Tombstone(cluster=cluster, kind=model._meta.model_name, revision=revision,
+                  **{'namespace': '', **dict(zip(key_fields, key))})
+        for key in keys
+    ], batch_size=1000)
+
+
+def prune_tombstones(before) -> int:
+    """Delete the tombstones recorded before ``before`` and advance each cluster's ``pruned_through``"""
+    with transaction.atomic():
+        tombstones = Tombstone.objects.filter(deleted_at__lt=before)
+        highest = dict(tombstones.order_by().values_list('cluster').annotate(Max('revision')))
+        if not highest:
+            return 0
+        deleted = tombstones.delete()[0]
+        for cluster_id, revision in highest.items():
+            RevisionCounter.objects.get_or_create(cluster_id=cluster_id)
+            RevisionCounter.objects.filter(cluster_id=cluster_id, pruned_through__lt=revision).update(
+                pruned_through=revision)
+    return deleted
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/kubernetes/updates/', consumers.ClusterUpdatesConsumer.as_asgi()),
+    path('ws/kubernetes/clusters/<int:cluster_id>/namespaces/<str:namespace>/logs/',
+         consumers.PodLogConsumer.as_asgi()),
+    path('ws/kubernetes/clusters/<int:cluster_id>/namespaces/<str:namespace>/pods/<str:pod>/exec/',
+         consumers.PodExecConsumer.as_asgi()),
+]
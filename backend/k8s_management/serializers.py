@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Cluster, Node, Pod, Deployment, Service
+from .models import Cluster, ClusterSyncRun, Node, Pod, Deployment, ReplicaSet, Service
 
 
 class ClusterSerializer(serializers.ModelSerializer):
@@ -13,9 +13,12 @@ class ClusterSerializer(serializers.ModelSerializer):
                   'api_server_url', 'kubeconfig', 'status', 'version',
                   'node_count', 'pod_count', 'namespace_count', 'nodes_count', 'pods_count',
                   'kubernetes_dashboard_url', 'kiali_dashboard_url', 'argocd_dashboard_url',
-                  'created_at', 'updated_at', 'last_synced']
+                  'created_at', 'updated_at', 'last_synced',
+                  'sync_task_id', 'sync_started_at', 'next_sync_at', 'sync_failures', 'last_sync_error']
         read_only_fields = ['id', 'status', 'version', 'node_count', 'pod_count', 
-                           'namespace_count', 'created_at', 'updated_at', 'last_synced']
+                           'namespace_count', 'created_at', 'updated_at', 'last_synced',
+                           'sync_task_id', 'sync_started_at', 'next_sync_at', 'sync_failures',
+                           'last_sync_error']
     
     def get_nodes_count(self, obj):
         return obj.nodes.count()
@@ -48,8 +51,10 @@ class NodeSerializer(serializers.ModelSerializer):
         model = Node
         fields = ['id', 'cluster', 'cluster_name', 'name', 'status', 'role', 'version', 'os',
                   'cpu_capacity', 'memory_capacity', 'cpu_usage', 'memory_usage',
-                  'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+                  'cpu_capacity_millicores', 'memory_capacity_bytes',
+                  'cpu_allocatable_millicores', 'memory_allocatable_bytes', 'labels', 'annotations',
+                  'revision', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'revision', 'created_at', 'updated_at']
 
 
 class PodSerializer(serializers.ModelSerializer):
@@ -58,9 +63,12 @@ class PodSerializer(serializers.ModelSerializer):
     class Meta:
         model = Pod
         fields = ['id', 'cluster', 'cluster_name', 'name', 'namespace', 'status', 
-                  'node', 'ip', 'cpu_usage', 'memory_usage', 'restarts',
-                  'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+                  'node', 'ip', 'ready', 'cpu_usage', 'memory_usage', 'restarts',
+                  'owner_kind', 'owner_name', 'workload_kind', 'workload_name', 'deployment',
+                  'cpu_request_millicores', 'memory_request_bytes',
+                  'cpu_usage_millicores', 'memory_usage_bytes', 'labels', 'annotations',
+                  'revision', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'revision', 'created_at', 'updated_at']
 
 
 class DeploymentSerializer(serializers.ModelSerializer):
@@ -69,9 +77,21 @@ class DeploymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Deployment
         fields = ['id', 'cluster', 'cluster_name', 'name', 'namespace', 
-                  'replicas', 'ready_replicas', 'available_replicas', 'image',
-                  'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+                  'replicas', 'ready_replicas', 'available_replicas', 'image', 'labels', 'annotations',
+                  'revision', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'revision', 'created_at', 'updated_at']
+
+
+class ReplicaSetSerializer(serializers.ModelSerializer):
+    cluster_name = serializers.CharField(source='cluster.name', read_only=True)
+    
+    class Meta:
+        model = ReplicaSet
+        fields = ['id', 'cluster', 'cluster_name', 'name', 'namespace',
+                  'replicas', 'ready_replicas', 'available_replicas',
+                  'owner_kind', 'owner_name', 'deployment', 'labels', 'annotations',
+                  'revision', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'revision', 'created_at', 'updated_at']
 
 
 class ServiceSerializer(serializers.ModelSerializer):
@@ -80,6 +100,14 @@ class ServiceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Service
         fields = ['id', 'cluster', 'cluster_name', 'name', 'namespace', 'service_type',
-                  'cluster_ip', 'external_ip', 'ports',
-                  'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+                  'cluster_ip', 'external_ip', 'ports', 'labels', 'annotations',
+                  'revision', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'revision', 'created_at', 'updated_at']
+
+
+class ClusterSyncRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ClusterSyncRun
+        fields = ['id', 'cluster', 'mode', 'status', 'error', 'started_at', 'duration', 'phases',
+                  'queries', 'query_count', 'api_requests', 'bytes_received', 'object_counts', 'changes']
+        read_only_fields = fields
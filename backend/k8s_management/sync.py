@@ -0,0 +1,203 @@
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional
+from django.conf import settings
+from django.utils import timezone
+from .models import Cluster
+from .k8s_client import KubernetesClient
+from .labels import refresh_label_index
+from .instrumentation import phase, record_objects
+from .inventory import refresh_inventory
+from .ownership import resolve_ownership
+from .reconcile import Reconciler
+from .registry import RESOURCE_KINDS, ResourceKind
+
+
+class ClusterSnapshot:
+    """Single pass over a cluster's resources.
+    
+    Each resource type is listed exactly once. The pages are handed to the
+    caller for the entity upserts and, on the way through, used to tally the
+    cluster-level counters, so metrics and entity sync share the same data.
+    """
+    
+    def __init__(self, k8s_client: KubernetesClient):
+        self.k8s_client = k8s_client
+        self.counts = Counter()
+        self.namespace_count = 0
+        self.pod_phases = Counter()
+    
+    def pages(self, kind: str, namespace: Optional[str] = None) -> Iterator[List[Dict]]:
+        pages = self.k8s_client.iter_resources(kind, namespace)
+        while True:
+            with phase('list'):
+                page = next(pages, None)
+            if page is None:
+                break
+            self.counts[kind] += len(page)
+            record_objects(kind, len(page))
+            if kind == 'pods':
+                self.pod_phases.update(pod['status'] for pod in page)
+            yield page
+    
+    def count_namespaces(self) -> int:
+        with phase('list'):
+            self.namespace_count = self.k8s_client.count_namespaces()
+        return self.namespace_count
+    
+    def metrics(self) -> Dict:
+        """Cluster metrics tallied from the pages consumed so far"""
+        return {
+            'node_count': self.counts['nodes'],
+            'pod_count': self.counts['pods'],
+            'namespace_count': self.namespace_count,
+            'running_pods': self.pod_phases['running'],
+            'pending_pods': self.pod_phases['pending'],
+            'failed_pods': self.pod_phases['failed'],
+        }
+
+
+def reconcile_pages(kind: ResourceKind, cluster: Cluster, pages: Iterable[List[Dict]],
+                    scope: Optional[Dict] = None) -> Dict:
+    """Reconcile a stream of pages of one kind into its model's rows for the cluster.
+    
+    Each page is written as soon as it arrives; rows that no longer exist in
+    the cluster (within ``scope``, if given) are deleted once every page has
+    been consumed.
+    """
+    with phase('write'):
+        reconciler = Reconciler(kind.model, cluster, kind.key_fields, kind.fields, scope=scope,
+                                batch_size=getattr(settings, 'K8S_SYNC_BATCH_SIZE', 1000))
+    for page in pages:
+        with phase('write'):
+            reconciler.apply(kind.row_builder(data) for data in page)
+    with phase('write'):
+        stats = reconciler.finish()
+        refresh_label_index(kind, cluster, reconciler.changed_keys)
+    return stats
+
+
+def sync_cluster(cluster: Cluster, k8s_client: KubernetesClient) -> Dict:
+    """Sync every registered resource kind of a cluster and refresh its counters.
+    
+    Returns the cluster metrics, version, per-kind reconcile stats, the
+    number of rows whose ownership links changed and the API requests,
+    throttles and retries it took.
+    """
+    api_before = k8s_client.policy.stats()
+    snapshot = ClusterSnapshot(k8s_client)
+    with phase('version'):
+        version = k8s_client.get_cluster_version()
+    snapshot.count_namespaces()
+    
+    changes = {}
+    for kind in RESOURCE_KINDS.values():
+        changes[kind.name] = reconcile_pages(kind, cluster, snapshot.pages(kind.name))
+    with phase('ownership'):
+        ownership = resolve_ownership(cluster)
+    with phase('inventory'):
+        refresh_inventory(cluster)
+    
+    metrics = snapshot.metrics()
+    with phase('write'):
+        update_cluster_counters(cluster, version, metrics)
+    
+    return {'metrics': metrics, 'version': version, 'changes': changes, 'ownership': ownership,
+            'api': k8s_client.policy.delta(api_before)}
+
+
+def update_cluster_counters(cluster: Cluster, version: str, metrics: Dict):
+    """Store the version and counters of a completed sync and mark the cluster healthy"""
+    cluster.version = version
+    cluster.node_count = metrics['node_count']
+    cluster.pod_count = metrics['pod_count']
+    cluster.namespace_count = metrics['namespace_count']
+    cluster.status = 'healthy'
+    cluster.last_synced = timezone.now()
+    cluster.save(update_fields=['version', 'node_count', 'pod_count', 'namespace_count',
+                                'status', 'last_synced', 'updated_at'])
+
+
+def shard_of(namespace: str, shards: int) -> int:
+    """Shard of a namespace; stable across processes and runs (unlike hash())"""
+    return zlib.crc32(namespace.encode()) % shards
+
+
+def split_namespaces(namespaces: Iterable[str], shards: int) -> List[List[str]]:
+    """Group namespaces by shard, dropping empty shards"""
+    groups = [[] for _ in range(shards)]
+    for namespace in namespaces:
+        groups[shard_of(namespace, shards)].append(namespace)
+    return [group for group in groups if group]
+
+
+def list_namespaces(k8s_client: KubernetesClient) -> List[str]:
+    """Names of every namespace, listed as metadata only"""
+    return [item['name'] for page in k8s_client.iter_resources('namespaces', projection='metadata')
+            for item in page]
+
+
+def sync_cluster_scoped(cluster: Cluster, k8s_client: KubernetesClient) -> Dict:
+    """Sync the kinds that are not namespaced (nodes); the first step of a sharded sync"""
+    snapshot = ClusterSnapshot(k8s_client)
+    changes = {kind.name: reconcile_pages(kind, cluster, snapshot.pages(kind.name))
+               for kind in RESOURCE_KINDS.values() if not kind.namespaced}
+    return {'counts': dict(snapshot.counts), 'changes': changes}
+
+
+def sync_namespace_shard(cluster: Cluster, k8s_client: KubernetesClient, namespaces: List[str]) -> Dict:
+    """List and reconcile the namespaced kinds of a group of namespaces.
+    
+    Each kind is listed namespace by namespace and reconciled against the rows
+    of those namespaces only, so shards of the same cluster run independently
+    and a shard can be retried on its own.
+    """
+    snapshot = ClusterSnapshot(k8s_client)
+    changes = {}
+    for kind in RESOURCE_KINDS.values():
+        if not kind.namespaced:
+            continue
+        pages = (page for namespace in namespaces for page in snapshot.pages(kind.name, namespace))
+        changes[kind.name] = reconcile_pages(kind, cluster, pages, scope={'namespace__in': namespaces})
+    return {'counts': dict(snapshot.counts), 'changes': changes}
+
+
+def finish_sharded_sync(cluster: Cluster, version: str, namespaces: List[str], results: List[Dict]) -> Dict:
+    """Combine the results of a sharded sync and refresh the cluster rollups.
+    
+    ``results`` are those of :func:`sync_cluster_scoped` and of every
+    :func:`sync_namespace_shard`. Rows of namespaces that no longer exist
+    belong to no shard, so they are deleted here. Then ownership, the
+    inventory summary and the cluster counters are refreshed as at the end
+    of :func:`sync_cluster`.
+    """
+    counts, changes = Counter(), {}
+    
+    def add_changes(kind_name, stats):
+        total = changes.setdefault(kind_name, Counter())
+        total.update(stats)
+    
+    for result in results:
+        counts.update(result['counts'])
+        for kind_name, stats in result['changes'].items():
+            add_changes(kind_name, stats)
+    
+    listed = set(namespaces)
+    for kind in RESOURCE_KINDS.values():
+        if not kind.namespaced:
+            continue
+        stored = kind.model.objects.filter(cluster=cluster).values_list('namespace', flat=True).distinct()
+        vanished = sorted(set(stored) - listed)
+        if vanished:
+            add_changes(kind.name, reconcile_pages(kind, cluster, [], scope={'namespace__in': vanished}))
+    
+    with phase('ownership'):
+        ownership = resolve_ownership(cluster)
+    with phase('inventory'):
+        refresh_inventory(cluster)
+    
+    metrics = {'node_count': counts['nodes'], 'pod_count': counts['pods'], 'namespace_count': len(namespaces)}
+    with phase('write'):
+        update_cluster_counters(cluster, version, metrics)
+    return {'metrics': metrics, 'version': version, 'ownership': ownership,
+            'changes': {kind_name: dict(stats) for kind_name, stats in changes.items()}}
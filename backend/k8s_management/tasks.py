@@ -0,0 +1,246 @@
+import random
+from datetime import timedelta
+from celery import chord, shared_task
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Cluster, ClusterSyncRun
+from .k8s_client import get_kubernetes_client
+from .sync import (finish_sharded_sync, list_namespaces, split_namespaces, sync_cluster,
+                   sync_cluster_scoped, sync_namespace_shard)
+from .usage import collect_cluster_usage
+from .timeseries import apply_retention, rollup
+from .revisions import prune_tombstones
+from .instrumentation import phase, record_sync_run
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def claim_cluster_sync(cluster: Cluster) -> bool:
+    """Mark the cluster as syncing; False when a sync of it is already running"""
+    return bool(Cluster.objects.filter(pk=cluster.pk, sync_started_at__isnull=True).update(
+        sync_started_at=timezone.now()
+    ))
+
+
+def enqueue_cluster_sync(cluster: Cluster, countdown: float = 0):
+    """Claim the cluster for syncing and queue the sync task.
+
+    Returns the task id, or None when a sync of the cluster is already running.
+    """
+    if not claim_cluster_sync(cluster):
+        return None
+    
+    try:
+        result = sync_cluster_task.apply_async((cluster.pk,), countdown=countdown)
+    except Exception:
+        Cluster.objects.filter(pk=cluster.pk).update(sync_started_at=None)
+        raise
+    Cluster.objects.filter(pk=cluster.pk).update(sync_task_id=result.id)
+    return result.id
+
+
+def refresh_cluster_sync(cluster: Cluster):
+    """Renew a claim that is still held, so progress of a long sharded sync keeps it from going stale"""
+    Cluster.objects.filter(pk=cluster.pk, sync_started_at__isnull=False).update(sync_started_at=timezone.now())
+
+
+def release_cluster_sync(cluster: Cluster, error: Exception = None):
+    """Release the sync claim and schedule the next run, backing off after failures"""
+    interval = _setting('K8S_SYNC_INTERVAL', 60)
+    jitter = random.uniform(0, _setting('K8S_SYNC_JITTER', 10))
+    
+    if error is None:
+        Cluster.objects.filter(pk=cluster.pk).update(
+            sync_task_id='', sync_started_at=None, sync_failures=0, last_sync_error='',
+            next_sync_at=timezone.now() + timedelta(seconds=interval + jitter),
+        )
+        return
+    
+    # Back off exponentially for clusters that keep failing
+    failures = cluster.sync_failures + 1
+    delay = min(interval * 2 ** failures, _setting('K8S_SYNC_MAX_BACKOFF', 1800))
+    Cluster.objects.filter(pk=cluster.pk).update(
+        status='offline', sync_task_id='', sync_started_at=None,
+        sync_failures=failures, last_sync_error=str(error),
+        next_sync_at=timezone.now() + timedelta(seconds=delay + jitter),
+    )
+
+
+def use_sharded_sync(cluster: Cluster) -> bool:
+    """Whether the cluster is large enough to be synced in namespace shards"""
+    return (_setting('K8S_SYNC_SHARDS', 1) > 1
+            and cluster.pod_count >= _setting('K8S_SYNC_SHARD_MIN_PODS', 50000))
+
+
+def run_cluster_sync(cluster: Cluster):
+    """Sync a claimed cluster, then release the claim and schedule its next run.
+    
+    Large clusters are handed to :func:`start_sharded_sync`, whose final step
+    releases the claim instead. Every run is recorded as a ClusterSyncRun.
+    """
+    sharded = use_sharded_sync(cluster)
+    try:
+        with record_sync_run(cluster, 'sharded' if sharded else 'full') as recorder:
+            with phase('connect'):
+                k8s_client = get_kubernetes_client(cluster)
+                if not k8s_client.test_connection():
+                    raise Exception('Failed to connect to cluster')
+            
+            if sharded:
+                result = start_sharded_sync(cluster, k8s_client)
+            else:
+                result = sync_cluster(cluster, k8s_client)
+            recorder.changes = result['changes']
+        
+        if not sharded:
+            release_cluster_sync(cluster)
+        return result
+    
+    except Exception as e:
+        release_cluster_sync(cluster, e)
+        raise
+
+
+def start_sharded_sync(cluster: Cluster, k8s_client) -> dict:
+    """Sync the cluster-scoped kinds, then fan the namespaces out to shard tasks.
+    
+    Namespaces are grouped by a hash of their name into K8S_SYNC_SHARDS
+    groups, each synced by its own task (so on any worker) and retried on its
+    own. A chord callback combines the shard results once all succeeded.
+    """
+    with phase('version'):
+        version = k8s_client.get_cluster_version()
+    with phase('list'):
+        namespaces = list_namespaces(k8s_client)
+    scoped = sync_cluster_scoped(cluster, k8s_client)
+    
+    shards = split_namespaces(namespaces, _setting('K8S_SYNC_SHARDS', 1))
+    callback = finish_sharded_sync_task.s(cluster.pk, version, namespaces, scoped).on_error(
+        sharded_sync_failed.s(cluster.pk)
+    )
+    result = chord(sync_namespace_shard_task.s(cluster.pk, group) for group in shards)(callback)
+    return {'sharded': True, 'shards': len(shards), 'task_id': result.id, 'changes': scoped['changes']}
+
+
+@shared_task
+def sync_cluster_task(cluster_id):
+    """Sync one cluster and schedule its next run"""
+    try:
+        cluster = Cluster.objects.get(id=cluster_id)
+    except Cluster.DoesNotExist:
+        return None
+    return run_cluster_sync(cluster)
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True,
+             max_retries=getattr(settings, 'K8S_SYNC_SHARD_RETRIES', 3))
+def sync_namespace_shard_task(cluster_id, namespaces):
+    """Sync the namespaced kinds of one shard of a cluster's namespaces"""
+    cluster = Cluster.objects.get(id=cluster_id)
+    refresh_cluster_sync(cluster)
+    with record_sync_run(cluster, 'shard') as recorder:
+        with phase('connect'):
+            k8s_client = get_kubernetes_client(cluster)
+        result = sync_namespace_shard(cluster, k8s_client, namespaces)
+        recorder.changes = result['changes']
+    refresh_cluster_sync(cluster)
+    return result
+
+
+@shared_task
+def finish_sharded_sync_task(shard_results, cluster_id, version, namespaces, scoped):
+    """Chord callback of a sharded sync: combine the shards and release the claim"""
+    cluster = Cluster.objects.get(id=cluster_id)
+    refresh_cluster_sync(cluster)
+    try:
+        with record_sync_run(cluster, 'finish') as recorder:
+            result = finish_sharded_sync(cluster, version, namespaces, [scoped, *shard_results])
+            recorder.changes = result['changes']
+    except Exception as e:
+        release_cluster_sync(cluster, e)
+        raise
+    release_cluster_sync(cluster)
+    return {**result, 'shards': len(shard_results)}
+
+
+@shared_task
+def sharded_sync_failed(request, exc, traceback, cluster_id):
+    """Error callback of a sharded sync whose shard ran out of retries"""
+    cluster = Cluster.objects.filter(id=cluster_id).first()
+    if cluster:
+        release_cluster_sync(cluster, exc)
+
+
+@shared_task
+def schedule_cluster_syncs():
+    """Queue syncs for every cluster that is due, at most K8S_SYNC_MAX_CONCURRENT at once"""
+    now = timezone.now()
+    
+    # Release claims of syncs that died without clearing them; sharded syncs renew
+    # theirs as each shard starts and finishes, so only a stalled chord goes stale
+    stale_before = now - timedelta(seconds=_setting('K8S_SYNC_TIMEOUT', 900))
+    Cluster.objects.filter(sync_started_at__lt=stale_before).update(sync_started_at=None, sync_task_id='')
+    
+    running = Cluster.objects.filter(sync_started_at__isnull=False).count()
+    slots = _setting('K8S_SYNC_MAX_CONCURRENT', 10) - running
+    if slots <= 0:
+        return 0
+    
+    due = Cluster.objects.filter(
+        Q(next_sync_at__isnull=True) | Q(next_sync_at__lte=now),
+        sync_started_at__isnull=True,
+    ).order_by(F('next_sync_at').asc(nulls_first=True))[:slots]
+    
+    queued = 0
+    for cluster in due:
+        countdown = random.uniform(0, _setting('K8S_SYNC_JITTER', 10))
+        if enqueue_cluster_sync(cluster, countdown=countdown):
+            queued += 1
+    return queued
+
+
+@shared_task
+def collect_cluster_usage_task(cluster_id):
+    """Refresh node and pod usage of one cluster from metrics-server"""
+    try:
+        cluster = Cluster.objects.get(id=cluster_id)
+    except Cluster.DoesNotExist:
+        return None
+    return collect_cluster_usage(cluster, get_kubernetes_client(cluster))
+
+
+@shared_task
+def schedule_usage_collection():
+    """Queue a usage refresh for every reachable cluster.
+    
+    Runs every K8S_USAGE_INTERVAL seconds, more often than the full sync.
+    Queued collections expire after one interval so a slow worker never
+    builds up a backlog of stale refreshes.
+    """
+    interval = _setting('K8S_USAGE_INTERVAL', 15)
+    cluster_ids = list(Cluster.objects.exclude(status='offline').values_list('pk', flat=True))
+    for cluster_id in cluster_ids:
+        collect_cluster_usage_task.apply_async((cluster_id,), expires=interval)
+    return len(cluster_ids)
+
+
+@shared_task
+def rollup_usage_history():
+    """Downsample complete usage blocks into the 1h/1d tiers and drop expired ones"""
+    return {'rolled_up': rollup(), 'deleted': apply_retention()}
+
+
+@shared_task
+def prune_tombstones_task():
+    """Drop tombstones older than K8S_TOMBSTONE_RETENTION"""
+    return prune_tombstones(timezone.now() - timedelta(seconds=_setting('K8S_TOMBSTONE_RETENTION', 86400)))
+
+
+@shared_task
+def prune_sync_runs():
+    """Drop sync run history older than K8S_SYNC_RUN_RETENTION"""
+    before = timezone.now() - timedelta(seconds=_setting('K8S_SYNC_RUN_RETENTION', 7 * 86400))
+    return ClusterSyncRun.objects.filter(started_at__lt=before).delete()[0]
@@ -0,0 +1,34 @@
+from cryptography.fernet import Fernet
+from django.test import TestCase, override_settings
+from .fake_apiserver import FakeApiServer
+from .. import throttle
+from ..k8s_client import KubernetesClient
+from ..models import Cluster
+
+
+@override_settings(ENCRYPTION_KEY=Fernet.generate_key().decode(),
+                   K8S_API_QPS=0, K8S_API_MAX_RETRIES=0, K8S_PUSH_ENABLED=False)
+class FakeClusterTestCase(TestCase):
+    """A cluster served by a fresh fake API server in every test, with its own (unpooled) client.
+    
+    ``fake_cluster`` holds the FakeApiServer arguments; subclasses override it
+    to change the size of the fake cluster.
+    """
+    fake_cluster = {'nodes': 4, 'pods': 30, 'namespaces': 3}
+    
+    def setUp(self):
+        # Request policies outlive clients; start each test from the overridden settings
+        throttle._policies.clear()
+        self.server = FakeApiServer(**self.fake_cluster).start()
+        self.addCleanup(self.server.stop)
+        self.cluster = self.create_cluster('test')
+        self.k8s_client = KubernetesClient(self.cluster)
+        self.addCleanup(self.k8s_client.close)
+    
+    def create_cluster(self, name: str, server: FakeApiServer = None) -> Cluster:
+        server = server or self.server
+        cluster = Cluster(name=name)
+        cluster.api_server_url = server.url
+        cluster.set_kubeconfig(server.kubeconfig())
+        cluster.save()
+        return cluster
@@ -0,0 +1,463 @@
+"""In-process fake Kubernetes API server for the tests, benchmarks and local testing.
+
+Serves list calls for nodes, namespaces, pods, deployments, replicasets and
+services, cluster-wide or per namespace (with ``limit``/``continue``
+pagination, equality-based label and field selectors, and the metadata-only
+and Table projections), watch streams of the same paths (``?watch=1``,
+following ``resourceVersion`` until ``timeoutSeconds``), single pods, the
+logs of their containers (``tailLines``, ``limitBytes``), exec and attach
+sessions that echo their input, and the metrics.k8s.io node and pod metrics that metrics-server would provide, all
+from synthetic fixtures.
+
+    server = FakeApiServer(nodes=50, pods=1000).start()
+    cluster.set_kubeconfig(server.kubeconfig())
+    server.fake.churn(0.01)  # modify and replace 1% of the pods, as watch events
+    ...
+    server.stop()
+
+Run as a module to serve a fake cluster from its own process (so its memory
+does not count against the process being measured); it prints its URL, and
+``POST /fake/churn?fraction=0.01`` churns pods remotely:
+
+    python -m k8s_management.tests.fake_apiserver --nodes 100 --pods 10000
+"""
+import argparse
+import base64
+import bisect
+import copy
+import hashlib
+import json
+import re
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from websocket import ABNF
+
+from .fixtures import (make_deployment, make_node, make_node_metrics, make_pod, make_pod_metrics,
+                       make_replicaset, make_service)
+
+
+NAMESPACED_PATH = re.compile(r'^(/api/v1|/apis/[^/]+/[^/]+)/namespaces/([^/]+)/([^/]+)$')
+POD_PATH = re.compile(r'^/api/v1/namespaces/([^/]+)/pods/([^/]+)(?:/(log|exec|attach))?$')
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+SELECTOR_TERM = re.compile(r'^(!?)([^!=]+)(?:(==|!=|=)(.*))?$')
+
+
+def _field(item: dict, path: str):
+    value = item
+    for part in path.split('.'):
+        value = (value or {}).get(part)
+    return value
+
+
+def selected(item: dict, label_selector: str = '', field_selector: str = '') -> bool:
+    """Whether an object matches equality-based selectors (``a=b``, ``a!=b``, ``a``, ``!a``)"""
+    labels = item['metadata'].get('labels') or {}
+    for selector, lookup in ((label_selector, labels.get), (field_selector, lambda path: _field(item, path))):
+        for term in filter(None, selector.split(',')):
+            negated, key, operator, value = SELECTOR_TERM.match(term.strip()).groups()
+            actual = lookup(key.strip())
+            if operator is None:
+                if (actual is None) != bool(negated):
+                    return False
+            elif (str(actual) == value.strip()) != (operator != '!='):
+                return False
+    return True
+
+
+class FakeCluster:
+    """The objects served by a fake API server, and the watch events of their changes"""
+    
+    def __init__(self, nodes: int = 10, pods: int = 100, namespaces: int = 20, metrics: bool = True):
+        self.nodes = [make_node(i) for i in range(nodes)]
+        self.namespaces = [{'metadata': {'name': f'ns-{i}', 'resourceVersion': '1'}} for i in range(namespaces)]
+        # Pods come in groups of ten per app, each app a Deployment -> ReplicaSet in one namespace
+        self.pods = [make_pod(i, f'ns-{i // 10 % namespaces}', f'node-{i % max(nodes, 1)}') for i in range(pods)]
+        apps = (pods + 9) // 10
+        self.deployments = [make_deployment(app, f'ns-{app % namespaces}') for app in range(apps)]
+        self.replicasets = [make_replicaset(app, f'ns-{app % namespaces}') for app in range(apps)]
+        self.services = [make_service(app, f'ns-{app % namespaces}') for app in range(apps)]
+        self.metrics = metrics
+        # (namespace, pod, container) -> log lines, for containers that should not log the synthetic lines
+        self.logs = {}
+        # Exec and attach sessions opened: pod, command, container, stdin received and terminal resizes
+        self.exec_sessions = []
+        # While set, sessions stop reading their stdin, as a pod that does not consume its input
+        self.exec_stalled = False
+        # Status answered for metrics.k8s.io while set, e.g. 503 for a registered but unreachable metrics-server
+        self.metrics_status = None
+        # (path, parsed query) of every GET served, for tests to check what was asked
+        self.requests = []
+        self.revision = 200000
+        self.generation = 0
+        # (revision, list path, event), in revision order
+        self.events = []
+        self._event_revisions = []
+        self._changed = threading.Condition()
+        self._lists = self._build_lists()
+    
+    @property
+    def resource_version(self) -> str:
+        return str(self.revision)
+    
+    def _build_lists(self) -> dict:
+        lists = {
+            '/api/v1/nodes': ('NodeList', self.nodes),
+            '/api/v1/namespaces': ('NamespaceList', self.namespaces),
+            '/api/v1/pods': ('PodList', self.pods),
+            '/apis/apps/v1/deployments': ('DeploymentList', self.deployments),
+            '/apis/apps/v1/replicasets': ('ReplicaSetList', self.replicasets),
+            '/api/v1/services': ('ServiceList', self.services),
+        }
+        if self.metrics:
+            lists['/apis/metrics.k8s.io/v1beta1/nodes'] = (
+                'NodeMetricsList', [make_node_metrics(node) for node in self.nodes])
+            lists['/apis/metrics.k8s.io/v1beta1/pods'] = (
+                'PodMetricsList', [make_pod_metrics(pod) for pod in self.pods])
+        return lists
+    
+    def lists(self) -> dict:
+        """path -> (list kind, items)"""
+        return self._lists
+    
+    def find_pod(self, namespace: str, name: str):
+        for pod in self.pods:
+            if pod['metadata']['namespace'] == namespace and pod['metadata']['name'] == name:
+                return pod
+        return None
+    
+    def pod_log(self, namespace: str, pod: str, container: str) -> list:
+        """Lines of a container log, each with the timestamp the API server prefixes with ``timestamps=true``"""
+        lines = self.logs.get((namespace, pod, container))
+        if lines is None:
+            lines = [f"{'ERROR' if n % 5 == 4 else 'INFO'} {container} handled request {n}" for n in range(10)]
+        return [f'2024-01-01T00:00:{n % 60:02d}.000000000Z {line}' for n, line in enumerate(lines)]
+    
+    def _record(self, path: str, event_type: str, obj: dict):
+        self.revision += 1
+        obj['metadata']['resourceVersion'] = self.resource_version
+        self.events.append((self.revision, path, {'type': event_type, 'object': obj}))
+        self._event_revisions.append(self.revision)
+    
+    def churn(self, fraction: float = 0.01) -> int:
+        """Change ``fraction`` of the pods, as a rolling restart would; returns the pods touched.
+        
+        Every other selected pod gets a container restart (MODIFIED); the
+        others are replaced by a pod of a new name (DELETED, then ADDED).
+        Pod metrics keep describing the original pods.
+        """
+        if not self.pods or fraction <= 0:
+            return 0
+        step = max(int(1 / fraction), 1)
+        touched = 0
+        with self._changed:
+            self.generation += 1
+            for position in range(0, len(self.pods), step):
+                pod = self.pods[position]
+                if touched % 2 == 0:
+                    for status in pod['status']['containerStatuses']:
+                        status['restartCount'] += 1
+                    self._record('/api/v1/pods', 'MODIFIED', pod)
+                else:
+                    self._record('/api/v1/pods', 'DELETED', copy.deepcopy(pod))
+                    replacement = copy.deepcopy(pod)
+                    metadata = replacement['metadata']
+                    metadata['name'] = f"{metadata['name'].rsplit('-', 1)[0]}-g{self.generation}x{position:05d}"
+                    metadata['uid'] = f"{self.generation:08d}{metadata['uid'][8:]}"
+                    self.pods[position] = replacement
+                    self._record('/api/v1/pods', 'ADDED', replacement)
+                touched += 1
+            self._changed.notify_all()
+        return touched
+    
+    def wait_events(self, path: str, since: int, deadline: float) -> list:
+        """Events of a list path after revision ``since``, waiting for some until ``deadline``"""
+        with self._changed:
+            while True:
+                start = bisect.bisect_right(self._event_revisions, since)
+                events = [(revision, event) for revision, event_path, event in self.events[start:]
+                          if event_path == path]
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self._changed.wait(remaining)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _resolve(self, path: str):
+        """(list path, namespace or None) of a list or watch path, None if nothing is served there"""
+        lists = self.server.fake.lists()
+        if path in lists:
+            return path, None
+        namespaced = NAMESPACED_PATH.match(path)
+        if namespaced:
+            prefix, namespace, resource = namespaced.groups()
+            if f'{prefix}/{resource}' in lists:
+                return f'{prefix}/{resource}', namespace
+        return None
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        fake = self.server.fake
+        fake.requests.append((url.path, query))
+        
+        if url.path.rstrip('/') == '/version':
+            return self._send(200, {'major': '1', 'minor': '29', 'gitVersion': 'v1.29.0', 'gitCommit': 'fake',
+                                    'gitTreeState': 'clean', 'buildDate': '2024-01-01T00:00:00Z',
+                                    'goVersion': 'go1.21.5', 'compiler': 'gc', 'platform': 'linux/amd64'})
+        
+        if fake.metrics_status and url.path.startswith('/apis/metrics.k8s.io/'):
+            return self._send(fake.metrics_status, {'kind': 'Status', 'status': 'Failure',
+                                                    'code': fake.metrics_status})
+        
+        pod_path = POD_PATH.match(url.path)
+        if pod_path:
+            return self._pod(*pod_path.groups(), query)
+        
+        resolved = self._resolve(url.path)
+        if resolved is None:
+            return self._send(404, {'kind': 'Status', 'status': 'Failure', 'reason': 'NotFound', 'code': 404})
+        list_path, namespace = resolved
+        if query.get('watch', [''])[0].lower() in ('1', 'true'):
+            return self._watch(list_path, namespace, query)
+        
+        kind, items = fake.lists()[list_path]
+        if namespace is not None:
+            items = [item for item in items if item['metadata'].get('namespace') == namespace]
+        label_selector, field_selector = query.get('labelSelector', [''])[0], query.get('fieldSelector', [''])[0]
+        if label_selector or field_selector:
+            items = [item for item in items if selected(item, label_selector, field_selector)]
+        start = int(query.get('continue', ['0'])[0])
+        limit = int(query.get('limit', ['0'])[0]) or len(items)
+        metadata = {'resourceVersion': fake.resource_version}
+        if start + limit < len(items):
+            metadata['continue'] = str(start + limit)
+        items = items[start:start + limit]
+        
+        # Server-side projections asked for through the Accept header, as kubectl does
+        accept = self.headers.get('Accept', '')
+        if 'as=Table' in accept:
+            return self._send(200, {
+                'kind': 'Table', 'apiVersion': 'meta.k8s.io/v1', 'metadata': metadata,
+                'columnDefinitions': [{'name': 'Name', 'type': 'string'}, {'name': 'Created At', 'type': 'date'}],
+                'rows': [{'cells': [item['metadata']['name'], item['metadata']['creationTimestamp']],
+                          'object': {'kind': 'PartialObjectMetadata', 'metadata': item['metadata']}}
+                         for item in items],
+            })
+        if 'as=PartialObjectMetadataList' in accept:
+            kind = 'PartialObjectMetadataList'
+            items = [{'kind': 'PartialObjectMetadata', 'apiVersion': 'meta.k8s.io/v1', 'metadata': item['metadata']}
+                     for item in items]
+        self._send(200, {'kind': kind, 'apiVersion': 'v1', 'metadata': metadata, 'items': items})
+    
+    def _pod(self, namespace: str, name: str, subresource, query: dict):
+        """A pod, the log of one of its containers (the first one unless ``container`` is given) or a session"""
+        pod = self.server.fake.find_pod(namespace, name)
+        if pod is None:
+            return self._send(404, {'kind': 'Status', 'status': 'Failure', 'reason': 'NotFound', 'code': 404,
+                                    'message': f'pods "{name}" not found'})
+        if subresource is None:
+            return self._send(200, pod)
+        if subresource != 'log':
+            return self._session(name, subresource, query)
+        containers = [container['name'] for container in pod['spec']['containers']]
+        container = query.get('container', containers[:1])[0]
+        if container not in containers:
+            return self._send(400, {'kind': 'Status', 'status': 'Failure', 'reason': 'BadRequest', 'code': 400,
+                                    'message': f'container {container} is not valid for pod {name}'})
+        
+        lines = self.server.fake.pod_log(namespace, name, container)
+        if query.get('tailLines'):
+            lines = lines[max(len(lines) - int(query['tailLines'][0]), 0):]
+        if query.get('timestamps', [''])[0].lower() not in ('1', 'true'):
+            lines = [line.partition(' ')[2] for line in lines]
+        data = ''.join(f'{line}\n' for line in lines).encode()
+        if query.get('limitBytes'):
+            data = data[:int(query['limitBytes'][0])]
+        # The log ends here even with follow=true, as if the container had exited
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _session(self, pod: str, subresource: str, query: dict):
+        """An exec or attach websocket (v4.channel.k8s.io) to a shell that echoes its stdin.
+
+        ``exit`` or ``exit <code>`` on stdin ends the session with its status on
+        the error channel, as the API server reports the exit code.
+        """
+        fake = self.server.fake
+        key = self.headers.get('Sec-WebSocket-Key', '')
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept',
+                         base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode())
+        self.send_header('Sec-WebSocket-Protocol', 'v4.channel.k8s.io')
+        self.end_headers()
+        self.close_connection = True
+        session = {'pod': pod, 'subresource': subresource, 'command': query.get('command', []),
+                   'container': query.get('container', [None])[0], 'stdin': b'', 'resizes': []}
+        fake.exec_sessions.append(session)
+        try:
+            while not self.server.stopping.is_set():
+                if fake.exec_stalled:
+                    time.sleep(0.05)
+                    continue
+                opcode, payload = self._read_frame()
+                if opcode is None or opcode == ABNF.OPCODE_CLOSE:
+                    return
+                if opcode != ABNF.OPCODE_BINARY or not payload:
+                    continue
+                channel, data = payload[0], payload[1:]
+                if channel == 4:
+                    session['resizes'].append(json.loads(data))
+                    continue
+                session['stdin'] += data
+                self._write_frame(b'\x01' + data)
+                for line in data.decode('utf-8', errors='replace').splitlines():
+                    words = line.split()
+                    if words[:1] == ['exit']:
+                        code = int(words[1]) if len(words) > 1 else 0
+                        status = {'status': 'Success'} if code == 0 else {
+                            'status': 'Failure', 'message': f'command terminated with non-zero exit code: {code}'}
+                        self._write_frame(b'\x03' + json.dumps(status).encode())
+                        self._write_frame(struct.pack('!H', 1000), ABNF.OPCODE_CLOSE)
+                        return
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def _read_frame(self):
+        """(opcode, payload) of the next client frame, (None, b'') once the connection is closed"""
+        header = self.rfile.read(2)
+        if len(header) < 2:
+            return None, b''
+        length = header[1] & 0x7f
+        if length == 126:
+            length = struct.unpack('!H', self.rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.rfile.read(8))[0]
+        mask = self.rfile.read(4) if header[1] & 0x80 else None
+        payload = self.rfile.read(length)
+        return header[0] & 0x0f, ABNF.mask(mask, payload) if mask else payload
+    
+    def _write_frame(self, payload: bytes, opcode: int = ABNF.OPCODE_BINARY):
+        self.wfile.write(ABNF(1, 0, 0, 0, opcode, 0, payload).format())
+        self.wfile.flush()
+    
+    def _watch(self, list_path: str, namespace, query: dict):
+        """Stream the events after ``resourceVersion`` as JSON lines until ``timeoutSeconds``"""
+        fake = self.server.fake
+        since = int(query.get('resourceVersion', ['0'])[0] or 0) or fake.revision
+        deadline = time.monotonic() + float(query.get('timeoutSeconds', ['30'])[0])
+        item_kind = fake.lists()[list_path][0][:-len('List')]
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            while time.monotonic() < deadline and not self.server.stopping.is_set():
+                # Wake up now and then to notice the server stopping
+                events = fake.wait_events(list_path, since, min(deadline, time.monotonic() + 1))
+                lines = []
+                for revision, event in events:
+                    since = revision
+                    if namespace is None or event['object']['metadata'].get('namespace') == namespace:
+                        lines.append(json.dumps(event))
+                if lines:
+                    self._write_chunk(('\n'.join(lines) + '\n').encode())
+            if query.get('allowWatchBookmarks', [''])[0].lower() in ('1', 'true'):
+                bookmark = {'type': 'BOOKMARK', 'object': {'kind': item_kind, 'apiVersion': 'v1',
+                                                           'metadata': {'resourceVersion': str(since)}}}
+                self._write_chunk((json.dumps(bookmark) + '\n').encode())
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+    
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/fake/churn':
+            return self._send(404, {'kind': 'Status', 'status': 'Failure', 'reason': 'NotFound', 'code': 404})
+        fake = self.server.fake
+        pods = fake.churn(float(parse_qs(url.query).get('fraction', ['0.01'])[0]))
+        self._send(200, {'pods': pods, 'resourceVersion': fake.resource_version})
+
+
+class FakeApiServer:
+    def __init__(self, nodes: int = 10, pods: int = 100, namespaces: int = 20, metrics: bool = True):
+        self.fake = FakeCluster(nodes, pods, namespaces, metrics)
+        self._server = None
+    
+    def start(self) -> 'FakeApiServer':
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self.fake
+        self._server.stopping = threading.Event()
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+    
+    def stop(self):
+        self._server.stopping.set()
+        self._server.shutdown()
+        self._server.server_close()
+    
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+    
+    def kubeconfig(self) -> str:
+        return (
+            'apiVersion: v1\n'
+            'kind: Config\n'
+            f'clusters: [{{name: fake, cluster: {{server: "{self.url}"}}}}]\n'
+            'users: [{name: fake, user: {token: fake-token}}]\n'
+            'contexts: [{name: fake, context: {cluster: fake, user: fake}}]\n'
+            'current-context: fake\n'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic Kubernetes cluster')
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--pods', type=int, default=100)
+    parser.add_argument('--namespaces', type=int, default=20)
+    parser.add_argument('--no-metrics', action='store_true')
+    args = parser.parse_args()
+    
+    server = FakeApiServer(args.nodes, args.pods, args.namespaces, metrics=not args.no_metrics).start()
+    print(server.url, flush=True)
+    try:
+        # Serve until stdin closes, i.e. until the parent process exits or closes the pipe
+        sys.stdin.read()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Synthetic Kubernetes objects shaped like real API server responses"""
+
+
+def make_pod(index: int, namespace: str = 'default', node: str = 'node-0') -> dict:
+    name = f'app-{index // 10}-7d9f8c6b5-{index:05d}'
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Pod',
+        'metadata': {
+            'name': name,
+            'namespace': namespace,
+            'uid': f'00000000-0000-0000-0000-{index:012d}',
+            'resourceVersion': str(100000 + index),
+            'creationTimestamp': '2024-01-01T00:00:00Z',
+            'labels': {'app': f'app-{index // 10}', 'pod-template-hash': '7d9f8c6b5', 'tier': 'backend'},
+            'annotations': {'prometheus.io/scrape': 'true', 'prometheus.io/port': '9090'},
+            'ownerReferences': [{
+                'apiVersion': 'apps/v1', 'kind': 'ReplicaSet', 'name': f'app-{index // 10}-7d9f8c6b5',
+                'uid': f'11111111-0000-0000-0000-{index // 10:012d}', 'controller': True,
+                'blockOwnerDeletion': True,
+            }],
+        },
+        'spec': {
+            'nodeName': node,
+            'serviceAccountName': 'default',
+            'restartPolicy': 'Always',
+            'containers': [{
+                'name': container,
+                'image': f'registry.example.com/{container}:1.2.3',
+                'ports': [{'containerPort': 8080, 'protocol': 'TCP'}],
+                'env': [{'name': f'VAR_{i}', 'value': str(i)} for i in range(8)],
+                'resources': {'requests': {'cpu': '100m', 'memory': '128Mi'},
+                              'limits': {'cpu': '500m', 'memory': '512Mi'}},
+                'volumeMounts': [{'name': 'kube-api-access', 'mountPath': '/var/run/secrets', 'readOnly': True}],
+                'livenessProbe': {'httpGet': {'path': '/healthz', 'port': 8080}, 'periodSeconds': 10},
+            } for container in ('app', 'sidecar')],
+            'volumes': [{'name': 'kube-api-access', 'projected': {'sources': [
+                {'serviceAccountToken': {'expirationSeconds': 3607, 'path': 'token'}},
+            ]}}],
+            'tolerations': [{'key': 'node.kubernetes.io/not-ready', 'operator': 'Exists',
+                             'effect': 'NoExecute', 'tolerationSeconds': 300}],
+        },
+        'status': {
+            'phase': 'Running' if index % 20 else 'Pending',
+            'hostIP': '10.0.0.10',
+            'podIP': f'10.1.{(index // 250) % 250}.{index % 250}',
+            'startTime': '2024-01-01T00:00:05Z',
+            'conditions': [{'type': kind, 'status': 'True', 'lastTransitionTime': '2024-01-01T00:00:10Z'}
+                           for kind in ('Initialized', 'Ready', 'ContainersReady', 'PodScheduled')],
+            'containerStatuses': [{
+                'name': container, 'ready': True, 'restartCount': index % 3, 'started': True,
+                'image': f'registry.example.com/{container}:1.2.3', 'imageID': 'sha256:abc',
+                'containerID': f'containerd://{index:064d}',
+                'state': {'running': {'startedAt': '2024-01-01T00:00:08Z'}},
+            } for container in ('app', 'sidecar')],
+        },
+    }
+
+
+def make_pod_list(count: int, namespaces: int = 20, nodes: int = 50) -> dict:
+    return {
+        'apiVersion': 'v1',
+        'kind': 'PodList',
+        'metadata': {'resourceVersion': '200000'},
+        'items': [make_pod(i, f'ns-{i % namespaces}', f'node-{i % nodes}') for i in range(count)],
+    }
+
+
+def make_node(index: int) -> dict:
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Node',
+        'metadata': {
+            'name': f'node-{index}',
+            'uid': f'22222222-0000-0000-0000-{index:012d}',
+            'resourceVersion': str(50000 + index),
+            'creationTimestamp': '2024-01-01T00:00:00Z',
+            'labels': {
+                'kubernetes.io/hostname': f'node-{index}',
+                'node-role.kubernetes.io/control-plane' if index < 3 else 'node-role.kubernetes.io/worker': '',
+            },
+        },
+        'spec': {'podCIDR': f'10.1.{index % 250}.0/24'},
+        'status': {
+            'capacity': {'cpu': '4', 'memory': '16Gi', 'pods': '110'},
+            'allocatable': {'cpu': '3800m', 'memory': '15Gi', 'pods': '110'},
+            'conditions': [{'type': 'Ready', 'status': 'True', 'lastTransitionTime': '2024-01-01T00:00:10Z'}],
+            'nodeInfo': {
+                'architecture': 'amd64', 'operatingSystem': 'linux', 'osImage': 'Ubuntu 22.04.3 LTS',
+                'kernelVersion': '5.15.0-91-generic', 'containerRuntimeVersion': 'containerd://1.7.2',
+                'kubeletVersion': 'v1.29.0', 'kubeProxyVersion': 'v1.29.0',
+                'bootID': f'boot-{index}', 'machineID': f'machine-{index}', 'systemUUID': f'uuid-{index}',
+            },
+        },
+    }
+
+
+def make_node_metrics(node: dict) -> dict:
+    index = int(node['metadata']['name'].rsplit('-', 1)[1])
+    return {
+        'metadata': {'name': node['metadata']['name'], 'creationTimestamp': '2024-01-01T00:00:00Z'},
+        'timestamp': '2024-01-01T00:00:00Z',
+        'window': '20s',
+        'usage': {'cpu': f'{(index * 37) % 3800}m', 'memory': f'{(index * 53) % 15000 + 500}Mi'},
+    }
+
+
+def make_pod_metrics(pod: dict) -> dict:
+    index = int(pod['metadata']['name'].rsplit('-', 1)[1])
+    return {
+        'metadata': {'name': pod['metadata']['name'], 'namespace': pod['metadata']['namespace'],
+                     'creationTimestamp': '2024-01-01T00:00:00Z'},
+        'timestamp': '2024-01-01T00:00:00Z',
+        'window': '15s',
+        'containers': [{'name': container['name'],
+                        'usage': {'cpu': f'{index % 97 * 1000000 + 1}n', 'memory': f'{index % 300 + 16}Mi'}}
+                       for container in pod['spec']['containers']],
+    }
+
+
+def make_deployment(app: int, namespace: str, replicas: int = 10) -> dict:
+    name = f'app-{app}'
+    return {
+        'apiVersion': 'apps/v1',
+        'kind': 'Deployment',
+        'metadata': {
+            'name': name,
+            'namespace': namespace,
+            'uid': f'33333333-0000-0000-0000-{app:012d}',
+            'resourceVersion': str(30000 + app),
+            'creationTimestamp': '2024-01-01T00:00:00Z',
+            'labels': {'app': name},
+        },
+        'spec': {
+            'replicas': replicas,
+            'selector': {'matchLabels': {'app': name}},
+            'template': {'metadata': {'labels': {'app': name}},
+                         'spec': {'containers': [{'name': 'app', 'image': 'registry.example.com/app:1.2.3'}]}},
+        },
+        'status': {'replicas': replicas, 'readyReplicas': replicas, 'availableReplicas': replicas,
+                   'updatedReplicas': replicas},
+    }
+
+
+def make_replicaset(app: int, namespace: str, replicas: int = 10) -> dict:
+    name = f'app-{app}-7d9f8c6b5'
+    return {
+        'apiVersion': 'apps/v1',
+        'kind': 'ReplicaSet',
+        'metadata': {
+            'name': name,
+            'namespace': namespace,
+            'uid': f'11111111-0000-0000-0000-{app:012d}',
+            'resourceVersion': str(40000 + app),
+            'creationTimestamp': '2024-01-01T00:00:00Z',
+            'labels': {'app': f'app-{app}', 'pod-template-hash': '7d9f8c6b5'},
+            'ownerReferences': [{
+                'apiVersion': 'apps/v1', 'kind': 'Deployment', 'name': f'app-{app}',
+                'uid': f'33333333-0000-0000-0000-{app:012d}', 'controller': True, 'blockOwnerDeletion': True,
+            }],
+        },
+        'spec': {
+            'replicas': replicas,
+            'selector': {'matchLabels': {'app': f'app-{app}'}},
+            'template': {'metadata': {'labels': {'app': f'app-{app}'}},
+                         'spec': {'containers': [{'name': 'app', 'image': 'registry.example.com/app:1.2.3'}]}},
+        },
+        'status': {'replicas': replicas, 'readyReplicas': replicas, 'availableReplicas': replicas},
+    }
+
+
+def make_service(app: int, namespace: str) -> dict:
+    name = f'app-{app}'
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Service',
+        'metadata': {
+            'name': name,
+            'namespace': namespace,
+            'uid': f'44444444-0000-0000-0000-{app:012d}',
+            'resourceVersion': str(50000 + app),
+            'creationTimestamp': '2024-01-01T00:00:00Z',
+            'labels': {'app': name},
+        },
+        'spec': {
+            'type': 'ClusterIP',
+            'clusterIP': f'10.96.{(app // 250) % 250}.{app % 250}',
+            'selector': {'app': name},
+            'ports': [{'name': 'http', 'port': 80, 'targetPort': 8080, 'protocol': 'TCP'}],
+        },
+        'status': {'loadBalancer': {}},
+    }
@@ -0,0 +1,66 @@
+from django.test import SimpleTestCase
+from .base import FakeClusterTestCase
+from .fake_apiserver import FakeApiServer
+from ..capacity import cluster_capacity, fleet_capacity
+from ..k8s_client import KubernetesClient
+from ..models import Pod
+from ..quantities import cpu_millicores, memory_bytes, sum_requests
+from ..sync import sync_cluster
+
+Gi = 2 ** 30
+Mi = 2 ** 20
+
+
+class QuantityTests(SimpleTestCase):
+    def test_parsing(self):
+        self.assertEqual([cpu_millicores(value) for value in ('3800m', '4', '0.5', '250000001n', '', None, 'x')],
+                         [3800, 4000, 500, 251, None, None, None])
+        self.assertEqual([memory_bytes(value) for value in ('16Gi', '512M', '1e3', '1.5Ki', None)],
+                         [16 * Gi, 512 * 10 ** 6, 1000, 1536, None])
+        self.assertEqual(sum_requests([{'requests': {'cpu': '100m', 'memory': '128Mi'}},
+                                       {'requests': {'cpu': '1'}}, {}]), (1100, 128 * Mi))
+
+
+class CapacityTests(FakeClusterTestCase):
+    """Four nodes (the first three control-plane) of 3800m/15Gi allocatable; 30 pods requesting 200m/256Mi"""
+    
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+    
+    def test_cluster_totals_by_role_and_namespace(self):
+        capacity = cluster_capacity(self.cluster)
+        
+        self.assertEqual(capacity['totals'], {
+            'nodes': 4, 'cpu_capacity_millicores': 16000, 'memory_capacity_bytes': 64 * Gi,
+            'cpu_allocatable_millicores': 15200, 'memory_allocatable_bytes': 60 * Gi,
+            'pods': 30, 'cpu_request_millicores': 6000, 'memory_request_bytes': 30 * 256 * Mi,
+            'cpu_usage_millicores': 0, 'memory_usage_bytes': 0,
+        })
+        # Pods are spread round-robin over the nodes: 8, 8, 7 on the control plane and 7 on the worker
+        master, worker = capacity['by_role']['master'], capacity['by_role']['worker']
+        self.assertEqual((master['nodes'], master['cpu_allocatable_millicores'], master['pods'],
+                          master['cpu_request_millicores']), (3, 11400, 23, 4600))
+        self.assertEqual((worker['nodes'], worker['pods'], worker['memory_request_bytes']), (1, 7, 7 * 256 * Mi))
+        self.assertEqual({namespace: totals['pods'] for namespace, totals in capacity['by_namespace'].items()},
+                         {'ns-0': 10, 'ns-1': 10, 'ns-2': 10})
+    
+    def test_finished_pods_do_not_count(self):
+        Pod.objects.filter(cluster=self.cluster, namespace='ns-0').update(status='succeeded')
+        
+        totals = cluster_capacity(self.cluster)['totals']
+        self.assertEqual((totals['pods'], totals['cpu_request_millicores']), (20, 4000))
+    
+    def test_fleet_totals(self):
+        server = FakeApiServer(nodes=2, pods=0, namespaces=1).start()
+        self.addCleanup(server.stop)
+        other = self.create_cluster('other', server)
+        k8s_client = KubernetesClient(other)
+        self.addCleanup(k8s_client.close)
+        sync_cluster(other, k8s_client)
+        
+        fleet = fleet_capacity([self.cluster, other])
+        self.assertEqual((fleet['totals']['nodes'], fleet['totals']['cpu_allocatable_millicores'],
+                          fleet['totals']['pods']), (6, 6 * 3800, 30))
+        self.assertEqual([(entry['name'], entry['nodes'], entry['pods']) for entry in fleet['clusters']],
+                         [('test', 4, 30), ('other', 2, 0)])
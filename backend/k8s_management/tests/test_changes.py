@@ -0,0 +1,142 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .base import FakeClusterTestCase
+from ..models import Pod, RevisionCounter, Tombstone
+from ..revisions import current_revision, prune_tombstones, pruned_through
+from ..sync import sync_cluster
+
+
+class ChangesSinceTests(FakeClusterTestCase):
+    """``?since=`` change feed of the pods synced from the fake cluster"""
+    
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user('tsu', password='tsu-password'))
+    
+    def spread(self):
+        """Stamp the pods, in name order, five to a revision: revisions 100 to 105"""
+        pks = Pod.objects.filter(cluster=self.cluster).order_by('name').values_list('pk', flat=True)
+        for index, pk in enumerate(pks):
+            Pod.objects.filter(pk=pk).update(revision=100 + index // 5)
+        RevisionCounter.objects.filter(cluster=self.cluster).update(value=105)
+    
+    def tombstones(self, revision, *names):
+        Tombstone.objects.bulk_create([Tombstone(cluster=self.cluster, kind='pod', namespace='ns-1', name=name,
+                                                 revision=revision) for name in names])
+    
+    def changes(self, since, **params):
+        response = self.api.get('/api/kubernetes/pods/', {'cluster': self.cluster.pk, 'since': since, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+    
+    def test_everything_after_the_revision(self):
+        self.spread()
+        
+        data = self.changes(99)
+        
+        self.assertEqual((data['revision'], data['more'], data['deleted']), (105, False, []))
+        self.assertEqual(len(data['changed']), 30)
+        self.assertEqual([pod['name'] for pod in data['changed'][:5]],
+                         sorted(Pod.objects.values_list('name', flat=True))[:5])
+        
+        data = self.changes(103)
+        self.assertEqual(len(data['changed']), 10)
+        self.assertEqual(self.changes(105), {'revision': 105, 'more': False, 'changed': [], 'deleted': []})
+    
+    def test_pages_end_on_whole_revisions(self):
+        self.spread()
+        pages, since = [], 99
+        while True:
+            data = self.changes(since, limit=10)
+            pages.append((data['revision'], len(data['changed'])))
+            since = data['revision']
+            if not data['more']:
+                break
+        
+        self.assertEqual(pages, [(101, 10), (103, 10), (105, 10)])
+        # Revision 101 does not fit with 100 in 7 rows, so the page stops at 100
+        data = self.changes(99, limit=7)
+        self.assertEqual((data['revision'], len(data['changed'])), (100, 5))
+        # A revision larger than the limit is still served whole
+        data = self.changes(99, limit=3)
+        self.assertEqual((data['revision'], data['more'], len(data['changed'])), (100, True, 5))
+    
+    def test_tombstones_count_towards_the_limit(self):
+        self.spread()
+        self.tombstones(101, 'gone-1', 'gone-2', 'gone-3')
+        
+        data = self.changes(99, limit=10)
+        self.assertEqual((data['revision'], len(data['changed']), data['deleted']), (100, 5, []))
+        
+        data = self.changes(99, limit=13)
+        self.assertEqual((data['revision'], len(data['changed'])), (101, 10))
+        self.assertEqual(data['deleted'], [{'cluster': self.cluster.pk, 'namespace': 'ns-1', 'name': f'gone-{i}',
+                                            'revision': 101} for i in (1, 2, 3)])
+    
+    @override_settings(K8S_CHANGES_PAGE_SIZE=10)
+    def test_limit_is_capped_by_the_page_size(self):
+        self.spread()
+        
+        data = self.changes(99, limit=1000)
+        
+        self.assertEqual((data['revision'], data['more'], len(data['changed'])), (101, True, 10))
+    
+    def test_namespace_and_label_selector(self):
+        self.spread()
+        self.tombstones(104, 'gone')
+        Tombstone.objects.create(cluster=self.cluster, kind='pod', namespace='ns-2', name='elsewhere', revision=104)
+        Tombstone.objects.create(cluster=self.cluster, kind='deployment', namespace='ns-1', name='app-1', revision=104)
+        
+        data = self.changes(99, namespace='ns-1')
+        self.assertEqual({pod['namespace'] for pod in data['changed']}, {'ns-1'})
+        self.assertEqual(len(data['changed']), 10)
+        self.assertEqual([row['name'] for row in data['deleted']], ['gone'])
+        
+        # Deletions are not filtered by labels, which tombstones do not keep
+        data = self.changes(99, labelSelector='app=app-2')
+        self.assertEqual({pod['name'][:5] for pod in data['changed']}, {'app-2'})
+        self.assertEqual(sorted(row['name'] for row in data['deleted']), ['elsewhere', 'gone'])
+    
+    def test_pruned_revisions_are_gone(self):
+        self.spread()
+        self.tombstones(102, 'gone')
+        
+        self.assertEqual(prune_tombstones(timezone.now() + timedelta(seconds=1)), 1)
+        
+        self.assertEqual(pruned_through(self.cluster), 102)
+        response = self.api.get('/api/kubernetes/pods/', {'cluster': self.cluster.pk, 'since': 101})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.data['revision'], 105)
+        self.assertEqual(len(self.changes(102)['changed']), 15)
+    
+    def test_invalid_parameters(self):
+        for params, field in (({'since': 0}, 'cluster'), ({'since': 0, 'cluster': 'test'}, 'cluster'),
+                              ({'since': 'x', 'cluster': self.cluster.pk}, 'since'),
+                              ({'since': 0, 'cluster': self.cluster.pk, 'limit': 0}, 'limit'),
+                              ({'since': 0, 'cluster': self.cluster.pk, 'limit': 'x'}, 'limit')):
+            with self.subTest(params=params):
+                response = self.api.get('/api/kubernetes/pods/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+    
+    def test_feed_of_a_resync(self):
+        since = current_revision(self.cluster)
+        self.assertEqual(self.server.fake.churn(0.2), 6)
+        
+        sync_cluster(self.cluster, self.k8s_client)
+        
+        data = self.changes(since)
+        current = set(Pod.objects.filter(cluster=self.cluster).values_list('name', flat=True))
+        self.assertEqual(data['revision'], current_revision(self.cluster))
+        self.assertEqual(len(data['changed']), 6)
+        self.assertTrue({pod['name'] for pod in data['changed']} <= current)
+        self.assertEqual(len(data['deleted']), 3)
+        self.assertFalse({row['name'] for row in data['deleted']} & current)
+        # Nothing else changed: the deployments' feed is empty
+        response = self.api.get('/api/kubernetes/deployments/', {'cluster': self.cluster.pk, 'since': since})
+        self.assertEqual((response.data['changed'], response.data['deleted']), ([], []))
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+from kubernetes import client
+from .base import FakeClusterTestCase
+from .fake_apiserver import FakeApiServer
+from ..k8s_client import KubernetesClient
+
+
+class ClientConfigurationTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_server = FakeApiServer(nodes=7, pods=0, namespaces=1).start()
+        self.addCleanup(self.other_server.stop)
+        self.other_client = KubernetesClient(self.create_cluster('other', self.other_server))
+        self.addCleanup(self.other_client.close)
+    
+    def test_each_client_owns_its_configuration(self):
+        self.assertEqual(self.k8s_client.configuration.host, self.server.url)
+        self.assertEqual(self.other_client.configuration.host, self.other_server.url)
+        self.assertIsNot(self.k8s_client.configuration, self.other_client.configuration)
+        # Loading a kubeconfig never touches the kubernetes package's global default
+        self.assertNotIn(client.Configuration.get_default_copy().host, (self.server.url, self.other_server.url))
+    
+    def test_clusters_are_listed_concurrently(self):
+        clients = [self.k8s_client, self.other_client] * 8
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            counts = list(executor.map(lambda k8s_client: len(k8s_client.list_nodes()), clients))
+        
+        self.assertEqual(counts, [4, 7] * 8)
+    
+    def test_invalid_kubeconfig(self):
+        self.cluster.set_kubeconfig('clusters: [')
+        
+        with self.assertRaisesMessage(Exception, 'Failed to initialize Kubernetes client'):
+            KubernetesClient(self.cluster)
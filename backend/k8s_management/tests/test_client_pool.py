@@ -0,0 +1,51 @@
+from .base import FakeClusterTestCase
+from ..k8s_client import KubernetesClientPool
+
+
+class KubernetesClientPoolTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pool = KubernetesClientPool(max_size=2, ttl=900)
+        self.addCleanup(self.pool.clear)
+    
+    def test_reuses_the_client_of_a_cluster(self):
+        k8s_client = self.pool.get(self.cluster)
+        
+        self.assertIs(self.pool.get(self.cluster), k8s_client)
+        self.assertTrue(k8s_client.test_connection())
+    
+    def test_rebuilds_after_the_kubeconfig_is_replaced(self):
+        k8s_client = self.pool.get(self.cluster)
+        self.cluster.set_kubeconfig(self.server.kubeconfig())
+        self.cluster.save()
+        
+        rebuilt = self.pool.get(self.cluster)
+        self.assertIsNot(rebuilt, k8s_client)
+        self.assertIs(self.pool.get(self.cluster), rebuilt)
+    
+    def test_invalidate_and_ttl(self):
+        k8s_client = self.pool.get(self.cluster)
+        self.pool.invalidate(self.cluster.pk)
+        self.assertIsNot(self.pool.get(self.cluster), k8s_client)
+        
+        self.pool.ttl = 0
+        k8s_client = self.pool.get(self.cluster)
+        self.assertIsNot(self.pool.get(self.cluster), k8s_client)
+    
+    def test_evicts_the_least_recently_used_client(self):
+        first, second, third = (self.create_cluster(name) for name in ('first', 'second', 'third'))
+        first_client = self.pool.get(first)
+        second_client = self.pool.get(second)
+        self.pool.get(first)
+        self.pool.get(third)
+        
+        self.assertIs(self.pool.get(first), first_client)
+        self.assertIsNot(self.pool.get(second), second_client)
+    
+    def test_evicted_clients_keep_working(self):
+        k8s_client = self.pool.get(self.cluster)
+        self.pool.clear()
+        
+        # Only dropped from the cache: a holder's connections stay open until it lets go
+        self.assertTrue(k8s_client.test_connection())
+        self.assertEqual(len(k8s_client.list_nodes()), 4)
@@ -0,0 +1,103 @@
+import json
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from .base import FakeClusterTestCase
+from ..consumers import DEFAULT_SHELL, PodExecConsumer
+from ..k8s_client import client_pool
+
+POD = 'app-0-7d9f8c6b5-00001'
+
+
+class PodExecConsumerTests(FakeClusterTestCase):
+    """Terminal sessions against the fake API server, whose shell echoes its input"""
+    
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(client_pool.clear)
+        self.user = get_user_model().objects.create_user('tsu', password='tsu-password')
+    
+    async def connect(self, query='', pod=POD):
+        path = f'/ws/kubernetes/clusters/{self.cluster.pk}/namespaces/ns-0/pods/{pod}/exec/?{query}'
+        communicator = WebsocketCommunicator(PodExecConsumer.as_asgi(), path)
+        communicator.scope['url_route'] = {'kwargs': {'cluster_id': self.cluster.pk, 'namespace': 'ns-0',
+                                                      'pod': pod}}
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+    
+    async def frames(self, communicator):
+        """Every frame until the socket closes, with consecutive output joined"""
+        frames = []
+        while True:
+            output = await communicator.receive_output(timeout=5)
+            if output['type'] == 'websocket.close':
+                return frames
+            frame = json.loads(output['text'])
+            if frame['type'] == 'output' and frames and frames[-1]['type'] == 'output':
+                frames[-1]['data'] += frame['data']
+            else:
+                frames.append(frame)
+    
+    async def command(self, communicator, data):
+        await communicator.send_to(text_data=json.dumps({'type': 'command', 'data': data}))
+    
+    async def test_session(self):
+        communicator = await self.connect('container=app')
+        self.assertEqual(await communicator.receive_json_from(timeout=5), {
+            'type': 'connection', 'status': 'connected', 'message': f'Connected to {POD} (app)'})
+        
+        await communicator.send_to(text_data=json.dumps({'type': 'resize', 'cols': 120, 'rows': 40}))
+        await self.command(communicator, 'echo héllo\n')
+        await self.command(communicator, 'exit\n')
+        
+        self.assertEqual(await self.frames(communicator), [
+            {'type': 'output', 'data': 'echo héllo\nexit\n'},
+            {'type': 'connection', 'status': 'disconnected', 'message': 'Session ended'},
+        ])
+        session, = self.server.fake.exec_sessions
+        self.assertEqual((session['subresource'], session['container'], session['command']),
+                         ('exec', 'app', DEFAULT_SHELL))
+        self.assertEqual(session['resizes'], [{'Width': 120, 'Height': 40}])
+        self.assertEqual(session['stdin'], 'echo héllo\nexit\n'.encode())
+    
+    async def test_attach_and_failed_command(self):
+        communicator = await self.connect('attach=true&command=ignored')
+        await communicator.receive_json_from(timeout=5)
+        
+        await self.command(communicator, 'exit 3\n')
+        
+        self.assertEqual(await self.frames(communicator), [
+            {'type': 'output', 'data': 'exit 3\n'},
+            {'type': 'error', 'message': 'command terminated with non-zero exit code: 3'},
+            {'type': 'connection', 'status': 'disconnected', 'message': 'Session ended'},
+        ])
+        self.assertEqual(self.server.fake.exec_sessions[0]['subresource'], 'attach')
+    
+    async def test_missing_pod(self):
+        communicator = await self.connect(pod='gone')
+        
+        frames = await self.frames(communicator)
+        
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(frames[0]['type'], 'error')
+        self.assertTrue(frames[0]['message'].startswith('Connection failed:'))
+        self.assertEqual(self.server.fake.exec_sessions, [])
+    
+    @override_settings(K8S_EXEC_MAX_INPUT_BYTES=1 << 20)
+    async def test_unread_input_closes_the_session(self):
+        self.server.fake.exec_stalled = True
+        communicator = await self.connect()
+        await communicator.receive_json_from(timeout=5)
+        
+        # Far more than the socket buffers hold, so the rest queues up past the limit
+        chunk = 'x' * (256 << 10)
+        for _ in range(64):
+            await self.command(communicator, chunk)
+        
+        frames = await self.frames(communicator)
+        self.assertEqual(frames, [
+            {'type': 'error', 'message': 'The pod is not reading its input, closing the session'},
+            {'type': 'connection', 'status': 'disconnected', 'message': 'Session ended'},
+        ])
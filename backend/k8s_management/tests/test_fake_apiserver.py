@@ -0,0 +1,145 @@
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from django.test import SimpleTestCase
+from benchmarks.bench_sync import churn, measure
+from .base import FakeClusterTestCase
+from .fake_apiserver import FakeApiServer
+from ..sync import sync_cluster
+
+
+class FakeApiServerTests(SimpleTestCase):
+    """The fake API server that the tests and benchmarks sync from, spoken to over plain HTTP"""
+    
+    def setUp(self):
+        self.server = FakeApiServer(nodes=4, pods=30, namespaces=3).start()
+        self.addCleanup(self.server.stop)
+        self.fake = self.server.fake
+    
+    def get(self, path, accept='application/json', **query):
+        request = Request(f'{self.server.url}{path}?{urlencode(query)}', headers={'Accept': accept})
+        with urlopen(request) as response:
+            return json.load(response)
+    
+    def watch(self, path, **query):
+        request = Request(f'{self.server.url}{path}?{urlencode({"watch": 1, **query})}')
+        with urlopen(request) as response:
+            return [json.loads(line) for line in response.read().decode().splitlines()]
+    
+    def test_list_pages(self):
+        page = self.get('/api/v1/pods', limit=12)
+        self.assertEqual((page['kind'], len(page['items'])), ('PodList', 12))
+        self.assertEqual(page['metadata'], {'resourceVersion': '200000', 'continue': '12'})
+        
+        page = self.get('/api/v1/pods', limit=12, **{'continue': 24})
+        self.assertEqual(len(page['items']), 6)
+        self.assertNotIn('continue', page['metadata'])
+        self.assertEqual(page['items'][-1]['metadata']['name'], 'app-2-7d9f8c6b5-00029')
+    
+    def test_namespaces_and_selectors(self):
+        self.assertEqual(len(self.get('/api/v1/namespaces/ns-1/pods')['items']), 10)
+        self.assertEqual(len(self.get('/apis/apps/v1/namespaces/ns-1/deployments')['items']), 1)
+        self.assertEqual({pod['metadata']['namespace'] for pod in
+                          self.get('/api/v1/pods', labelSelector='app=app-2,tier')['items']}, {'ns-2'})
+        self.assertEqual(len(self.get('/api/v1/pods', labelSelector='!tier')['items']), 0)
+        self.assertEqual(len(self.get('/api/v1/pods', fieldSelector='status.phase=Pending')['items']), 2)
+        self.assertEqual(len(self.get('/api/v1/pods', fieldSelector='spec.nodeName!=node-1')['items']), 22)
+    
+    def test_projections(self):
+        page = self.get('/api/v1/nodes', accept='application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1')
+        self.assertEqual(page['kind'], 'PartialObjectMetadataList')
+        self.assertEqual(set(page['items'][0]), {'kind', 'apiVersion', 'metadata'})
+        
+        table = self.get('/api/v1/nodes', accept='application/json;as=Table;g=meta.k8s.io;v=v1', limit=2)
+        self.assertEqual([row['cells'][0] for row in table['rows']], ['node-0', 'node-1'])
+        self.assertEqual(table['metadata']['continue'], '2')
+    
+    def test_errors_and_recorded_requests(self):
+        with self.assertRaises(HTTPError) as raised:
+            self.get('/api/v1/secrets')
+        self.assertEqual(raised.exception.code, 404)
+        
+        self.assertEqual(len(self.get('/apis/metrics.k8s.io/v1beta1/pods')['items']), 30)
+        self.fake.metrics_status = 503
+        with self.assertRaises(HTTPError) as raised:
+            self.get('/apis/metrics.k8s.io/v1beta1/nodes')
+        self.assertEqual(raised.exception.code, 503)
+        # Only the metrics API is affected
+        self.assertEqual(len(self.get('/api/v1/nodes')['items']), 4)
+        
+        self.assertEqual([path for path, _ in self.fake.requests], [
+            '/api/v1/secrets', '/apis/metrics.k8s.io/v1beta1/pods', '/apis/metrics.k8s.io/v1beta1/nodes',
+            '/api/v1/nodes',
+        ])
+    
+    def test_watch_events_after_churn(self):
+        self.assertEqual(self.fake.churn(0.2), 6)
+        
+        events = self.watch('/api/v1/pods', resourceVersion=200000, timeoutSeconds=0.2)
+        
+        # Every other pod is restarted, the others are replaced by a pod of a new name
+        self.assertEqual([event['type'] for event in events], ['MODIFIED', 'DELETED', 'ADDED'] * 3)
+        self.assertEqual([int(event['object']['metadata']['resourceVersion']) for event in events],
+                         list(range(200001, 200010)))
+        self.assertEqual(events[0]['object']['status']['containerStatuses'][0]['restartCount'], 1)
+        deleted, added = events[1]['object']['metadata'], events[2]['object']['metadata']
+        self.assertEqual((deleted['name'], added['name']), ('app-0-7d9f8c6b5-00005', 'app-0-7d9f8c6b5-g1x00005'))
+        self.assertNotEqual(deleted['uid'], added['uid'])
+        self.assertEqual(self.get('/api/v1/pods')['metadata']['resourceVersion'], '200009')
+        names = {pod['metadata']['name'] for pod in self.get('/api/v1/pods')['items']}
+        self.assertIn('app-0-7d9f8c6b5-g1x00005', names)
+        self.assertNotIn('app-0-7d9f8c6b5-00005', names)
+    
+    def test_watch_resumes_from_a_resource_version(self):
+        self.fake.churn(0.2)
+        
+        events = self.watch('/api/v1/namespaces/ns-1/pods', resourceVersion=200004, timeoutSeconds=0.2,
+                            allowWatchBookmarks='true')
+        
+        self.assertEqual([(event['type'], event['object']['metadata']['resourceVersion']) for event in events], [
+            ('DELETED', '200005'), ('ADDED', '200006'), ('BOOKMARK', '200009'),
+        ])
+        self.assertEqual(events[-1]['object']['kind'], 'Pod')
+        # Other kinds saw no events
+        self.assertEqual(self.watch('/api/v1/nodes', resourceVersion=200000, timeoutSeconds=0.2), [])
+    
+    def test_watch_waits_for_events(self):
+        timer = threading.Timer(0.1, self.fake.churn, [0.1])
+        timer.start()
+        self.addCleanup(timer.cancel)
+        
+        events = self.watch('/api/v1/pods', timeoutSeconds=1)
+        
+        self.assertEqual([event['type'] for event in events], ['MODIFIED', 'DELETED', 'ADDED', 'MODIFIED'])
+    
+    def test_churn_endpoint(self):
+        self.assertEqual(churn(self.server.url, 0.2), {'pods': 6, 'resourceVersion': '200009'})
+        self.assertEqual(churn(self.server.url, 0), {'pods': 0, 'resourceVersion': '200009'})
+        
+        with self.assertRaises(HTTPError) as raised:
+            urlopen(Request(f'{self.server.url}/fake/reset', data=b'', method='POST'))
+        self.assertEqual(raised.exception.code, 404)
+
+
+class MeasureTests(FakeClusterTestCase):
+    """The figures the sync benchmark reports for a scenario"""
+    
+    def test_measure_a_sync(self):
+        self.server.fake.requests.clear()
+        
+        result, figures = measure(sync_cluster, self.cluster, self.k8s_client)
+        
+        self.assertEqual(result['changes']['pods']['created'], 30)
+        self.assertEqual(figures['objects'], 43)
+        self.assertEqual(figures['api_requests'], len(self.server.fake.requests))
+        self.assertEqual(figures['queries'], sum(figures['queries_by_phase'].values()))
+        self.assertGreater(figures['objects_per_second'], 0)
+        self.assertGreater(figures['peak_rss_bytes'], 1 << 20)
+        json.dumps(figures)
+        
+        # A resync after a small churn only writes what changed
+        self.server.fake.churn(0.2)
+        _, resync = measure(sync_cluster, self.cluster, self.k8s_client)
+        self.assertLess(resync['queries'], figures['queries'])
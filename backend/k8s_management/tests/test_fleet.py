@@ -0,0 +1,71 @@
+import threading
+import time
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+from .base import FakeClusterTestCase
+from .fake_apiserver import FakeApiServer
+from ..fleet import run_fleet
+from ..k8s_client import client_pool
+from ..models import Cluster
+
+
+class RunFleetTests(SimpleTestCase):
+    def setUp(self):
+        self.clusters = [Cluster(pk=i, name=f'c{i}') for i in range(6)]
+    
+    def test_reports_results_errors_and_timeouts_per_cluster(self):
+        def check(cluster):
+            if cluster.pk == 1:
+                raise Exception('unreachable')
+            if cluster.pk == 2:
+                time.sleep(1)
+            return cluster.name.upper()
+        
+        report = run_fleet(self.clusters[:3], check, timeout=0.2, concurrency=3)
+        
+        self.assertEqual((report['total'], report['succeeded'], report['failed']), (3, 1, 2))
+        results = {entry['cluster']: entry for entry in report['results']}
+        self.assertEqual(results[0]['result'], 'C0')
+        self.assertEqual(results[1]['error'], 'unreachable')
+        self.assertEqual(results[2]['error'], 'Timed out after 0.2s')
+        self.assertLess(report['duration'], 1)
+    
+    def test_concurrency_limit(self):
+        lock, in_flight, peak = threading.Lock(), [0], [0]
+        
+        def check(cluster):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+        
+        report = run_fleet(self.clusters, check, timeout=5, concurrency=2)
+        self.assertEqual(report['succeeded'], 6)
+        self.assertEqual(peak[0], 2)
+
+
+class FleetHealthTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(client_pool.clear)
+        down = FakeApiServer(nodes=0, pods=0, namespaces=0).start()
+        self.down = self.create_cluster('down', down)
+        down.stop()
+        Cluster.objects.filter(pk=self.down.pk).update(status='healthy', version='v1.28')
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user('tsu', password='tsu-password'))
+    
+    def test_post_records_status_and_version(self):
+        response = self.api.post('/api/kubernetes/clusters/health/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (1, 1))
+        self.assertEqual(list(Cluster.objects.values_list('name', 'status', 'version').order_by('name')),
+                         [('down', 'offline', 'v1.28'), ('test', 'healthy', 'v1.29')])
+    
+    def test_get_is_not_allowed(self):
+        self.assertEqual(self.api.get('/api/kubernetes/clusters/health/').status_code, 405)
+        self.assertEqual(Cluster.objects.get(pk=self.cluster.pk).status, 'offline')
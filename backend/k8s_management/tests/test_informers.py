@@ -0,0 +1,112 @@
+from io import StringIO
+from unittest import mock
+from django.test import SimpleTestCase
+from .base import FakeClusterTestCase
+from ..informers import Informer, InformerStore, ModelDeltaWriter
+from ..management.commands.run_informers import Command
+from ..models import Pod
+
+
+class InformerStoreTests(SimpleTestCase):
+    def test_indexes_follow_upserts_and_deletes(self):
+        store = InformerStore(('namespace', 'name'), {'node': lambda pod: pod['node']})
+        store.replace([{'namespace': 'a', 'name': 'x', 'node': 'n1'},
+                       {'namespace': 'a', 'name': 'y', 'node': 'n1'}])
+        
+        store.upsert({'namespace': 'a', 'name': 'y', 'node': 'n2'})
+        store.delete({'namespace': 'a', 'name': 'x', 'node': 'n1'})
+        
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.by_index('node', 'n1'), [])
+        self.assertEqual(store.by_index('node', 'n2'), [{'namespace': 'a', 'name': 'y', 'node': 'n2'}])
+        self.assertEqual(store.get(('a', 'y'))['node'], 'n2')
+
+
+class InformerTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = InformerStore(('namespace', 'name'))
+        self.writer = ModelDeltaWriter(self.cluster, 'pods')
+        self.informer = Informer(self.k8s_client, 'pods', self.store, self.writer, watch_timeout=1)
+    
+    def stored(self):
+        return dict(Pod.objects.filter(cluster=self.cluster).values_list('name', 'restarts'))
+    
+    def test_list_then_watch(self):
+        self.informer._list()
+        self.assertTrue(self.informer.has_synced)
+        self.assertTrue(self.writer.flush())
+        self.assertEqual(len(self.stored()), 30)
+        
+        self.server.fake.churn(0.2)
+        self.informer._watch_once()
+        self.assertEqual(self.informer.resource_version, self.server.fake.resource_version)
+        self.assertTrue(self.writer.flush())
+        self.assertFalse(self.writer.flush())
+        
+        expected = {pod['metadata']['name']: sum(status['restartCount']
+                                                 for status in pod['status']['containerStatuses'])
+                    for pod in self.server.fake.pods}
+        self.assertEqual(self.stored(), expected)
+        self.assertEqual(sorted(pod['name'] for pod in self.store.list()), sorted(expected))
+    
+    def test_deltas_are_coalesced_by_key(self):
+        self.informer._list()
+        self.writer.flush()
+        pod = self.store.list()[0]
+        key = self.store.key(pod)
+        
+        self.writer.upsert(key, {**pod, 'restarts': 7})
+        self.writer.delete(key)
+        self.writer.flush()
+        self.assertNotIn(pod['name'], self.stored())
+        
+        self.writer.delete(key)
+        self.writer.upsert(key, {**pod, 'restarts': 7})
+        self.writer.flush()
+        self.assertEqual(self.stored()[pod['name']], 7)
+
+
+class RescanTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('k8s_management.management.commands.run_informers.ClusterInformers')
+        self.informers = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.command = Command(stdout=StringIO(), stderr=StringIO())
+        self.command.running = {}
+        self.options = {'clusters': None, 'kinds': None, 'flush_interval': 1}
+    
+    def started(self):
+        return [call.args[0].name for call in self.informers.call_args_list]
+    
+    def test_follows_added_deleted_and_recredentialed_clusters(self):
+        self.command.rescan(self.options)
+        self.command.rescan(self.options)
+        self.assertEqual(self.started(), ['test'])
+        
+        other = self.create_cluster('other')
+        self.command.rescan(self.options)
+        self.assertEqual(self.started(), ['test', 'other'])
+        
+        self.cluster.set_kubeconfig(self.server.kubeconfig())
+        self.cluster.save()
+        other.delete()
+        self.command.rescan(self.options)
+        self.assertEqual(self.started(), ['test', 'other', 'test'])
+        self.assertEqual(list(self.command.running), [self.cluster.pk])
+        # The replaced informers of 'test' and those of the deleted cluster were stopped
+        self.assertEqual(self.informers.return_value.stop.call_count, 2)
+    
+    def test_failed_clusters_wait_for_a_new_kubeconfig(self):
+        self.informers.side_effect = Exception('bad kubeconfig')
+        self.command.rescan(self.options)
+        self.command.rescan(self.options)
+        self.assertEqual(len(self.informers.call_args_list), 1)
+        
+        self.informers.side_effect = None
+        self.cluster.set_kubeconfig(self.server.kubeconfig())
+        self.cluster.save()
+        self.command.rescan(self.options)
+        self.assertEqual(len(self.informers.call_args_list), 2)
+        self.informers.return_value.start.assert_called_once()
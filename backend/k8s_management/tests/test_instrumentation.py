@@ -0,0 +1,150 @@
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .base import FakeClusterTestCase
+from ..instrumentation import SyncRecorder, active_recorder, phase, prometheus_metrics, record_sync_run
+from ..models import Cluster, ClusterSyncRun
+from ..sync import sync_cluster
+
+
+class FakePerfCounter:
+    def __init__(self):
+        self.now = 0.0
+    
+    def perf_counter(self):
+        return self.now
+
+
+class SyncRecorderTests(TestCase):
+    def setUp(self):
+        self.clock = FakePerfCounter()
+        patcher = mock.patch('k8s_management.instrumentation.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_nested_phases_are_timed_exclusively(self):
+        recorder = SyncRecorder()
+        
+        with recorder.activate():
+            self.clock.now += 0.25
+            with phase('list'):
+                self.clock.now += 1
+                with phase('api'):
+                    self.clock.now += 2
+                self.clock.now += 0.5
+            with phase('api'):
+                self.clock.now += 1
+        
+        self.assertEqual(recorder.summary()['phases'], {'other': 0.25, 'list': 1.5, 'api': 3})
+        self.assertEqual(recorder.summary()['duration'], 4.75)
+    
+    def test_queries_are_charged_to_the_innermost_phase(self):
+        recorder = SyncRecorder()
+        
+        with recorder.activate():
+            Cluster.objects.count()
+            with phase('write'):
+                Cluster.objects.create(name='a')
+                Cluster.objects.count()
+        # Not recorded once the block exits
+        Cluster.objects.count()
+        
+        self.assertEqual(recorder.summary()['queries'], {'other': 1, 'write': 2})
+        self.assertEqual(recorder.summary()['query_count'], 3)
+    
+    def test_phases_outside_a_recorded_sync_do_nothing(self):
+        self.assertIsNone(active_recorder())
+        with phase('list'):
+            self.assertIsNone(active_recorder())
+    
+    def test_failed_runs_are_recorded(self):
+        cluster = Cluster.objects.create(name='failing')
+        
+        with self.assertRaisesRegex(RuntimeError, 'unreachable'):
+            with record_sync_run(cluster, 'shard'):
+                raise RuntimeError('unreachable')
+        
+        run = ClusterSyncRun.objects.get(cluster=cluster)
+        self.assertEqual((run.mode, run.status, run.error), ('shard', 'failed', 'unreachable'))
+        self.assertIsNone(active_recorder())
+
+
+class RecordedSyncTests(FakeClusterTestCase):
+    def test_records_the_cost_of_a_sync(self):
+        self.server.fake.requests.clear()
+        
+        with record_sync_run(self.cluster) as recorder:
+            recorder.changes = sync_cluster(self.cluster, self.k8s_client)['changes']
+        
+        run = ClusterSyncRun.objects.get(cluster=self.cluster)
+        self.assertEqual((run.mode, run.status, run.error), ('full', 'success', ''))
+        self.assertEqual(run.api_requests, len(self.server.fake.requests))
+        self.assertEqual(run.object_counts, {'nodes': 4, 'pods': 30, 'deployments': 3, 'replicasets': 3,
+                                             'services': 3})
+        self.assertEqual(run.changes['pods']['created'], 30)
+        self.assertGreater(run.bytes_received, 0)
+        self.assertTrue({'version', 'list', 'api', 'decode', 'write', 'ownership', 'inventory'} <= set(run.phases))
+        self.assertAlmostEqual(sum(run.phases.values()), run.duration, delta=0.01)
+        self.assertEqual(run.query_count, sum(run.queries.values()))
+        self.assertGreater(run.queries['write'], 0)
+
+
+class PrometheusMetricsTests(TestCase):
+    def setUp(self):
+        self.cluster = Cluster.objects.create(name='prod "eu"')
+        self.other = Cluster.objects.create(name='dev')
+        self.now = timezone.now()
+    
+    def sync_run(self, cluster, mode='full', status='success', minutes_ago=0, **fields):
+        return ClusterSyncRun.objects.create(cluster=cluster, mode=mode, status=status, duration=1.5,
+                                             started_at=self.now - timedelta(minutes=minutes_ago), **fields)
+    
+    def samples(self, text, name):
+        return [line for line in text.splitlines() if line.startswith(name + '{')]
+    
+    def test_latest_run_of_each_mode(self):
+        self.sync_run(self.cluster, minutes_ago=10, api_requests=9)
+        latest = self.sync_run(self.cluster, phases={'api': 0.5, 'write': 1}, queries={'write': 12}, api_requests=7,
+                          object_counts={'pods': 30})
+        self.sync_run(self.cluster, 'shard')
+        self.sync_run(self.cluster, 'finish', 'failed')
+        self.sync_run(self.other)
+        
+        text = prometheus_metrics(Cluster.objects.filter(pk=self.cluster.pk))
+        
+        labels = 'cluster="prod \\"eu\\"",mode="full"'
+        # The older full run and the shard run are not reported
+        self.assertEqual(self.samples(text, 'k8s_sync_duration_seconds'), [
+            'k8s_sync_duration_seconds{cluster="prod \\"eu\\"",mode="finish"} 1.5',
+            f'k8s_sync_duration_seconds{{{labels}}} 1.5',
+        ])
+        self.assertIn(f'k8s_sync_phase_seconds{{{labels},phase="write"}} 1', text)
+        self.assertIn(f'k8s_sync_db_queries{{{labels},phase="write"}} 12', text)
+        self.assertIn(f'k8s_sync_api_requests{{{labels}}} 7', text)
+        self.assertIn(f'k8s_sync_objects{{{labels},kind="pods"}} 30', text)
+        self.assertIn(f'k8s_sync_last_run_timestamp_seconds{{{labels},status="success"}} '
+                      f'{latest.started_at.timestamp()}', text)
+        self.assertEqual(self.samples(text, 'k8s_sync_runs'), [
+            'k8s_sync_runs{cluster="prod \\"eu\\"",status="failed"} 1',
+            'k8s_sync_runs{cluster="prod \\"eu\\"",status="success"} 3',
+        ])
+        self.assertNotIn('dev', text)
+        self.assertIn('# TYPE k8s_sync_runs gauge', text)
+    
+    def test_endpoints(self):
+        self.sync_run(self.cluster, api_requests=7)
+        self.sync_run(self.cluster, 'shard', 'failed', minutes_ago=1)
+        api = APIClient()
+        api.force_authenticate(get_user_model().objects.create_user('tsu', password='tsu-password'))
+        
+        response = api.get('/api/kubernetes/clusters/sync-metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('k8s_sync_api_requests{cluster="prod \\"eu\\"",mode="full"} 7', response.content.decode())
+        
+        response = api.get(f'/api/kubernetes/clusters/{self.cluster.pk}/sync-runs/', {'mode': 'shard'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['status'], 'failed')
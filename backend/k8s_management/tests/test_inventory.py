@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from .base import FakeClusterTestCase
+from .fake_apiserver import FakeApiServer
+from ..inventory import query_inventory, refresh_inventory
+from ..k8s_client import KubernetesClient
+from ..models import Cluster, Deployment, InventorySummary, Pod
+from ..sync import sync_cluster
+
+
+class RefreshInventoryTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+    
+    def rows(self, kind):
+        return list(InventorySummary.objects.filter(cluster=self.cluster, kind=kind)
+                    .values_list('namespace', 'status', 'count', 'not_ready', 'restarts', 'replicas', 'ready_replicas')
+                    .order_by('namespace', 'status'))
+    
+    def test_summary_of_the_synced_rows(self):
+        # Pods 0 and 20 are pending; pod i restarts i % 3 times in each of its two containers
+        self.assertEqual(self.rows('pods'), [
+            ('ns-0', 'pending', 1, 0, 0, 0, 0),
+            ('ns-0', 'running', 9, 0, 18, 0, 0),
+            ('ns-1', 'running', 10, 0, 20, 0, 0),
+            ('ns-2', 'pending', 1, 0, 4, 0, 0),
+            ('ns-2', 'running', 9, 0, 18, 0, 0),
+        ])
+        self.assertEqual(self.rows('deployments'), [
+            (f'ns-{app}', 'available', 1, 0, 0, 10, 10) for app in range(3)
+        ])
+        self.assertEqual(self.rows('nodes'), [('', 'ready', 4, 0, 0, 0, 0)])
+        self.assertEqual(self.rows('services'), [(f'ns-{app}', 'ClusterIP', 1, 0, 0, 0, 0) for app in range(3)])
+    
+    def test_writes_only_the_changed_rows(self):
+        self.assertEqual(refresh_inventory(self.cluster), {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 12})
+        
+        Pod.objects.filter(cluster=self.cluster, name='app-0-7d9f8c6b5-00000').delete()
+        Pod.objects.filter(cluster=self.cluster, name='app-1-7d9f8c6b5-00011').update(ready=False)
+        Deployment.objects.filter(cluster=self.cluster, name='app-2').update(ready_replicas=7)
+        
+        # (ns-0, pending) is gone, (ns-1, running) has a not-ready pod and app-2 moved to degraded
+        self.assertEqual(refresh_inventory(self.cluster), {'created': 1, 'updated': 1, 'deleted': 2, 'unchanged': 9})
+        self.assertEqual(self.rows('pods')[1], ('ns-1', 'running', 10, 1, 20, 0, 0))
+        self.assertEqual(self.rows('deployments')[2], ('ns-2', 'degraded', 1, 0, 0, 10, 7))
+    
+    def test_follows_the_cluster(self):
+        self.server.fake.pods[:] = self.server.fake.pods[:10]
+        self.server.fake.nodes[3]['status']['conditions'][0]['status'] = 'False'
+        
+        sync_cluster(self.cluster, self.k8s_client)
+        
+        self.assertEqual([row[:3] for row in self.rows('pods')], [('ns-0', 'pending', 1), ('ns-0', 'running', 9)])
+        self.assertEqual(self.rows('nodes'), [('', 'not_ready', 1, 1, 0, 0, 0), ('', 'ready', 3, 0, 0, 0, 0)])
+
+
+class QueryInventoryTests(FakeClusterTestCase):
+    """Aggregates over the fake cluster and a smaller production one"""
+    
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+        server = FakeApiServer(nodes=2, pods=20, namespaces=2).start()
+        self.addCleanup(server.stop)
+        self.production = self.create_cluster('production', server)
+        Cluster.objects.filter(pk=self.production.pk).update(environment='production', region='eu-west-1')
+        k8s_client = KubernetesClient(self.production)
+        self.addCleanup(k8s_client.close)
+        sync_cluster(self.production, k8s_client)
+    
+    def test_group_by_cluster_dimensions(self):
+        result = query_inventory({'kind': 'pods', 'group_by': 'environment,status'})
+        
+        self.assertEqual(result['totals'], {'count': 50, 'not_ready': 0, 'restarts': 98})
+        self.assertEqual([(row['environment'], row['status'], row['count']) for row in result['results']], [
+            ('development', 'pending', 2),
+            ('development', 'running', 28),
+            ('production', 'pending', 1),
+            ('production', 'running', 19),
+        ])
+    
+    def test_filters(self):
+        result = query_inventory({'kind': 'pods', 'group_by': 'namespace', 'environment': 'production'})
+        self.assertEqual([(row['namespace'], row['count']) for row in result['results']],
+                         [('ns-0', 10), ('ns-1', 10)])
+        
+        result = query_inventory({'kind': 'deployments', 'namespace': 'ns-1,ns-2', 'region': 'eu-west-1'})
+        self.assertEqual(result['results'], [{'count': 1, 'replicas': 10, 'ready_replicas': 10}])
+        
+        # Only the given clusters are summed
+        result = query_inventory({'kind': 'nodes', 'group_by': 'cluster_name'}, Cluster.objects.filter(name='test'))
+        self.assertEqual(result['results'], [{'cluster_name': 'test', 'count': 4, 'not_ready': 0}])
+    
+    def test_invalid_parameters(self):
+        for params in ({}, {'kind': 'secrets'}, {'kind': 'pods', 'group_by': 'namespace,owner'}):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                query_inventory(params)
+    
+    def test_endpoint(self):
+        api = APIClient()
+        api.force_authenticate(get_user_model().objects.create_user('tsu', password='tsu-password'))
+        
+        response = api.get('/api/kubernetes/clusters/inventory/', {'kind': 'services', 'group_by': 'cluster_name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{'cluster_name': 'production', 'count': 2},
+                                                    {'cluster_name': 'test', 'count': 3}])
+        
+        response = api.get('/api/kubernetes/clusters/inventory/', {'kind': 'secrets'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('kind must be one of', response.data['error'])
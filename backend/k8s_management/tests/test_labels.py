@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+from .base import FakeClusterTestCase
+from .fake_apiserver import selected
+from ..labels import parse_selector, refresh_label_index, selector_q
+from ..models import LabelsGinIndex, Pod, PodLabel, ReplicaSet
+from ..registry import RESOURCE_KINDS
+from ..sync import sync_cluster
+
+
+class ParseSelectorTests(SimpleTestCase):
+    def test_requirements(self):
+        self.assertEqual(parse_selector('app=web, tier==backend,track!=canary'), [
+            ('app', 'in', ('web',)),
+            ('tier', 'in', ('backend',)),
+            ('track', 'notin', ('canary',)),
+        ])
+        self.assertEqual(parse_selector('env in (prod, staging),app.kubernetes.io/name notin (db)'), [
+            ('env', 'in', ('prod', 'staging')),
+            ('app.kubernetes.io/name', 'notin', ('db',)),
+        ])
+        self.assertEqual(parse_selector('node-role.kubernetes.io/worker,!canary'), [
+            ('node-role.kubernetes.io/worker', 'exists', ()),
+            ('canary', '!', ()),
+        ])
+        # An empty value is a value: a label set to ''
+        self.assertEqual(parse_selector('role='), [('role', 'in', ('',))])
+        self.assertEqual(parse_selector('  '), [])
+    
+    def test_invalid_selectors(self):
+        for selector in ('app=web,', 'app in web', 'app in (a b)', 'app=-web', '=web', 'app=>1', 'app in ((a))'):
+            with self.subTest(selector=selector), self.assertRaises(ValueError):
+                parse_selector(selector)
+
+
+class SelectorQueryTests(FakeClusterTestCase):
+    """Selectors over the side-table label index of the pods and nodes synced from the fake cluster"""
+    
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+        self.pods = RESOURCE_KINDS['pods']
+    
+    def names(self, kind_name, selector):
+        kind = RESOURCE_KINDS[kind_name]
+        return set(kind.model.objects.filter(selector_q(kind, selector), cluster=self.cluster)
+                   .values_list('name', flat=True))
+    
+    def test_matches_the_api_server(self):
+        # The fake API server evaluates equality-based selectors like the real one
+        for selector in ('app=app-1', 'app!=app-1', 'tier=backend,app==app-2', '!canary', 'tier,app!=app-0'):
+            with self.subTest(selector=selector):
+                expected = {pod['metadata']['name'] for pod in self.server.fake.pods if selected(pod, selector)}
+                self.assertEqual(self.names('pods', selector), expected)
+                self.assertTrue(expected)
+    
+    def test_set_based_requirements(self):
+        self.assertEqual(len(self.names('pods', 'app in (app-0,app-2)')), 20)
+        self.assertEqual(self.names('pods', 'app notin (app-0, app-2)'), self.names('pods', 'app=app-1'))
+        self.assertEqual(self.names('pods', 'app in (app-9)'), set())
+        self.assertEqual(self.names('pods', 'app in (app-0),tier notin (frontend)'), self.names('pods', 'app=app-0'))
+    
+    def test_existence(self):
+        self.assertEqual(self.names('nodes', 'node-role.kubernetes.io/worker'), {'node-3'})
+        self.assertEqual(self.names('nodes', '!node-role.kubernetes.io/control-plane'), {'node-3'})
+        self.assertEqual(len(self.names('nodes', 'kubernetes.io/hostname')), 4)
+        self.assertEqual(self.names('pods', 'canary'), set())
+    
+    def test_negations_match_objects_without_the_key(self):
+        name = 'app-1-7d9f8c6b5-00010'
+        Pod.objects.filter(cluster=self.cluster, name=name).update(labels={})
+        refresh_label_index(self.pods, self.cluster, [('ns-1', name)])
+        
+        self.assertFalse(PodLabel.objects.filter(obj__name=name).exists())
+        self.assertIn(name, self.names('pods', 'app notin (app-1)'))
+        self.assertIn(name, self.names('pods', 'app!=app-1'))
+        self.assertIn(name, self.names('pods', '!app'))
+        self.assertNotIn(name, self.names('pods', 'app in (app-1)'))
+    
+    def test_other_clusters_do_not_match(self):
+        other = self.create_cluster('other')
+        Pod.objects.create(cluster=other, namespace='ns-0', name='lone', labels={'app': 'app-0'})
+        refresh_label_index(self.pods, other)
+        
+        self.assertEqual(Pod.objects.filter(selector_q(self.pods, 'app=app-0')).count(), 11)
+        self.assertEqual(len(self.names('pods', 'app=app-0')), 10)
+    
+    def test_labels_gin_index_is_postgresql_only(self):
+        index = ReplicaSet._meta.indexes[0]
+        
+        self.assertIsInstance(index, LabelsGinIndex)
+        # Only the vendor is consulted, so the editor needs no transaction
+        schema_editor = connection.schema_editor()
+        self.assertEqual(index.create_sql(ReplicaSet, schema_editor), '')
+        self.assertEqual(index.remove_sql(ReplicaSet, schema_editor), '')
+
+
+class LabelSelectorEndpointTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user('tsu', password='tsu-password'))
+    
+    def test_filters_the_list(self):
+        response = self.api.get('/api/kubernetes/pods/', {'cluster': self.cluster.pk,
+                                                          'labelSelector': 'app in (app-0,app-2),!canary'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 20)
+        self.assertEqual({pod['namespace'] for pod in response.data['results']}, {'ns-0', 'ns-2'})
+        
+        response = self.api.get('/api/kubernetes/nodes/', {'labelSelector': 'node-role.kubernetes.io/worker'})
+        self.assertEqual([node['name'] for node in response.data['results']], ['node-3'])
+    
+    def test_invalid_selector(self):
+        response = self.api.get('/api/kubernetes/pods/', {'labelSelector': 'app in web'})
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('labelSelector', response.data)
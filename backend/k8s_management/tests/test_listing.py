@@ -0,0 +1,53 @@
+from django.test import override_settings
+from .base import FakeClusterTestCase
+from ..k8s_client import KubernetesClient
+from ..models import Pod
+from ..reconcile import Reconciler
+from ..registry import RESOURCE_KINDS
+from ..sync import sync_cluster
+
+
+class PagedListingTests(FakeClusterTestCase):
+    def pod_requests(self):
+        return [query for path, query in self.server.fake.requests if path == '/api/v1/pods']
+    
+    def assert_paged(self, raw_json):
+        pages = list(self.k8s_client.iter_pods(page_size=7, raw_json=raw_json))
+        
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 7, 2])
+        self.assertEqual([pod['name'] for page in pages for pod in page],
+                         [pod['metadata']['name'] for pod in self.server.fake.pods])
+        requests = self.pod_requests()
+        self.assertEqual([query['limit'] for query in requests], [['7']] * 5)
+        self.assertEqual([query.get('continue') for query in requests], [None, ['7'], ['14'], ['21'], ['28']])
+    
+    def test_model_listing_follows_continue(self):
+        self.assert_paged(raw_json=False)
+    
+    def test_raw_json_listing_follows_continue(self):
+        self.assert_paged(raw_json=True)
+    
+    @override_settings(K8S_LIST_PAGE_SIZE=4)
+    def test_default_page_size_and_namespace(self):
+        k8s_client = KubernetesClient(self.cluster)
+        self.addCleanup(k8s_client.close)
+        
+        pods = k8s_client.list_pods('ns-1')
+        self.assertEqual([pod['name'] for pod in pods], [f'app-1-7d9f8c6b5-{i:05d}' for i in range(10, 20)])
+        self.assertEqual(len(self.server.fake.requests), 3)
+        self.assertEqual(self.server.fake.requests[0][0], '/api/v1/namespaces/ns-1/pods')
+
+
+class ReconcileComparisonTests(FakeClusterTestCase):
+    def test_label_key_order_is_not_a_change(self):
+        sync_cluster(self.cluster, self.k8s_client)
+        kind = RESOURCE_KINDS['pods']
+        rows = list(Pod.objects.filter(cluster=self.cluster).values(*dict.fromkeys([*kind.key_fields, *kind.fields])))
+        for row in rows:
+            row['labels'] = dict(reversed(list(row['labels'].items())))
+        rows[0]['labels']['tier'] = 'frontend'
+        
+        reconciler = Reconciler(Pod, self.cluster, kind.key_fields, kind.fields)
+        reconciler.apply(rows)
+        self.assertEqual(reconciler.finish(), {'created': 0, 'updated': 1, 'deleted': 0, 'unchanged': 29})
+        self.assertEqual(Pod.objects.get(cluster=self.cluster, name=rows[0]['name']).labels['tier'], 'frontend')
@@ -0,0 +1,46 @@
+from django.test import SimpleTestCase
+from .base import FakeClusterTestCase
+from .fake_apiserver import selected
+
+
+class ListingModeTests(FakeClusterTestCase):
+    def test_selectors_are_evaluated_by_the_server(self):
+        for raw_json in (False, True):
+            pods = self.k8s_client.list_pods(label_selector='app=app-1,tier', field_selector='spec.nodeName=node-2',
+                                             raw_json=raw_json)
+            self.assertEqual([pod['name'] for pod in pods], ['app-1-7d9f8c6b5-00010', 'app-1-7d9f8c6b5-00014',
+                                                             'app-1-7d9f8c6b5-00018'])
+        
+        queries = [query for path, query in self.server.fake.requests if path == '/api/v1/pods']
+        self.assertEqual({query['labelSelector'][0] for query in queries}, {'app=app-1,tier'})
+        self.assertEqual({query['fieldSelector'][0] for query in queries}, {'spec.nodeName=node-2'})
+    
+    def test_metadata_projection(self):
+        pods = self.k8s_client.list_pods('ns-2', projection='metadata', page_size=4)
+        
+        self.assertEqual(len(pods), 10)
+        self.assertEqual(set(pods[0]), {'name', 'namespace', 'labels', 'annotations', 'resource_version',
+                                        'created_at'})
+        self.assertEqual(pods[0]['labels']['app'], 'app-2')
+        self.assertEqual(self.k8s_client.count_namespaces(), 3)
+    
+    def test_table_projection(self):
+        nodes = self.k8s_client.list_nodes(projection='table')
+        
+        self.assertEqual([node['name'] for node in nodes], ['node-0', 'node-1', 'node-2', 'node-3'])
+        self.assertEqual(nodes[0]['created_at'], '2024-01-01T00:00:00Z')
+    
+    def test_unknown_projection(self):
+        with self.assertRaises(ValueError):
+            self.k8s_client.list_nodes(projection='yaml')
+
+
+class FakeSelectorTests(SimpleTestCase):
+    def test_equality_based_terms(self):
+        pod = {'metadata': {'labels': {'app': 'web', 'tier': 'backend'}}, 'spec': {'nodeName': 'n1'}}
+        
+        self.assertTrue(selected(pod, 'app=web,tier!=frontend,!canary'))
+        self.assertTrue(selected(pod, 'app==web', 'spec.nodeName=n1'))
+        self.assertFalse(selected(pod, 'canary'))
+        self.assertFalse(selected(pod, 'app!=web'))
+        self.assertFalse(selected(pod, '', 'spec.nodeName!=n1'))
@@ -0,0 +1,215 @@
+import asyncio
+import json
+from unittest import mock
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from .base import FakeClusterTestCase
+from .. import logs
+from ..consumers import PodLogConsumer
+from ..k8s_client import client_pool
+from ..logs import LogBuffer, LogStream, compile_grep, release_streams, reserve_streams, split_timestamp
+
+POD = 'app-0-7d9f8c6b5-00001'
+
+
+class GrepTests(SimpleTestCase):
+    def test_substring(self):
+        grep = compile_grep('a.c')
+        
+        self.assertTrue(grep('xx a.c yy'))
+        # Not a regular expression
+        self.assertFalse(grep('abc'))
+        self.assertFalse(grep('A.C'))
+        self.assertTrue(compile_grep('a.c', ignore_case=True)('A.C'))
+        self.assertIsNone(compile_grep(''))
+    
+    def test_rejected_patterns(self):
+        with self.assertRaisesRegex(ValueError, 'too long'):
+            compile_grep('x' * 257)
+        with mock.patch('k8s_management.logs.re2', None):
+            with self.assertRaisesRegex(ValueError, 'plain substring'):
+                compile_grep('ERR(OR)?', regex=True)
+    
+    def test_regex(self):
+        re2 = mock.Mock()
+        with mock.patch('k8s_management.logs.re2', re2):
+            self.assertIs(compile_grep('ERR(OR)?', ignore_case=True, regex=True), re2.compile.return_value.search)
+        re2.compile.assert_called_once_with('(?i)ERR(OR)?')
+    
+    def test_split_timestamp(self):
+        self.assertEqual(split_timestamp('2024-01-01T00:00:07.000000000Z GET / 200'),
+                         ('2024-01-01T00:00:07.000000000Z', 'GET / 200'))
+        self.assertEqual(split_timestamp('GET / 200'), (None, 'GET / 200'))
+        self.assertEqual(split_timestamp('2024 was a year'), (None, '2024 was a year'))
+
+
+@override_settings(K8S_LOG_MAX_STREAMS_TOTAL=3)
+class ReserveStreamsTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(logs, '_active_streams', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_all_or_none(self):
+        self.assertTrue(reserve_streams(2))
+        self.assertFalse(reserve_streams(2))
+        self.assertTrue(reserve_streams(1))
+        self.assertFalse(reserve_streams(1))
+        
+        release_streams(3)
+        self.assertTrue(reserve_streams(3))
+
+
+class LogBufferTests(SimpleTestCase):
+    async def test_drop_policy(self):
+        buffer = LogBuffer(asyncio.get_running_loop(), max_lines=2)
+        for n in range(3):
+            buffer.put(('line', 'web', 'app', None, f'line {n}'))
+        buffer.put(('end', 'web', 'app', None), force=True)
+        
+        batch, dropped = await buffer.get_batch(10)
+        
+        self.assertEqual([item[-1] for item in batch], ['line 0', 'line 1', None])
+        self.assertEqual(dropped, 1)
+        # The lines are sent, so there is room again
+        buffer.put(('line', 'web', 'app', None, 'line 3'))
+        self.assertEqual(await buffer.get_batch(10), ([('line', 'web', 'app', None, 'line 3')], 0))
+    
+    async def test_close_keeps_end_markers(self):
+        buffer = LogBuffer(asyncio.get_running_loop(), max_lines=10, policy='slowdown')
+        buffer.put(('line', 'web', 'app', None, 'line 0'))
+        buffer.put(('end', 'web', 'app', None), force=True)
+        
+        buffer.close()
+        buffer.put(('line', 'web', 'app', None, 'line 1'))
+        
+        self.assertEqual(await buffer.get_batch(10), ([('end', 'web', 'app', None)], 0))
+
+
+class LogStreamTests(FakeClusterTestCase):
+    """LogStream reading container logs from the fake API server, run in the test's thread"""
+    
+    def setUp(self):
+        super().setUp()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        self.buffer = LogBuffer(loop, max_lines=100)
+        patcher = mock.patch.object(logs, '_active_streams', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def stream(self, pod=POD, container='app', **options):
+        self.assertTrue(reserve_streams(1))
+        LogStream(self.k8s_client, 'ns-0', pod, container, self.buffer, follow=False, **options).run()
+        # The slot is given back when the stream ends
+        self.assertEqual(logs._active_streams, 0)
+        return list(self.buffer._items)
+    
+    def test_lines_then_end(self):
+        items = self.stream(tail_lines=3)
+        
+        self.assertEqual(items, [
+            ('line', POD, 'app', '2024-01-01T00:00:07.000000000Z', 'INFO app handled request 7'),
+            ('line', POD, 'app', '2024-01-01T00:00:08.000000000Z', 'INFO app handled request 8'),
+            ('line', POD, 'app', '2024-01-01T00:00:09.000000000Z', 'ERROR app handled request 9'),
+            ('end', POD, 'app', None),
+        ])
+        _, query = self.server.fake.requests[-1]
+        self.assertEqual((query['container'], query['tailLines']), (['app'], ['3']))
+    
+    def test_grep(self):
+        items = self.stream(container='sidecar', grep=compile_grep('error', ignore_case=True))
+        
+        self.assertEqual([item[-1] for item in items],
+                         ['ERROR sidecar handled request 4', 'ERROR sidecar handled request 9', None])
+    
+    @override_settings(K8S_LOG_MAX_LINE_BYTES=40)
+    def test_long_lines_are_truncated(self):
+        self.server.fake.logs[('ns-0', POD, 'app')] = ['x' * 100, 'short']
+        
+        items = self.stream()
+        
+        # 31 bytes of timestamp and separator, then 9 of the line
+        self.assertEqual([item[-1] for item in items], ['x' * 9, 'short', None])
+    
+    def test_missing_pod(self):
+        items = self.stream(pod='gone')
+        
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0][:3], ('end', 'gone', 'app'))
+        self.assertIn('Not Found', items[0][3])
+
+
+@override_settings(K8S_LOG_FLUSH_INTERVAL=0, K8S_LOG_MAX_STREAMS_TOTAL=4)
+class PodLogConsumerTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(client_pool.clear)
+        self.user = get_user_model().objects.create_user('tsu', password='tsu-password')
+        patcher = mock.patch.object(logs, '_active_streams', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    async def connect(self, query):
+        communicator = WebsocketCommunicator(PodLogConsumer.as_asgi(),
+                                             f'/ws/kubernetes/clusters/{self.cluster.pk}/namespaces/ns-0/logs/?{query}')
+        communicator.scope['url_route'] = {'kwargs': {'cluster_id': self.cluster.pk, 'namespace': 'ns-0'}}
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+    
+    async def frames(self, communicator):
+        """Every frame until the socket closes"""
+        frames = []
+        while True:
+            output = await communicator.receive_output(timeout=5)
+            if output['type'] == 'websocket.close':
+                return frames
+            frames.append(json.loads(output['text']))
+    
+    async def test_streams_every_container(self):
+        communicator = await self.connect(f'pod={POD}&grep=ERROR')
+        
+        frames = await self.frames(communicator)
+        
+        self.assertEqual(frames[0], {'type': 'connection', 'status': 'connected', 'streams': [
+            {'pod': POD, 'container': 'app'}, {'pod': POD, 'container': 'sidecar'},
+        ]})
+        lines = [line for frame in frames if frame['type'] == 'logs' for line in frame['lines']]
+        self.assertEqual(sorted(line['line'] for line in lines), [
+            'ERROR app handled request 4', 'ERROR app handled request 9',
+            'ERROR sidecar handled request 4', 'ERROR sidecar handled request 9',
+        ])
+        self.assertEqual(lines[0]['timestamp'][:19], '2024-01-01T00:00:04')
+        self.assertEqual(sorted(frame['container'] for frame in frames if frame['type'] == 'stream_end'),
+                         ['app', 'sidecar'])
+        self.assertEqual(frames[-1], {'type': 'end'})
+    
+    async def error(self, query):
+        communicator = await self.connect(query)
+        frames = await self.frames(communicator)
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(frames[0]['type'], 'error')
+        return frames[0]['message']
+    
+    async def test_invalid_requests(self):
+        self.assertIn('plain substring', await self.error(f'pod={POD}&grep=ERR.*&regex=true'))
+        self.assertIn('overflow must be one of', await self.error(f'pod={POD}&overflow=block'))
+        self.assertIn('No matching pods', await self.error('selector=app=none'))
+        self.assertIn('Not Found', await self.error('pod=gone'))
+    
+    @override_settings(K8S_LOG_MAX_STREAMS=3)
+    async def test_stream_limits(self):
+        # Ten pods of two containers each
+        self.assertIn('20 containers match, at most 3', await self.error('selector=app=app-0'))
+        
+        self.assertTrue(reserve_streams(3))
+        self.assertIn('Too many log streams', await self.error(f'pod={POD}'))
+        self.assertEqual(logs._active_streams, 3)
+        
+        release_streams(2)
+        communicator = await self.connect(f'pod={POD}&container=app&tailLines=1')
+        frames = await self.frames(communicator)
+        self.assertEqual([frame['type'] for frame in frames], ['connection', 'logs', 'stream_end', 'end'])
@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from .base import FakeClusterTestCase
+from ..models import Deployment, Pod, ReplicaSet
+from ..ownership import resolve_ownership, workload_rollup
+from ..revisions import current_revision
+from ..sync import sync_cluster
+
+
+class ResolveOwnershipTests(FakeClusterTestCase):
+    """Pod -> ReplicaSet -> Deployment links of the fake cluster, and how they follow its changes"""
+    
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+    
+    def workload(self, name):
+        return Pod.objects.values_list('workload_kind', 'workload_name', 'deployment__name').get(
+            cluster=self.cluster, name=name)
+    
+    def set_owner(self, items, index, kind=None, name=None):
+        """Replace the ownerReferences of a fake object with one controller, or none"""
+        metadata = items[index]['metadata']
+        metadata['ownerReferences'] = [{'apiVersion': 'apps/v1', 'kind': kind, 'name': name, 'uid': f'uid-{name}',
+                                        'controller': True}] if kind else []
+        metadata['resourceVersion'] = str(int(metadata['resourceVersion']) + 1)
+    
+    def test_pods_resolve_to_their_deployment(self):
+        for replica_set in ReplicaSet.objects.filter(cluster=self.cluster).select_related('deployment'):
+            self.assertEqual((replica_set.owner_kind, replica_set.deployment.name),
+                             ('Deployment', replica_set.owner_name))
+        for pod in Pod.objects.filter(cluster=self.cluster).select_related('deployment'):
+            app = pod.name.rsplit('-', 2)[0]
+            self.assertEqual((pod.owner_kind, pod.owner_name), ('ReplicaSet', f'{app}-7d9f8c6b5'))
+            self.assertEqual((pod.workload_kind, pod.workload_name, pod.deployment.name), ('Deployment', app, app))
+        self.assertEqual(Deployment.objects.get(cluster=self.cluster, name='app-1').pods.count(), 10)
+    
+    def test_unchanged_links_write_nothing(self):
+        revision = current_revision(self.cluster)
+        
+        self.assertEqual(resolve_ownership(self.cluster), {'replica_sets': 0, 'pods': 0})
+        self.assertEqual(current_revision(self.cluster), revision)
+    
+    def test_other_controllers_stay_the_workload(self):
+        fake = self.server.fake
+        self.set_owner(fake.pods, 0, 'StatefulSet', 'db')
+        self.set_owner(fake.pods, 1)
+        # An orphaned replica set is the top-level workload of its pods
+        self.set_owner(fake.replicasets, 1)
+        
+        result = sync_cluster(self.cluster, self.k8s_client)
+        
+        self.assertEqual(result['ownership'], {'replica_sets': 1, 'pods': 12})
+        self.assertEqual(self.workload('app-0-7d9f8c6b5-00000'), ('StatefulSet', 'db', None))
+        self.assertEqual(self.workload('app-0-7d9f8c6b5-00001'), ('', '', None))
+        self.assertEqual(self.workload('app-1-7d9f8c6b5-00010'), ('ReplicaSet', 'app-1-7d9f8c6b5', None))
+        self.assertEqual(self.workload('app-2-7d9f8c6b5-00020'), ('Deployment', 'app-2', 'app-2'))
+    
+    def test_deleted_and_recreated_deployment(self):
+        deployment = self.server.fake.deployments.pop(0)
+        
+        # Deleting the row unlinks its rows; they stay owned by the deployment by name
+        self.assertEqual(sync_cluster(self.cluster, self.k8s_client)['ownership'], {'replica_sets': 0, 'pods': 0})
+        self.assertIsNone(ReplicaSet.objects.get(cluster=self.cluster, name='app-0-7d9f8c6b5').deployment)
+        self.assertEqual(self.workload('app-0-7d9f8c6b5-00000'), ('Deployment', 'app-0', None))
+        self.assertEqual(Pod.objects.filter(cluster=self.cluster, deployment__isnull=False).count(), 20)
+        
+        self.server.fake.deployments.append(deployment)
+        self.assertEqual(sync_cluster(self.cluster, self.k8s_client)['ownership'], {'replica_sets': 1, 'pods': 10})
+        self.assertEqual(self.workload('app-0-7d9f8c6b5-00000'), ('Deployment', 'app-0', 'app-0'))
+    
+    def test_relinked_rows_get_a_new_revision(self):
+        before = current_revision(self.cluster)
+        Pod.objects.filter(cluster=self.cluster, name='app-2-7d9f8c6b5-00020').update(
+            workload_kind='', workload_name='', deployment=None)
+        
+        self.assertEqual(resolve_ownership(self.cluster), {'replica_sets': 0, 'pods': 1})
+        
+        revision = current_revision(self.cluster)
+        self.assertEqual(revision, before + 1)
+        relinked = Pod.objects.filter(cluster=self.cluster, revision=revision)
+        self.assertEqual(list(relinked.values_list('name', flat=True)), ['app-2-7d9f8c6b5-00020'])
+
+
+class WorkloadRollupTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+    
+    def test_counts_per_workload(self):
+        Pod.objects.filter(cluster=self.cluster, name='app-1-7d9f8c6b5-00011').update(ready=False)
+        # Pods without a workload are left out
+        Pod.objects.filter(cluster=self.cluster, name='app-2-7d9f8c6b5-00029').update(
+            workload_kind='', workload_name='')
+        
+        rows = workload_rollup(Pod.objects.filter(cluster=self.cluster))
+        
+        # Pod i restarts i % 3 times in each of its two containers
+        self.assertEqual([(row['namespace'], row['workload_name'], row['pods'], row['not_ready'], row['restarts'])
+                          for row in rows],
+                         [('ns-0', 'app-0', 10, 0, 18), ('ns-1', 'app-1', 10, 1, 20), ('ns-2', 'app-2', 9, 0, 18)])
+        self.assertEqual({row['workload_kind'] for row in rows}, {'Deployment'})
+        self.assertEqual(rows[0]['deployment'], Deployment.objects.get(cluster=self.cluster, name='app-0').pk)
+    
+    def test_endpoint(self):
+        api = APIClient()
+        api.force_authenticate(get_user_model().objects.create_user('tsu', password='tsu-password'))
+        
+        response = api.get(f'/api/kubernetes/clusters/{self.cluster.pk}/workloads/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['workload_name'], row['pods']) for row in response.data],
+                         [('app-0', 10), ('app-1', 10), ('app-2', 10)])
@@ -0,0 +1,114 @@
+from unittest import mock
+from django.db import transaction
+from django.test import override_settings
+from .base import FakeClusterTestCase
+from ..models import Cluster, Pod
+from ..push import group_name, publish_changes
+from ..revisions import current_revision
+from ..sync import sync_cluster
+
+
+class RecordingChannelLayer:
+    """Keeps the group messages instead of delivering them"""
+    
+    def __init__(self):
+        self.sent = []
+    
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+
+@override_settings(K8S_PUSH_ENABLED=True)
+class PublishChangesTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.layer = RecordingChannelLayer()
+        patcher = mock.patch('k8s_management.push.get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def messages(self, kind='pods'):
+        return [message for group, message in self.layer.sent if group == group_name(self.cluster.pk, kind)]
+    
+    def test_message(self):
+        row = {'namespace': 'ns-0', 'name': 'web', 'status': 'running', 'annotations': {'big': 'x' * 1000}}
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_changes(Pod, self.cluster, 7, [row], deleted=[('ns-1', 'gone')])
+            # Nothing is sent before the transaction commits
+            self.assertEqual(self.layer.sent, [])
+        
+        self.assertEqual(self.layer.sent, [(f'k8s-{self.cluster.pk}-pods', {
+            'type': 'k8s.changes', 'cluster': self.cluster.pk, 'kind': 'pods', 'revision': 7,
+            'changed': [{'namespace': 'ns-0', 'name': 'web', 'status': 'running', 'revision': 7}],
+            'deleted': [{'namespace': 'ns-1', 'name': 'gone', 'revision': 7}],
+        })])
+        self.assertIn('annotations', row)
+    
+    def test_rolled_back_changes_are_not_sent(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                publish_changes(Pod, self.cluster, 7, [{'namespace': 'ns-0', 'name': 'web'}])
+                raise RuntimeError
+        
+        self.assertEqual((callbacks, self.layer.sent), ([], []))
+    
+    @override_settings(K8S_PUSH_BATCH_SIZE=2)
+    def test_large_batches_are_split(self):
+        rows = [{'namespace': 'ns-0', 'name': f'pod-{i}'} for i in range(5)]
+        deleted = [('ns-0', f'gone-{i}') for i in range(3)]
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_changes(Pod, self.cluster, 3, rows, deleted)
+        
+        messages = self.messages()
+        self.assertEqual([(len(message['changed']), len(message['deleted'])) for message in messages],
+                         [(2, 2), (2, 1), (1, 0)])
+        self.assertEqual([row['name'] for message in messages for row in message['changed']],
+                         [row['name'] for row in rows])
+        self.assertEqual({message['revision'] for message in messages}, {3})
+    
+    def test_nothing_to_send(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            publish_changes(Pod, self.cluster, 1)
+            # Only synced kinds have subscribers
+            publish_changes(Cluster, self.cluster, 1, [{'name': 'test'}])
+            with override_settings(K8S_PUSH_ENABLED=False):
+                publish_changes(Pod, self.cluster, 1, [{'namespace': 'ns-0', 'name': 'web'}])
+        
+        self.assertEqual(callbacks, [])
+    
+    def test_channel_layer_errors_are_logged(self):
+        self.layer.group_send = mock.AsyncMock(side_effect=ConnectionError('redis is down'))
+        
+        with self.assertLogs('k8s_management.push', 'ERROR') as logs, self.captureOnCommitCallbacks(execute=True):
+            publish_changes(Pod, self.cluster, 1, [{'namespace': 'ns-0', 'name': 'web'}])
+        
+        self.assertIn(f'k8s-{self.cluster.pk}-pods', logs.output[0])
+    
+    def test_changes_of_a_resync(self):
+        with override_settings(K8S_PUSH_ENABLED=False):
+            sync_cluster(self.cluster, self.k8s_client)
+        before = current_revision(self.cluster)
+        self.server.fake.churn(0.2)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            sync_cluster(self.cluster, self.k8s_client)
+        
+        # Written rows, then the deletions, then the ownership links of the new pods
+        written, deleted, relinked = self.messages()
+        self.assertEqual([message['revision'] for message in (written, deleted, relinked)],
+                         [before + 1, before + 2, before + 3])
+        self.assertEqual((len(written['changed']), written['deleted']), (6, []))
+        self.assertEqual((deleted['changed'], len(deleted['deleted'])), ([], 3))
+        self.assertEqual(len(relinked['changed']), 3)
+        self.assertEqual(relinked['changed'][0]['workload_kind'], 'Deployment')
+        
+        for row in written['changed'] + relinked['changed']:
+            self.assertNotIn('annotations', row)
+            self.assertEqual(Pod.objects.filter(cluster=self.cluster, namespace=row['namespace'], name=row['name'],
+                                                restarts=row['restarts']).count(), 1)
+        for key in deleted['deleted']:
+            self.assertFalse(Pod.objects.filter(cluster=self.cluster, namespace=key['namespace'],
+                                                name=key['name']).exists())
+        self.assertEqual(self.messages('deployments'), [])
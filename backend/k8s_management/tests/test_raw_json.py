@@ -0,0 +1,29 @@
+from .base import FakeClusterTestCase
+from ..k8s_client import KubernetesClient
+
+
+class RawJsonListingTests(FakeClusterTestCase):
+    def test_extractors_match_the_model_converters(self):
+        for kind in KubernetesClient._JSON_EXTRACTORS:
+            with self.subTest(kind=kind):
+                converted = [item for page in self.k8s_client.iter_resources(kind, raw_json=False) for item in page]
+                extracted = [item for page in self.k8s_client.iter_resources(kind, raw_json=True) for item in page]
+                self.assertTrue(converted)
+                self.assertEqual(extracted, converted)
+    
+    def test_optional_fields_missing(self):
+        pod = self.server.fake.pods[0]
+        del pod['spec']['nodeName'], pod['status']['containerStatuses'], pod['metadata']['ownerReferences']
+        pod['status']['podIP'] = None
+        service = self.server.fake.services[0]
+        service['status']['loadBalancer'] = {'ingress': [{'ip': '203.0.113.7'}, {'hostname': 'lb.example.com'}]}
+        
+        for kind, name in (('pods', pod['metadata']['name']), ('services', service['metadata']['name'])):
+            with self.subTest(kind=kind):
+                self.assertEqual(self.listed(kind, name, raw_json=True), self.listed(kind, name, raw_json=False))
+        self.assertEqual(self.listed('services', service['metadata']['name'], raw_json=True)['external_ip'],
+                         '203.0.113.7,lb.example.com')
+    
+    def listed(self, kind, name, raw_json):
+        return next(item for page in self.k8s_client.iter_resources(kind, raw_json=raw_json) for item in page
+                    if item['name'] == name)
@@ -0,0 +1,54 @@
+from .base import FakeClusterTestCase
+from ..models import Pod, Service
+from ..reconcile import Reconciler, bulk_delete, bulk_upsert
+from ..registry import RESOURCE_KINDS
+from ..sync import sync_cluster
+
+
+class ReconcilerTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+    
+    def reconcile(self, kind_name, namespace=None):
+        kind = RESOURCE_KINDS[kind_name]
+        scope = {'namespace': namespace} if namespace else None
+        reconciler = Reconciler(kind.model, self.cluster, kind.key_fields, kind.fields, scope=scope)
+        for page in self.k8s_client.iter_resources(kind_name, namespace, page_size=8):
+            reconciler.apply(kind.row_builder(data) for data in page)
+        return reconciler.finish(), reconciler.changed_keys
+    
+    def test_counts_created_updated_deleted_and_unchanged(self):
+        # 6 of the 30 pods: 3 restarted in place, 3 replaced by pods of new names
+        self.server.fake.churn(0.2)
+        stats, changed_keys = self.reconcile('pods')
+        
+        self.assertEqual(stats, {'created': 3, 'updated': 3, 'deleted': 3, 'unchanged': 24})
+        self.assertEqual(len(changed_keys), 6)
+        self.assertEqual(set(Pod.objects.filter(cluster=self.cluster).values_list('name', flat=True)),
+                         {pod['metadata']['name'] for pod in self.server.fake.pods})
+    
+    def test_resync_without_changes_writes_nothing(self):
+        self.assertEqual(self.reconcile('pods')[0], {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 30})
+    
+    def test_scope_limits_deletions(self):
+        # Services of another namespace are outside the scope, so kept although not listed
+        stats, _ = self.reconcile('services', namespace='ns-1')
+        
+        self.assertEqual(stats, {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 1})
+        self.assertEqual(Service.objects.filter(cluster=self.cluster).count(), 3)
+    
+    def test_bulk_upsert_and_delete(self):
+        kind = RESOURCE_KINDS['services']
+        rows = [kind.row_builder(data) for data in self.k8s_client.list_services()]
+        rows[0]['service_type'] = 'NodePort'
+        rows.append({**rows[1], 'name': 'extra'})
+        
+        bulk_upsert(Service, self.cluster, rows, kind.key_fields, kind.fields)
+        self.assertEqual(Service.objects.get(cluster=self.cluster, name=rows[0]['name']).service_type, 'NodePort')
+        self.assertEqual(Service.objects.filter(cluster=self.cluster).count(), 4)
+        
+        deleted = bulk_delete(Service, self.cluster, [(rows[1]['namespace'], 'extra'), ('ns-0', 'missing')],
+                              kind.key_fields)
+        self.assertEqual(deleted, 1)
+        self.assertEqual(Service.objects.filter(cluster=self.cluster).count(), 3)
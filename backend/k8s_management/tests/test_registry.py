@@ -0,0 +1,39 @@
+from django.test import SimpleTestCase
+from .base import FakeClusterTestCase
+from ..models import Node, Service, Tombstone
+from ..registry import RESOURCE_KINDS, kind_for_model, service_row
+from ..sync import sync_cluster
+
+
+class RegistryTests(SimpleTestCase):
+    def test_kinds_and_models(self):
+        self.assertEqual(list(RESOURCE_KINDS), ['nodes', 'pods', 'deployments', 'replicasets', 'services'])
+        self.assertIs(kind_for_model(Service), RESOURCE_KINDS['services'])
+        self.assertIsNone(kind_for_model(Tombstone))
+        self.assertFalse(RESOURCE_KINDS['nodes'].namespaced)
+        self.assertTrue(RESOURCE_KINDS['services'].namespaced)
+        for kind in RESOURCE_KINDS.values():
+            self.assertIs(kind.label_model._meta.get_field('obj').related_model, kind.model)
+    
+    def test_service_row(self):
+        data = {'name': 'web', 'namespace': 'shop', 'type': 'ExternalName', 'cluster_ip': 'None',
+                'external_ip': None, 'ports': [], 'labels': {}, 'annotations': {}}
+        
+        self.assertEqual(service_row(data), {'name': 'web', 'namespace': 'shop', 'service_type': 'ExternalName',
+                                             'cluster_ip': None, 'external_ip': '', 'ports': [],
+                                             'labels': {}, 'annotations': {}})
+
+
+class ServiceSyncTests(FakeClusterTestCase):
+    def test_services_are_synced_with_the_other_kinds(self):
+        result = sync_cluster(self.cluster, self.k8s_client)
+        
+        self.assertEqual(result['changes']['services']['created'], 3)
+        service = Service.objects.get(cluster=self.cluster, namespace='ns-1', name='app-1')
+        self.assertEqual((service.service_type, service.cluster_ip, service.external_ip, service.ports),
+                         ('ClusterIP', '10.96.0.1', '', ['80/TCP']))
+        self.assertEqual(Node.objects.get(cluster=self.cluster, name='node-0').role, 'master')
+        
+        self.server.fake.services.pop()
+        self.assertEqual(sync_cluster(self.cluster, self.k8s_client)['changes']['services'],
+                         {'created': 0, 'updated': 0, 'deleted': 1, 'unchanged': 2})
@@ -0,0 +1,84 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import override_settings
+from django.utils import timezone
+from .base import FakeClusterTestCase
+from .fake_apiserver import FakeApiServer
+from ..k8s_client import client_pool
+from ..models import Cluster, Pod
+from ..tasks import claim_cluster_sync, run_cluster_sync, schedule_cluster_syncs, sync_cluster_task
+
+
+@override_settings(K8S_SYNC_MAX_CONCURRENT=3, K8S_SYNC_JITTER=0, K8S_SYNC_TIMEOUT=900)
+class ScheduleClusterSyncsTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(sync_cluster_task, 'apply_async',
+                                    side_effect=lambda args, **_: mock.Mock(id=f'task-{args[0]}'))
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+        now = timezone.now()
+        self.clusters = [self.cluster] + [self.create_cluster(f'c{i}') for i in range(4)]
+        # test and c0 were never synced, c1 and c2 are due, c3 is not
+        for cluster, next_sync_at in zip(self.clusters[1:], (None, now - timedelta(minutes=5),
+                                                             now - timedelta(minutes=1), now + timedelta(minutes=1))):
+            Cluster.objects.filter(pk=cluster.pk).update(next_sync_at=next_sync_at)
+    
+    def queued(self):
+        return [call.args[0][0] for call in self.apply_async.call_args_list]
+    
+    def test_queues_due_clusters_up_to_the_limit(self):
+        Cluster.objects.filter(pk=self.clusters[1].pk).update(sync_started_at=timezone.now())
+        
+        self.assertEqual(schedule_cluster_syncs(), 2)
+        # Never synced first, then the longest overdue
+        self.assertEqual(self.queued(), [self.cluster.pk, self.clusters[2].pk])
+        self.assertEqual(Cluster.objects.get(pk=self.cluster.pk).sync_task_id, f'task-{self.cluster.pk}')
+        self.assertEqual(schedule_cluster_syncs(), 0)
+    
+    def test_releases_stale_claims(self):
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Cluster.objects.filter(pk=self.cluster.pk).update(sync_started_at=an_hour_ago, next_sync_at=an_hour_ago)
+        
+        self.assertEqual(schedule_cluster_syncs(), 3)
+        self.assertIn(self.cluster.pk, self.queued())
+    
+    def test_claims_are_exclusive(self):
+        self.assertTrue(claim_cluster_sync(self.cluster))
+        self.assertFalse(claim_cluster_sync(self.cluster))
+        self.assertEqual(schedule_cluster_syncs(), 2)
+        self.assertNotIn(self.cluster.pk, self.queued())
+
+
+@override_settings(K8S_SYNC_INTERVAL=60, K8S_SYNC_JITTER=0, K8S_SYNC_MAX_BACKOFF=1800)
+class RunClusterSyncTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(client_pool.clear)
+        claim_cluster_sync(self.cluster)
+    
+    def test_success_releases_the_claim(self):
+        run_cluster_sync(self.cluster)
+        
+        cluster = Cluster.objects.get(pk=self.cluster.pk)
+        self.assertIsNone(cluster.sync_started_at)
+        self.assertEqual((cluster.status, cluster.sync_failures), ('healthy', 0))
+        self.assertAlmostEqual((cluster.next_sync_at - timezone.now()).total_seconds(), 60, delta=5)
+        self.assertEqual(Pod.objects.filter(cluster=self.cluster).count(), 30)
+    
+    def test_failures_back_off(self):
+        down = FakeApiServer(nodes=0, pods=0, namespaces=0).start()
+        cluster = self.create_cluster('down', down)
+        down.stop()
+        Cluster.objects.filter(pk=cluster.pk).update(sync_failures=2)
+        cluster.refresh_from_db()
+        claim_cluster_sync(cluster)
+        
+        with self.assertRaisesMessage(Exception, 'Failed to connect'):
+            run_cluster_sync(cluster)
+        cluster.refresh_from_db()
+        self.assertIsNone(cluster.sync_started_at)
+        self.assertEqual((cluster.status, cluster.sync_failures), ('offline', 3))
+        self.assertEqual(cluster.last_sync_error, 'Failed to connect to cluster')
+        # 60 s doubled per failure
+        self.assertAlmostEqual((cluster.next_sync_at - timezone.now()).total_seconds(), 480, delta=5)
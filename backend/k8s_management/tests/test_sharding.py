@@ -0,0 +1,142 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from .base import FakeClusterTestCase
+from ..k8s_client import client_pool
+from ..models import Cluster, ClusterSyncRun, Deployment, Node, Pod, Service
+from ..sync import (finish_sharded_sync, list_namespaces, shard_of, split_namespaces, sync_cluster_scoped,
+                    sync_namespace_shard)
+from ..tasks import (claim_cluster_sync, finish_sharded_sync_task, refresh_cluster_sync, run_cluster_sync,
+                     sync_namespace_shard_task)
+
+
+class SplitNamespacesTests(SimpleTestCase):
+    def test_groups_by_a_stable_hash(self):
+        namespaces = [f'ns-{i}' for i in range(40)]
+        
+        groups = split_namespaces(namespaces, 4)
+        
+        self.assertEqual(sorted(namespace for group in groups for namespace in group), sorted(namespaces))
+        for group in groups:
+            self.assertEqual(len({shard_of(namespace, 4) for namespace in group}), 1)
+        # crc32, not hash(): the same in every process
+        self.assertEqual(shard_of('kube-system', 4), 1)
+        self.assertEqual(shard_of('default', 4), 3)
+    
+    def test_drops_empty_shards(self):
+        self.assertEqual(split_namespaces(['default'], 8), [['default']])
+        self.assertEqual(split_namespaces([], 8), [])
+        self.assertEqual(split_namespaces(['a', 'b', 'c'], 1), [['a', 'b', 'c']])
+
+
+class ShardedSyncTests(FakeClusterTestCase):
+    """The steps of a sharded sync run in-process against the fake cluster"""
+    
+    def sharded_sync(self, shards=2):
+        version = self.k8s_client.get_cluster_version()
+        namespaces = list_namespaces(self.k8s_client)
+        results = [sync_cluster_scoped(self.cluster, self.k8s_client)]
+        results += [sync_namespace_shard(self.cluster, self.k8s_client, group)
+                    for group in split_namespaces(namespaces, shards)]
+        return finish_sharded_sync(self.cluster, version, namespaces, results)
+    
+    def remove_namespace(self, namespace):
+        fake = self.server.fake
+        fake.namespaces[:] = [item for item in fake.namespaces if item['metadata']['name'] != namespace]
+        for items in (fake.pods, fake.deployments, fake.replicasets, fake.services):
+            items[:] = [item for item in items if item['metadata']['namespace'] != namespace]
+    
+    def test_syncs_everything(self):
+        result = self.sharded_sync()
+        
+        self.assertEqual(result['metrics'], {'node_count': 4, 'pod_count': 30, 'namespace_count': 3})
+        self.assertEqual(result['changes']['pods'], {'created': 30, 'updated': 0, 'deleted': 0, 'unchanged': 0})
+        self.assertEqual(result['ownership'], {'replica_sets': 3, 'pods': 30})
+        self.assertEqual((Node.objects.count(), Pod.objects.count(), Service.objects.count()), (4, 30, 3))
+        cluster = Cluster.objects.get(pk=self.cluster.pk)
+        self.assertEqual((cluster.status, cluster.version, cluster.pod_count), ('healthy', 'v1.29', 30))
+        
+        # Unchanged on the next run
+        result = self.sharded_sync(shards=3)
+        self.assertEqual(result['changes']['pods'], {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 30})
+    
+    def test_a_shard_only_touches_its_namespaces(self):
+        self.sharded_sync()
+        del self.server.fake.pods[3]
+        self.remove_namespace('ns-1')
+        
+        result = sync_namespace_shard(self.cluster, self.k8s_client, ['ns-0'])
+        
+        self.assertEqual(result['counts'], {'pods': 9, 'deployments': 1, 'replicasets': 1, 'services': 1})
+        self.assertEqual(result['changes']['pods'], {'created': 0, 'updated': 0, 'deleted': 1, 'unchanged': 9})
+        # Rows of the other namespaces are left to their own shards
+        self.assertEqual(Pod.objects.filter(namespace='ns-1').count(), 10)
+    
+    def test_rows_of_vanished_namespaces_are_deleted(self):
+        self.sharded_sync()
+        self.remove_namespace('ns-2')
+        
+        result = self.sharded_sync()
+        
+        self.assertEqual(result['metrics']['namespace_count'], 2)
+        self.assertEqual(result['changes']['pods'], {'created': 0, 'updated': 0, 'deleted': 10, 'unchanged': 20})
+        self.assertEqual(result['changes']['services']['deleted'], 1)
+        self.assertFalse(Pod.objects.filter(namespace='ns-2').exists())
+        self.assertFalse(Deployment.objects.filter(namespace='ns-2').exists())
+
+
+@override_settings(K8S_SYNC_SHARDS=2, K8S_SYNC_SHARD_MIN_PODS=10, K8S_SYNC_JITTER=0)
+class ShardedSyncTaskTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(client_pool.clear)
+        Cluster.objects.filter(pk=self.cluster.pk).update(pod_count=30)
+        self.cluster.refresh_from_db()
+    
+    def claimed_at(self):
+        return Cluster.objects.values_list('sync_started_at', flat=True).get(pk=self.cluster.pk)
+    
+    def test_run_fans_out_shard_tasks(self):
+        claim_cluster_sync(self.cluster)
+        
+        with mock.patch('k8s_management.tasks.chord') as chord:
+            chord.return_value.return_value = mock.Mock(id='chord-1')
+            result = run_cluster_sync(self.cluster)
+        
+        shards = [signature.args for signature in chord.call_args.args[0]]
+        self.assertEqual((result['sharded'], result['shards'], result['task_id']), (True, len(shards), 'chord-1'))
+        self.assertEqual(sorted(namespace for _, group in shards for namespace in group), ['ns-0', 'ns-1', 'ns-2'])
+        self.assertEqual({cluster_id for cluster_id, _ in shards}, {self.cluster.pk})
+        # Nodes are synced up front; the claim is held until the chord callback
+        self.assertEqual(Node.objects.count(), 4)
+        self.assertEqual(Pod.objects.count(), 0)
+        self.assertIsNotNone(self.claimed_at())
+        self.assertEqual(list(ClusterSyncRun.objects.values_list('mode', 'status')), [('sharded', 'success')])
+    
+    def test_shard_and_finish_tasks_renew_then_release_the_claim(self):
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Cluster.objects.filter(pk=self.cluster.pk).update(sync_started_at=an_hour_ago)
+        scoped = sync_cluster_scoped(self.cluster, self.k8s_client)
+        
+        shard = sync_namespace_shard_task(self.cluster.pk, ['ns-0', 'ns-1', 'ns-2'])
+        
+        self.assertGreater(self.claimed_at(), an_hour_ago)
+        self.assertEqual(shard['counts']['pods'], 30)
+        
+        result = finish_sharded_sync_task([shard], self.cluster.pk, 'v1.29', ['ns-0', 'ns-1', 'ns-2'], scoped)
+        
+        self.assertEqual((result['shards'], result['metrics']['pod_count']), (1, 30))
+        cluster = Cluster.objects.get(pk=self.cluster.pk)
+        self.assertIsNone(cluster.sync_started_at)
+        self.assertGreater(cluster.next_sync_at, timezone.now())
+        self.assertEqual(list(ClusterSyncRun.objects.order_by('pk').values_list('mode', flat=True)),
+                         ['shard', 'finish'])
+    
+    def test_refresh_only_renews_a_held_claim(self):
+        refresh_cluster_sync(self.cluster)
+        self.assertIsNone(self.claimed_at())
+        
+        # A shard retried after the claim was released does not claim the cluster again
+        sync_namespace_shard_task(self.cluster.pk, ['ns-0'])
+        self.assertIsNone(self.claimed_at())
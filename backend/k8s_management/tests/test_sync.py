@@ -0,0 +1,26 @@
+from collections import Counter
+from .base import FakeClusterTestCase
+from ..models import Cluster
+from ..sync import sync_cluster
+
+
+class SyncClusterTests(FakeClusterTestCase):
+    def test_lists_every_kind_once(self):
+        sync_cluster(self.cluster, self.k8s_client)
+        
+        self.assertEqual(Counter(path for path, _ in self.server.fake.requests), {
+            '/version/': 1, '/api/v1/namespaces': 1, '/api/v1/nodes': 1, '/api/v1/pods': 1,
+            '/apis/apps/v1/deployments': 1, '/apis/apps/v1/replicasets': 1, '/api/v1/services': 1,
+        })
+    
+    def test_metrics_are_tallied_from_the_listing(self):
+        result = sync_cluster(self.cluster, self.k8s_client)
+        
+        # Every 20th pod of the fixtures is pending
+        self.assertEqual(result['metrics'], {'node_count': 4, 'pod_count': 30, 'namespace_count': 3,
+                                             'running_pods': 28, 'pending_pods': 2, 'failed_pods': 0})
+        self.assertEqual(result['version'], 'v1.29')
+        cluster = Cluster.objects.get(pk=self.cluster.pk)
+        self.assertEqual((cluster.status, cluster.version, cluster.node_count, cluster.pod_count,
+                          cluster.namespace_count), ('healthy', 'v1.29', 4, 30, 3))
+        self.assertIsNotNone(cluster.last_synced)
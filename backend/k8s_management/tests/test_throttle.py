@@ -0,0 +1,217 @@
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from email.utils import format_datetime
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from .base import FakeClusterTestCase
+from ..throttle import CircuitBreaker, CircuitOpenError, RequestPolicy, TokenBucket, retry_after
+
+
+class FakeClock:
+    """Stands in for the ``time`` module of throttle.py: sleeping advances the clock"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('k8s_management.throttle.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_bursts_then_paces(self):
+        bucket = TokenBucket(qps=10, burst=3)
+        
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(bucket.acquire(), 0.1)
+        self.assertAlmostEqual(bucket.acquire(), 0.1)
+        
+        # Idle time refills the bucket, up to the burst
+        self.clock.now += 60
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(bucket.acquire(), 0.1)
+    
+    def test_waiters_queue_up(self):
+        bucket = TokenBucket(qps=2, burst=1)
+        bucket.acquire()
+        # Three callers that arrive together are spread half a second apart
+        self.clock.sleep = self.clock.slept.append
+        
+        for _ in range(3):
+            bucket.acquire()
+        
+        self.assertEqual(self.clock.slept, [0.5, 1.0, 1.5])
+    
+    def test_no_limit(self):
+        bucket = TokenBucket(qps=0, burst=0)
+        
+        self.assertEqual([bucket.acquire() for _ in range(100)], [0.0] * 100)
+        self.assertEqual(self.clock.slept, [])
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('k8s_management.throttle.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+    
+    def open(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+    
+    def in_thread(self, function):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(function()))
+        thread.start()
+        thread.join()
+        return results[0]
+    
+    def test_opens_after_consecutive_failures(self):
+        self.assertEqual([self.breaker.record_failure(), self.breaker.record_failure()], [False, False])
+        self.breaker.record_success()
+        self.assertEqual([self.breaker.record_failure(), self.breaker.record_failure()], [False, False])
+        self.assertEqual((self.breaker.state, self.breaker.allow()), ('closed', None))
+        
+        self.assertTrue(self.breaker.record_failure())
+        
+        self.assertEqual((self.breaker.state, self.breaker.allow()), ('open', 60))
+        self.clock.now += 45
+        self.assertEqual(self.breaker.allow(), 15)
+    
+    def test_half_open_probe_closes_or_reopens(self):
+        self.open()
+        self.clock.now += 60
+        self.assertEqual(self.breaker.state, 'half-open')
+        
+        self.assertIsNone(self.breaker.allow())
+        # One probe at a time
+        self.assertEqual(self.in_thread(self.breaker.allow), 0.0)
+        self.assertTrue(self.breaker.record_failure())
+        self.assertEqual((self.breaker.state, self.breaker.allow()), ('open', 60))
+        
+        self.clock.now += 60
+        self.assertIsNone(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual((self.breaker.state, self.breaker.failures), ('closed', 0))
+        self.assertIsNone(self.in_thread(self.breaker.allow))
+    
+    def test_release_probe(self):
+        self.open()
+        self.clock.now += 60
+        self.assertIsNone(self.breaker.allow())
+        
+        # Only the thread that took the probe gives it up
+        self.in_thread(self.breaker.release_probe)
+        self.assertEqual(self.in_thread(self.breaker.allow), 0.0)
+        self.breaker.release_probe()
+        self.assertIsNone(self.in_thread(self.breaker.allow))
+
+
+class BackoffTests(SimpleTestCase):
+    def test_retry_after(self):
+        self.assertEqual(retry_after({'Retry-After': '7'}), 7)
+        self.assertEqual(retry_after({'Retry-After': '-3'}), 0)
+        later = datetime.now(dt_timezone.utc) + timedelta(seconds=120)
+        self.assertAlmostEqual(retry_after({'Retry-After': format_datetime(later, usegmt=True)}), 120, delta=2)
+        self.assertIsNone(retry_after({'Retry-After': 'soon'}))
+        self.assertIsNone(retry_after(None))
+    
+    @override_settings(K8S_API_BACKOFF_BASE=0.5, K8S_API_BACKOFF_MAX=4)
+    def test_backoff(self):
+        policy = RequestPolicy(1)
+        
+        self.assertEqual(policy.backoff(0, 2.5), 2.5)
+        self.assertEqual(policy.backoff(0, 600), 4)
+        for attempt, ceiling in ((0, 0.5), (2, 2), (10, 4)):
+            self.assertTrue(all(0 <= policy.backoff(attempt, None) <= ceiling for _ in range(50)))
+
+
+@override_settings(K8S_API_MAX_RETRIES=2, K8S_API_BACKOFF_BASE=0, K8S_API_BREAKER_THRESHOLD=2,
+                   K8S_API_BREAKER_RESET=60)
+class ThrottledApiClientTests(FakeClusterTestCase):
+    """Retries and the circuit breaker against the fake API server"""
+    
+    def setUp(self):
+        super().setUp()
+        self.policy = self.k8s_client.policy
+    
+    def metrics_requests(self):
+        return sum(1 for path, _ in self.server.fake.requests if path.startswith('/apis/metrics.k8s.io/'))
+    
+    def test_retries_unavailable_reads(self):
+        self.server.fake.metrics_status = 503
+        
+        # metrics-server unavailable after the retries
+        self.assertIsNone(self.k8s_client.get_resource_usage())
+        
+        self.assertEqual(self.metrics_requests(), 3)
+        self.assertEqual(self.policy.delta({}), {'requests': 3, 'retried': 2, 'failed': 1})
+        self.assertEqual((self.policy.breaker.state, self.policy.breaker.failures), ('closed', 1))
+    
+    def test_answers_are_not_retried_and_reset_the_failures(self):
+        self.server.fake.metrics_status = 503
+        self.k8s_client.get_resource_usage()
+        self.server.fake.metrics_status = 403
+        
+        with self.assertRaisesRegex(Exception, r'\(403\)'):
+            self.k8s_client.get_resource_usage()
+        
+        self.assertEqual(self.metrics_requests(), 4)
+        self.assertEqual(self.policy.breaker.failures, 0)
+    
+    def test_throttled_requests_are_retried(self):
+        self.server.fake.metrics_status = 429
+        self.policy.max_retries = 1
+        
+        with self.assertRaisesRegex(Exception, r'\(429\)'):
+            self.k8s_client.get_resource_usage()
+        
+        self.assertEqual(self.policy.counters['server_throttled'], 2)
+        self.assertEqual(self.policy.counters['retried'], 1)
+    
+    def test_circuit_opens_on_an_unreachable_server(self):
+        self.server.stop()
+        
+        self.assertFalse(self.k8s_client.test_connection())
+        self.assertFalse(self.k8s_client.test_connection())
+        self.assertEqual(self.policy.breaker.state, 'open')
+        
+        with self.assertRaises(Exception) as raised:
+            self.k8s_client.list_nodes()
+        self.assertIsInstance(raised.exception.__context__, CircuitOpenError)
+        self.assertGreater(raised.exception.__context__.retry_in, 59)
+        self.assertEqual(self.policy.delta({})['circuit_rejected'], 1)
+        self.assertEqual(self.policy.counters['circuit_opened'], 1)
+        # Connection errors of reads are retried before they count as one failure
+        self.assertEqual(self.policy.counters['requests'], 6)
+    
+    def test_probe_closes_the_circuit(self):
+        self.policy.breaker.failures, self.policy.breaker.opened_at = 2, 0.0
+        
+        self.assertEqual(self.policy.breaker.state, 'half-open')
+        self.assertEqual(len(self.k8s_client.list_nodes()), 4)
+        self.assertEqual(self.policy.breaker.state, 'closed')
+    
+    def test_unexpected_error_releases_the_probe(self):
+        self.policy.breaker.failures, self.policy.breaker.opened_at = 2, 0.0
+        
+        with mock.patch('kubernetes.client.ApiClient.request', side_effect=ValueError('bad response')):
+            with self.assertRaises(ValueError):
+                self.k8s_client.list_nodes()
+        
+        # Neither success nor failure was recorded, and the next request may probe again
+        self.assertEqual((self.policy.breaker.probing, self.policy.breaker.state), (False, 'half-open'))
+        self.assertEqual(len(self.k8s_client.list_nodes()), 4)
+        self.assertEqual(self.policy.breaker.state, 'closed')
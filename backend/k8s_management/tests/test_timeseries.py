@@ -0,0 +1,206 @@
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .base import FakeClusterTestCase
+from ..models import Cluster, UsageBlock
+from ..sync import sync_cluster
+from ..timeseries import (TIERS, apply_retention, choose_tier, parse_step, parse_timestamp, record_samples,
+                          rollup, usage_range)
+from ..usage import collect_cluster_usage
+
+
+class UsageHistoryTestCase(TestCase):
+    def setUp(self):
+        self.cluster = Cluster.objects.create(name='usage-history-test')
+        # The start of an hour, recent enough for the 1m tier to still cover it
+        self.hour = TIERS['1m'].block_start((timezone.now() - timedelta(hours=3)).timestamp())
+    
+    def record_hour(self, hour: datetime = None):
+        """Minute i of the hour gets i millicores and 2 ** 20 * i bytes"""
+        for minute in range(60):
+            record_samples(self.cluster, 'node', {'node-0': (minute, 2 ** 20 * minute)},
+                           at=(hour or self.hour) + timedelta(minutes=minute))
+    
+    def values(self, tier: str, start: datetime, entity: str = 'node-0'):
+        block = UsageBlock.objects.get(cluster=self.cluster, kind='node', entity=entity, tier=tier, start=start)
+        return TIERS[tier].load(block.data)
+
+
+class RecordSamplesTests(UsageHistoryTestCase):
+    def test_one_slot_per_minute(self):
+        at = self.hour + timedelta(minutes=5, seconds=30)
+        self.assertEqual(record_samples(self.cluster, 'node', {'node-0': (100, 2 ** 30), 'node-1': (50, None)},
+                                        at=at), 2)
+        
+        tier = TIERS['1m']
+        values = self.values('1m', self.hour)
+        self.assertEqual((tier.column(values, 'cpu')[5], tier.column(values, 'memory')[5]), (100, 2 ** 30))
+        self.assertEqual(sum(1 for value in values if not math.isnan(value)), 2)
+        self.assertTrue(math.isnan(tier.column(self.values('1m', self.hour, 'node-1'), 'memory')[5]))
+    
+    def test_a_minute_keeps_its_first_sample(self):
+        at = self.hour + timedelta(minutes=5)
+        record_samples(self.cluster, 'node', {'node-0': (100, 2 ** 30)}, at=at)
+        
+        self.assertEqual(record_samples(self.cluster, 'node', {'node-0': (999, 1)}, at=at + timedelta(seconds=40)), 0)
+        self.assertEqual(record_samples(self.cluster, 'node', {'node-0': (200, 2 ** 30)},
+                                        at=at + timedelta(minutes=1)), 1)
+        self.assertEqual(list(TIERS['1m'].column(self.values('1m', self.hour), 'cpu')[5:7]), [100, 200])
+        self.assertEqual(UsageBlock.objects.count(), 1)
+
+
+class UsageRangeTests(UsageHistoryTestCase):
+    def test_buckets_of_the_minute_tier(self):
+        self.record_hour()
+        
+        result = usage_range(self.cluster, 'node', 'node-0', self.hour, self.hour + timedelta(minutes=10), 300)
+        
+        self.assertEqual((result['tier'], result['step']), ('1m', 300))
+        self.assertEqual([point['timestamp'] for point in result['points']],
+                         [self.hour, self.hour + timedelta(minutes=5)])
+        # Minutes 0-4, then 5-9; the p95 of five samples is the highest
+        self.assertEqual([point['cpu'] for point in result['points']], [
+            {'avg': 2, 'max': 4, 'p95': 4},
+            {'avg': 7, 'max': 9, 'p95': 9},
+        ])
+        self.assertEqual(result['points'][1]['memory']['avg'], 2 ** 20 * 7)
+    
+    def test_buckets_span_blocks_and_gaps(self):
+        record_samples(self.cluster, 'node', {'node-0': (10, 1)}, at=self.hour - timedelta(minutes=1))
+        record_samples(self.cluster, 'node', {'node-0': (30, 3)}, at=self.hour)
+        
+        result = usage_range(self.cluster, 'node', 'node-0', self.hour - timedelta(minutes=1),
+                             self.hour + timedelta(minutes=5), 120)
+        
+        self.assertEqual([point['cpu']['avg'] for point in result['points']], [20, None, None])
+        self.assertEqual(result['points'][1]['memory'], {'avg': None, 'max': None, 'p95': None})
+    
+    def test_rejects_empty_and_oversized_ranges(self):
+        with self.assertRaises(ValueError):
+            usage_range(self.cluster, 'node', 'node-0', self.hour, self.hour, 60)
+        with self.assertRaises(ValueError):
+            usage_range(self.cluster, 'node', 'node-0', self.hour, self.hour + timedelta(days=8), 1)
+    
+    def test_choose_tier(self):
+        now = timezone.now()
+        
+        self.assertEqual(choose_tier(now - timedelta(hours=1), 60, now).name, '1m')
+        self.assertEqual(choose_tier(now - timedelta(hours=1), 7200, now).name, '1h')
+        # Older than the 1m retention: served by the next tier even for a fine step
+        self.assertEqual(choose_tier(now - timedelta(days=3), 60, now).name, '1h')
+        self.assertEqual(choose_tier(now - timedelta(days=60), 60, now).name, '1d')
+
+
+class RollupTests(UsageHistoryTestCase):
+    def test_rolls_complete_blocks_into_the_next_tier(self):
+        self.record_hour()
+        # The current hour is not complete yet and stays in the 1m tier
+        record_samples(self.cluster, 'node', {'node-0': (1, 1)}, at=timezone.now())
+        
+        self.assertEqual(rollup(), {'1h': 1, '1d': 0})
+        
+        tier = TIERS['1h']
+        day = tier.block_start(self.hour.timestamp())
+        slot = tier.slot(self.hour.timestamp())
+        values = self.values('1h', day)
+        self.assertEqual([tier.column(values, column)[slot] for column in ('cpu_avg', 'cpu_max', 'cpu_p95')],
+                         [29.5, 59, 56])
+        self.assertEqual(tier.column(values, 'memory_max')[slot], 2 ** 20 * 59)
+        self.assertEqual(sum(1 for value in tier.column(values, 'cpu_avg') if not math.isnan(value)), 1)
+        self.assertEqual(rollup(), {'1h': 0, '1d': 0})
+    
+    def test_rolled_up_hours_roll_into_days(self):
+        # The first two hours of a day, so both land in the same 1h block
+        day = TIERS['1h'].block_start(self.hour.timestamp()) - timedelta(days=1)
+        self.record_hour(day)
+        record_samples(self.cluster, 'node', {'node-0': (500, 1)}, at=day + timedelta(hours=1))
+        
+        # A day old: the new 1h block is complete and rolls up in the same pass
+        self.assertEqual(rollup(now=day + timedelta(days=1)), {'1h': 2, '1d': 1})
+        self.assertEqual(rollup(now=day + timedelta(days=1)), {'1h': 0, '1d': 0})
+        
+        tier = TIERS['1d']
+        values = self.values('1d', tier.block_start(day.timestamp()))
+        slot = tier.slot(day.timestamp())
+        self.assertEqual(tier.column(values, 'cpu_max')[slot], 500)
+        # The average of the hourly averages; the p95 of the hourly p95s
+        self.assertEqual(tier.column(values, 'cpu_avg')[slot], (29.5 + 500) / 2)
+        self.assertEqual(tier.column(values, 'cpu_p95')[slot], 500)
+    
+    def test_usage_range_reads_the_hour_tier(self):
+        self.record_hour()
+        rollup()
+        
+        result = usage_range(self.cluster, 'node', 'node-0', self.hour, self.hour + timedelta(hours=2), 3600)
+        
+        self.assertEqual(result['tier'], '1h')
+        self.assertEqual(result['points'][0]['cpu'], {'avg': 29.5, 'max': 59, 'p95': 56})
+        self.assertEqual(result['points'][1]['cpu'], {'avg': None, 'max': None, 'p95': None})
+
+
+@override_settings(K8S_USAGE_RETENTION_1M=3600)
+class ApplyRetentionTests(UsageHistoryTestCase):
+    def test_deletes_blocks_that_ended_before_the_window(self):
+        for hours in (1, 2, 3):
+            record_samples(self.cluster, 'node', {'node-0': (1, 1)}, at=self.hour - timedelta(hours=hours))
+        
+        # Blocks ending before now - 1h go; the block ending right at the edge stays
+        now = self.hour + timedelta(hours=1)
+        self.assertEqual(apply_retention(now), {'1m': 2, '1h': 0, '1d': 0})
+        self.assertEqual(list(UsageBlock.objects.values_list('start', flat=True)), [self.hour - timedelta(hours=1)])
+
+
+class ParseTests(SimpleTestCase):
+    def test_parse_step(self):
+        self.assertEqual([parse_step(value) for value in ('300', '45s', '5m', '2h', '1d')],
+                         [300, 45, 300, 7200, 86400])
+        self.assertEqual(parse_step(None), 60)
+        for value in ('0', '5w', '-1m', 'm'):
+            with self.assertRaises(ValueError):
+                parse_step(value)
+    
+    def test_parse_timestamp(self):
+        default = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        expected = datetime(2024, 3, 1, 12, tzinfo=dt_timezone.utc)
+        
+        self.assertEqual(parse_timestamp(None, default), default)
+        self.assertEqual(parse_timestamp(str(expected.timestamp()), default), expected)
+        self.assertEqual(parse_timestamp('2024-03-01T12:00:00Z', default), expected)
+        # Naive datetimes are taken as UTC
+        self.assertEqual(parse_timestamp('2024-03-01T12:00:00', default), expected)
+        with self.assertRaises(ValueError):
+            parse_timestamp('yesterday', default)
+
+
+class UsageEndpointTests(FakeClusterTestCase):
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+        collect_cluster_usage(self.cluster, self.k8s_client)
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user('tsu', password='tsu-password'))
+    
+    def test_node_and_pod_usage(self):
+        response = self.api.get(f'/api/kubernetes/clusters/{self.cluster.pk}/nodes/node-1/usage/?step=5m')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['tier'], len(response.data['points'])), ('1m', 12))
+        # The sample collected from the fake metrics-server: node-1 uses 37m
+        self.assertEqual([point['cpu']['max'] for point in response.data['points'] if point['cpu']['max']], [37])
+        
+        pod = 'ns-0/app-0-7d9f8c6b5-00001'
+        response = self.api.get(f'/api/kubernetes/clusters/{self.cluster.pk}/pods/{pod}/usage/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['entity'], pod)
+        self.assertEqual(sum(1 for point in response.data['points'] if point['memory']['avg']), 1)
+    
+    def test_invalid_parameters(self):
+        url = f'/api/kubernetes/clusters/{self.cluster.pk}/nodes/node-1/usage/'
+        
+        self.assertEqual(self.api.get(url, {'step': 'often'}).status_code, 400)
+        response = self.api.get(url, {'from': '2024-03-02T00:00:00Z', 'to': '2024-03-01T00:00:00Z'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': '"to" must be after "from"'})
@@ -0,0 +1,88 @@
+from django.test import TestCase
+from .base import FakeClusterTestCase
+from ..models import Cluster, Node, Pod, UsageBlock
+from ..sync import sync_cluster
+from ..usage import apply_node_usage, collect_cluster_usage
+
+
+class CollectClusterUsageTests(FakeClusterTestCase):
+    """collect_cluster_usage against the fake API server and its metrics.k8s.io lists"""
+    
+    def setUp(self):
+        super().setUp()
+        sync_cluster(self.cluster, self.k8s_client)
+    
+    def test_writes_usage_onto_synced_rows(self):
+        result = collect_cluster_usage(self.cluster, self.k8s_client)
+        
+        self.assertEqual(result, {'available': True, 'nodes': 4, 'pods': 30, 'updated_nodes': 4, 'updated_pods': 30})
+        # node-1 uses 37m of 3800m allocatable CPU and 553Mi of 15Gi allocatable memory
+        node = Node.objects.get(cluster=self.cluster, name='node-1')
+        self.assertEqual(node.cpu_usage, 0.97)
+        self.assertEqual(node.memory_usage, 3.6)
+        usage = self.k8s_client.get_resource_usage()
+        for pod in Pod.objects.filter(cluster=self.cluster):
+            cpu, memory = usage['pods'][(pod.namespace, pod.name)]
+            self.assertEqual((pod.cpu_usage_millicores, pod.memory_usage_bytes), (cpu, memory))
+            self.assertEqual(pod.memory_usage, f'{round(memory / 2 ** 20)}Mi')
+        self.assertTrue(UsageBlock.objects.filter(cluster=self.cluster, kind='node', entity='node-1').exists())
+    
+    def test_unchanged_usage_writes_nothing(self):
+        collect_cluster_usage(self.cluster, self.k8s_client)
+        result = collect_cluster_usage(self.cluster, self.k8s_client)
+        
+        self.assertEqual((result['updated_nodes'], result['updated_pods']), (0, 0))
+    
+    def test_metrics_api_not_served(self):
+        self.server.fake.metrics_status = 404
+        
+        self.assertEqual(collect_cluster_usage(self.cluster, self.k8s_client), {'available': False})
+        self.assertFalse(Node.objects.filter(cluster=self.cluster, cpu_usage__isnull=False).exists())
+        self.assertFalse(UsageBlock.objects.exists())
+    
+    def test_metrics_server_unavailable(self):
+        self.server.fake.metrics_status = 503
+        
+        self.assertEqual(collect_cluster_usage(self.cluster, self.k8s_client), {'available': False})
+        self.assertFalse(Pod.objects.filter(cluster=self.cluster, cpu_usage_millicores__isnull=False).exists())
+    
+    def test_other_errors_are_raised(self):
+        self.server.fake.metrics_status = 403
+        
+        with self.assertRaises(Exception):
+            collect_cluster_usage(self.cluster, self.k8s_client)
+
+
+class ApplyNodeUsageTests(TestCase):
+    def setUp(self):
+        self.cluster = Cluster.objects.create(name='node-usage-test')
+        Node.objects.create(cluster=self.cluster, name='a', cpu_allocatable_millicores=4000,
+                            memory_allocatable_bytes=8 * 2 ** 30)
+        Node.objects.create(cluster=self.cluster, name='b', cpu_allocatable_millicores=0,
+                            memory_allocatable_bytes=None)
+        Node.objects.create(cluster=self.cluster, name='c', cpu_allocatable_millicores=1000,
+                            memory_allocatable_bytes=2 ** 30, cpu_usage=50.0, memory_usage=50.0)
+    
+    def usage(self, name):
+        return Node.objects.values_list('cpu_usage', 'memory_usage').get(cluster=self.cluster, name=name)
+    
+    def test_percentages_of_allocatable(self):
+        updated = apply_node_usage(self.cluster, {
+            'a': (1000, 2 ** 30),
+            'b': (500, 2 ** 30),
+            'c': (333, None),
+        })
+        
+        self.assertEqual(updated, 2)
+        self.assertEqual(self.usage('a'), (25.0, 12.5))
+        # No allocatable to divide by: unknown rather than a division by zero
+        self.assertEqual(self.usage('b'), (None, None))
+        self.assertEqual(self.usage('c'), (33.3, None))
+    
+    def test_missing_nodes_are_cleared_and_unchanged_rows_skipped(self):
+        self.assertEqual(apply_node_usage(self.cluster, {'a': (1000, 2 ** 30), 'c': (500, 2 ** 29)}), 1)
+        self.assertEqual(self.usage('c'), (50.0, 50.0))
+        
+        self.assertEqual(apply_node_usage(self.cluster, {'a': (1000, 2 ** 30)}), 1)
+        self.assertEqual(self.usage('c'), (None, None))
+        self.assertEqual(self.usage('a'), (25.0, 12.5))
@@ -0,0 +1,259 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from django.conf import settings
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from urllib3.exceptions import HTTPError
+from urllib3.util.retry import Retry
+from .instrumentation import active_recorder, phase, record_bytes
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``qps`` requests per second with bursts of ``burst``.
+
+    Callers reserve a token and sleep outside the lock until it is due, so
+    waiting threads are served in arrival order.
+    """
+    
+    def __init__(self, qps: float, burst: int):
+        self.qps = qps
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """Take a token, waiting for it if needed; returns the seconds waited"""
+        if self.qps <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.qps)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.qps if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class CircuitOpenError(ApiException):
+    """Raised instead of calling an API server whose circuit breaker is open"""
+    
+    def __init__(self, cluster_id, retry_in: float):
+        super().__init__(reason=f'Circuit breaker open for cluster {cluster_id}, retry in {retry_in:.0f}s')
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Stops calling an API server after ``threshold`` consecutive failed requests.
+
+    Once open, requests fail fast for ``reset_timeout`` seconds; then a single
+    probe request is let through (half-open) and its outcome closes or
+    re-opens the circuit.
+    """
+    
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._prober = None
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+    
+    def allow(self) -> Optional[float]:
+        """None when a request may be sent, otherwise the seconds until the next probe"""
+        with self._lock:
+            if self.opened_at is None:
+                return None
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self.probing:
+                return max(remaining, 0.0)
+            self.probing = True
+            self._prober = threading.get_ident()
+            return None
+    
+    def release_probe(self):
+        """Give up the probe taken by this thread, if its outcome was never recorded"""
+        with self._lock:
+            if self.probing and self._prober == threading.get_ident():
+                self.probing = False
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+    
+    def record_failure(self) -> bool:
+        """Count a failed request; returns whether this opened the circuit"""
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                self.probing = False
+                return True
+            return False
+
+
+class RequestPolicy:
+    """Rate limit, retries and circuit breaker shared by every client of one cluster.
+
+    ``counters`` tally requests sent, requests delayed by the token bucket
+    (``throttled``), 429 answers (``server_throttled``), retries, requests that
+    failed after their retries and requests rejected by the open circuit.
+    """
+    
+    def __init__(self, cluster_id):
+        self.cluster_id = cluster_id
+        self.bucket = TokenBucket(_setting('K8S_API_QPS', 20), _setting('K8S_API_BURST', 40))
+        self.breaker = CircuitBreaker(_setting('K8S_API_BREAKER_THRESHOLD', 5),
+                                      _setting('K8S_API_BREAKER_RESET', 60))
+        self.max_retries = _setting('K8S_API_MAX_RETRIES', 3)
+        self.backoff_base = _setting('K8S_API_BACKOFF_BASE', 0.5)
+        self.backoff_max = _setting('K8S_API_BACKOFF_MAX', 30)
+        self.counters = Counter()
+        self._lock = threading.Lock()
+    
+    def count(self, name: str, amount: float = 1):
+        with self._lock:
+            self.counters[name] += amount
+    
+    def backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Seconds to wait before retry ``attempt``: Retry-After when sent, else full-jitter exponential"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+    
+    def delta(self, before: Dict) -> Dict:
+        """Counter increments since an earlier ``stats()``"""
+        return {name: value - before.get(name, 0) for name, value in self.stats().items()
+                if isinstance(value, (int, float)) and name != 'consecutive_failures'}
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {'circuit': self.breaker.state, 'consecutive_failures': self.breaker.failures, **counters}
+
+
+_policies: Dict[int, RequestPolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def policy_for(cluster_id) -> RequestPolicy:
+    """The process-wide request policy of a cluster, kept across client rebuilds"""
+    with _policies_lock:
+        policy = _policies.get(cluster_id)
+        if policy is None:
+            policy = _policies[cluster_id] = RequestPolicy(cluster_id)
+        return policy
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP date)"""
+    value = (headers or {}).get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(dt_timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ThrottledApiClient(client.ApiClient):
+    """ApiClient whose requests go through the cluster's RequestPolicy.
+
+    Every request takes a token from the bucket. 429 answers are retried
+    for any method (the server did not process them); 5xx answers and
+    connection errors only for idempotent reads. Exhausted retries count as a
+    failure for the circuit breaker, any other answer as a success.
+    """
+    
+    def __init__(self, policy: RequestPolicy, configuration: client.Configuration, *args, **kwargs):
+        # Retries are decided here; urllib3 would otherwise retry 429/503 on its own
+        configuration.retries = Retry(total=0, respect_retry_after_header=False)
+        super().__init__(configuration, *args, **kwargs)
+        self.policy = policy
+    
+    def request(self, method, url, *args, **kwargs):
+        policy = self.policy
+        retry_in = policy.breaker.allow()
+        if retry_in is not None:
+            policy.count('circuit_rejected')
+            raise CircuitOpenError(policy.cluster_id, retry_in)
+        try:
+            return self._send(method, url, *args, **kwargs)
+        finally:
+            # A probe ending in anything but an answer or HTTPError must not hold the circuit half-open
+            policy.breaker.release_probe()
+    
+    def _send(self, method, url, *args, **kwargs):
+        policy = self.policy
+        attempt = 0
+        while True:
+            with phase('throttle'):
+                waited = policy.bucket.acquire()
+            if waited:
+                policy.count('throttled')
+                policy.count('throttled_seconds', waited)
+            policy.count('requests')
+            recorder = active_recorder()
+            if recorder is not None:
+                recorder.api_requests += 1
+            try:
+                with phase('api'):
+                    response = super().request(method, url, *args, **kwargs)
+                    if kwargs.get('_preload_content', True):
+                        record_bytes(len(response.data or b''))
+                policy.breaker.record_success()
+                return response
+            except ApiException as e:
+                if e.status == 429:
+                    policy.count('server_throttled')
+                elif e.status not in RETRYABLE_STATUSES:
+                    # The server answered, it is up
+                    policy.breaker.record_success()
+                    raise
+                error, wait_hint = e, retry_after(e.headers)
+                retryable = e.status == 429 or method in IDEMPOTENT_METHODS
+            except HTTPError as e:
+                error, wait_hint, retryable = e, None, method in IDEMPOTENT_METHODS
+            
+            if not retryable or attempt >= policy.max_retries:
+                policy.count('failed')
+                if policy.breaker.record_failure():
+                    policy.count('circuit_opened')
+                raise error
+            policy.count('retried')
+            with phase('backoff'):
+                time.sleep(policy.backoff(attempt, wait_hint))
+            attempt += 1
+    
+    def deserialize(self, response, response_type):
+        with phase('decode'):
+            return super().deserialize(response, response_type)
@@ -0,0 +1,319 @@
+import math
+import re
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Cluster, UsageBlock
+
+NAN = float('nan')
+METRICS = ('cpu', 'memory')
+STATS = ('avg', 'max', 'p95')
+MAX_POINTS = 10000
+
+
+class Tier:
+    """One resolution of the usage history.
+
+    A block of the tier covers ``slots`` consecutive samples ``step`` seconds
+    apart, aligned to the epoch, so every source block of the next finer tier
+    rolls up into exactly one slot of this tier.
+    """
+    
+    def __init__(self, name: str, step: int, slots: int, columns: Sequence[str],
+                 retention_setting: str, default_retention: int, source: Optional[str] = None):
+        self.name = name
+        self.step = step
+        self.slots = slots
+        self.columns = tuple(columns)
+        self.retention_setting = retention_setting
+        self.default_retention = default_retention
+        self.source = source
+    
+    @property
+    def span(self) -> int:
+        return self.step * self.slots
+    
+    @property
+    def retention(self) -> timedelta:
+        return timedelta(seconds=getattr(settings, self.retention_setting, self.default_retention))
+    
+    def block_start(self, ts: float) -> datetime:
+        return datetime.fromtimestamp(ts - ts % self.span, tz=dt_timezone.utc)
+    
+    def slot(self, ts: float) -> int:
+        return int(ts % self.span // self.step)
+    
+    def empty(self) -> array:
+        return array('d', [NAN]) * (len(self.columns) * self.slots)
+    
+    def load(self, data) -> array:
+        values = array('d')
+        values.frombytes(bytes(data))
+        return values
+    
+    def column(self, values: array, name: str) -> array:
+        offset = self.columns.index(name) * self.slots
+        return values[offset:offset + self.slots]
+    
+    def __repr__(self):
+        return f'Tier({self.name!r})'
+
+
+_ROLLUP_COLUMNS = tuple(f'{metric}_{stat}' for metric in METRICS for stat in STATS)
+
+# Finest first; 1m blocks cover an hour, 1h blocks a day and 1d blocks 30 days
+TIERS: Dict[str, Tier] = OrderedDict((tier.name, tier) for tier in (
+    Tier('1m', 60, 60, METRICS, 'K8S_USAGE_RETENTION_1M', 2 * 86400),
+    Tier('1h', 3600, 24, _ROLLUP_COLUMNS, 'K8S_USAGE_RETENTION_1H', 30 * 86400, source='1m'),
+    Tier('1d', 86400, 30, _ROLLUP_COLUMNS, 'K8S_USAGE_RETENTION_1D', 365 * 86400, source='1h'),
+))
+
+
+def _finite(values) -> List[float]:
+    return [value for value in values if not math.isnan(value)]
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of ``values``, None when empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(avg_values: Sequence[float], max_values: Sequence[float],
+              p95_values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """avg/max/p95 of one bucket; the three inputs are the same samples on the 1m tier"""
+    return {
+        'avg': sum(avg_values) / len(avg_values) if avg_values else None,
+        'max': max(max_values) if max_values else None,
+        'p95': percentile(p95_values, 95),
+    }
+
+
+def record_samples(cluster: Cluster, kind: str, samples: Dict[str, Tuple], at: Optional[datetime] = None) -> int:
+    """Store one ``entity -> (cpu_millicores, memory_bytes)`` sample per entity in the 1m tier.
+
+    The blocks of the current hour are read in one query and written back in
+    bulk. A minute that already holds a sample is left as is, so calling this
+    more often than once a minute does not add writes.
+    """
+    tier = TIERS['1m']
+    ts = (at or timezone.now()).timestamp()
+    start, slot = tier.block_start(ts), tier.slot(ts)
+    
+    existing = {
+        entity: (pk, data) for pk, entity, data in UsageBlock.objects.filter(
+            cluster=cluster, kind=kind, tier=tier.name, start=start
+        ).values_list('pk', 'entity', 'data')
+    }
+    
+    to_create, to_update = [], []
+    for entity, sample in samples.items():
+        current = existing.get(entity)
+        values = tier.load(current[1]) if current else tier.empty()
+        if not math.isnan(values[slot]):
+            continue
+        for index, value in enumerate(sample):
+            values[index * tier.slots + slot] = NAN if value is None else value
+        
+        if current:
+            to_update.append(UsageBlock(pk=current[0], data=values.tobytes()))
+        else:
+            to_create.append(UsageBlock(cluster=cluster, kind=kind, entity=entity, tier=tier.name,
+                                        start=start, data=values.tobytes()))
+    
+    batch_size = getattr(settings, 'K8S_SYNC_BATCH_SIZE', 1000)
+    with transaction.atomic():
+        UsageBlock.objects.bulk_create(to_create, batch_size=batch_size, ignore_conflicts=True)
+        UsageBlock.objects.bulk_update(to_update, ['data'], batch_size=batch_size)
+    return len(to_create) + len(to_update)
+
+
+def _rollup_block(source: Tier, values: array) -> Dict[str, Dict[str, Optional[float]]]:
+    if source.name == '1m':
+        return {metric: summarize(*[_finite(source.column(values, metric))] * 3) for metric in METRICS}
+    return {metric: summarize(*(_finite(source.column(values, f'{metric}_{stat}')) for stat in STATS))
+            for metric in METRICS}
+
+
+def rollup(now: Optional[datetime] = None, chunk_size: int = 500) -> Dict[str, int]:
+    """Downsample every complete block of a finer tier into its slot of the next tier.
+
+    Returns the number of source blocks rolled up per target tier.
+    """
+    now = now or timezone.now()
+    rolled = {}
+    
+    for target in TIERS.values():
+        if target.source is None:
+            continue
+        source = TIERS[target.source]
+        complete = UsageBlock.objects.filter(
+            tier=source.name, rolled_up=False, start__lte=now - timedelta(seconds=source.span)
+        ).order_by('pk')
+        
+        rolled[target.name] = 0
+        while True:
+            blocks = list(complete.values_list('pk', 'cluster_id', 'kind', 'entity', 'start', 'data')[:chunk_size])
+            if not blocks:
+                break
+            _rollup_chunk(source, target, blocks)
+            rolled[target.name] += len(blocks)
+    
+    return rolled
+
+
+def _rollup_chunk(source: Tier, target: Tier, blocks: List[tuple]):
+    starts = {target.block_start(block[4].timestamp()) for block in blocks}
+    existing = {
+        (cluster_id, kind, entity, start): (pk, data)
+        for pk, cluster_id, kind, entity, start, data in UsageBlock.objects.filter(
+            tier=target.name, start__in=starts,
+            cluster_id__in={block[1] for block in blocks}, kind__in={block[2] for block in blocks},
+            entity__in={block[3] for block in blocks},
+        ).values_list('pk', 'cluster_id', 'kind', 'entity', 'start', 'data')
+    }
+    
+    targets = {}
+    for _, cluster_id, kind, entity, start, data in blocks:
+        ts = start.timestamp()
+        key = (cluster_id, kind, entity, target.block_start(ts))
+        if key not in targets:
+            current = existing.get(key)
+            targets[key] = (current[0] if current else None,
+                            target.load(current[1]) if current else target.empty())
+        
+        values = targets[key][1]
+        slot = target.slot(ts)
+        for metric, stats in _rollup_block(source, source.load(data)).items():
+            for stat, value in stats.items():
+                offset = target.columns.index(f'{metric}_{stat}') * target.slots
+                values[offset + slot] = NAN if value is None else value
+    
+    to_create, to_update = [], []
+    for (cluster_id, kind, entity, start), (pk, values) in targets.items():
+        if pk:
+            to_update.append(UsageBlock(pk=pk, data=values.tobytes()))
+        else:
+            to_create.append(UsageBlock(cluster_id=cluster_id, kind=kind, entity=entity, tier=target.name,
+                                        start=start, data=values.tobytes()))
+    
+    with transaction.atomic():
+        UsageBlock.objects.bulk_create(to_create, ignore_conflicts=True)
+        UsageBlock.objects.bulk_update(to_update, ['data'])
+        UsageBlock.objects.filter(pk__in=[block[0] for block in blocks]).update(rolled_up=True)
+
+
+def apply_retention(now: Optional[datetime] = None) -> Dict[str, int]:
+    """Delete the blocks of each tier that ended before its retention window"""
+    now = now or timezone.now()
+    return {
+        tier.name: UsageBlock.objects.filter(
+            tier=tier.name, start__lt=now - tier.retention - timedelta(seconds=tier.span)
+        ).delete()[0]
+        for tier in TIERS.values()
+    }
+
+
+def choose_tier(start: datetime, step: int, now: Optional[datetime] = None) -> Tier:
+    """Coarsest tier no coarser than ``step`` whose retention still covers ``start``"""
+    now = now or timezone.now()
+    tiers = list(TIERS.values())
+    index = max([i for i, tier in enumerate(tiers) if tier.step <= step] or [0])
+    while index < len(tiers) - 1 and start < now - tiers[index].retention:
+        index += 1
+    return tiers[index]
+
+
+def usage_range(cluster: Cluster, kind: str, entity: str, start: datetime, end: datetime,
+                step: int) -> Dict:
+    """avg/max/p95 of cpu (millicores) and memory (bytes) per ``step`` bucket between start and end"""
+    if end <= start:
+        raise ValueError('"to" must be after "from"')
+    
+    tier = choose_tier(start, step)
+    step = max(step, tier.step)
+    start_ts, end_ts = start.timestamp(), end.timestamp()
+    buckets = math.ceil((end_ts - start_ts) / step)
+    if buckets > MAX_POINTS:
+        raise ValueError(f'Range too large for step {step}s: at most {MAX_POINTS} points')
+    
+    # One list per bucket and column, filled block by block
+    columns = {column: [[] for _ in range(buckets)] for column in tier.columns}
+    blocks = UsageBlock.objects.filter(
+        cluster=cluster, kind=kind, entity=entity, tier=tier.name,
+        start__gte=tier.block_start(start_ts), start__lt=end,
+    ).values_list('start', 'data')
+    
+    for block_start, data in blocks:
+        values = tier.load(data)
+        first = block_start.timestamp()
+        # Walk the buckets the block overlaps; each takes its run of slots as one slice per
+        # column, so every column of the blob is read once
+        index = max(0, int((first - start_ts) // step))
+        while index < buckets:
+            low = max(0, math.ceil((start_ts + index * step - first) / tier.step))
+            if low >= tier.slots:
+                break
+            high = min(tier.slots, math.ceil((start_ts + (index + 1) * step - first) / tier.step))
+            for position, column in enumerate(tier.columns):
+                offset = position * tier.slots
+                columns[column][index].extend(_finite(values[offset + low:offset + high]))
+            index += 1
+    
+    points = []
+    for index in range(buckets):
+        point = {'timestamp': datetime.fromtimestamp(start_ts + index * step, tz=dt_timezone.utc)}
+        for metric in METRICS:
+            if tier.name == '1m':
+                samples = columns[metric][index]
+                point[metric] = summarize(samples, samples, samples)
+            else:
+                point[metric] = summarize(*(columns[f'{metric}_{stat}'][index] for stat in STATS))
+        points.append(point)
+    
+    return {
+        'cluster': cluster.pk,
+        'kind': kind,
+        'entity': entity,
+        'tier': tier.name,
+        'step': step,
+        'from': start,
+        'to': end,
+        'units': {'cpu': 'millicores', 'memory': 'bytes'},
+        'points': points,
+    }
+
+
+_DURATION = re.compile(r'^(\d+)([smhd]?)$')
+_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_step(value: Optional[str], default: int = 60) -> int:
+    """Parse a step such as "300", "5m", "1h" or "1d" into seconds"""
+    if not value:
+        return default
+    match = _DURATION.match(value.strip())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f'Invalid step: {value}')
+    return int(match.group(1)) * _UNITS[match.group(2)]
+
+
+def parse_timestamp(value: Optional[str], default: datetime) -> datetime:
+    """Parse a unix timestamp or an ISO 8601 datetime"""
+    if not value:
+        return default
+    try:
+        return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    except ValueError:
+        pass
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'Invalid timestamp: {value}')
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, dt_timezone.utc)
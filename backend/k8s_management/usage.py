@@ -0,0 +1,86 @@
+from typing import Dict, Optional
+from django.conf import settings
+from django.db import transaction
+from .models import Cluster, Node, Pod
+from .k8s_client import KubernetesClient
+from .timeseries import record_samples
+
+
+def _percent(used: Optional[int], total: Optional[int]) -> Optional[float]:
+    if used is None or not total:
+        return None
+    return round(used * 100 / total, 2)
+
+
+def format_cpu(millicores: Optional[int]) -> str:
+    return f'{millicores}m' if millicores is not None else ''
+
+
+def format_memory(value: Optional[int]) -> str:
+    return f'{round(value / 2 ** 20)}Mi' if value is not None else ''
+
+
+def apply_node_usage(cluster: Cluster, usage: Dict, batch_size: int = 1000) -> int:
+    """Write node usage as a percentage of allocatable, only for rows whose value changed"""
+    changed = []
+    rows = Node.objects.filter(cluster=cluster).values_list(
+        'pk', 'name', 'cpu_allocatable_millicores', 'memory_allocatable_bytes', 'cpu_usage', 'memory_usage'
+    )
+    for pk, name, cpu_allocatable, memory_allocatable, cpu_usage, memory_usage in rows:
+        cpu, memory = usage.get(name, (None, None))
+        values = (_percent(cpu, cpu_allocatable), _percent(memory, memory_allocatable))
+        if values != (cpu_usage, memory_usage):
+            changed.append(Node(pk=pk, cpu_usage=values[0], memory_usage=values[1]))
+    
+    Node.objects.bulk_update(changed, ['cpu_usage', 'memory_usage'], batch_size=batch_size)
+    return len(changed)
+
+
+def apply_pod_usage(cluster: Cluster, usage: Dict, namespace: Optional[str] = None,
+                    batch_size: int = 1000) -> int:
+    """Write pod usage joined on (namespace, name), only for rows whose value changed"""
+    pods = Pod.objects.filter(cluster=cluster)
+    if namespace:
+        pods = pods.filter(namespace=namespace)
+    
+    changed = []
+    rows = pods.values_list('pk', 'namespace', 'name', 'cpu_usage_millicores', 'memory_usage_bytes')
+    for pk, pod_namespace, name, cpu_usage, memory_usage in rows.iterator(chunk_size=5000):
+        cpu, memory = usage.get((pod_namespace, name), (None, None))
+        if (cpu, memory) != (cpu_usage, memory_usage):
+            changed.append(Pod(pk=pk, cpu_usage=format_cpu(cpu), memory_usage=format_memory(memory),
+                               cpu_usage_millicores=cpu, memory_usage_bytes=memory))
+    
+    Pod.objects.bulk_update(
+        changed, ['cpu_usage', 'memory_usage', 'cpu_usage_millicores', 'memory_usage_bytes'],
+        batch_size=batch_size
+    )
+    return len(changed)
+
+
+def collect_cluster_usage(cluster: Cluster, k8s_client: KubernetesClient) -> Dict:
+    """Pull current usage from metrics-server and write it onto the synced node and pod rows.
+    
+    Clusters without metrics-server are reported as unavailable and left untouched.
+    """
+    usage = k8s_client.get_resource_usage()
+    if usage is None:
+        return {'available': False}
+    
+    batch_size = getattr(settings, 'K8S_SYNC_BATCH_SIZE', 1000)
+    with transaction.atomic():
+        nodes = apply_node_usage(cluster, usage['nodes'], batch_size)
+        pods = apply_pod_usage(cluster, usage['pods'], batch_size=batch_size)
+    
+    if getattr(settings, 'K8S_USAGE_HISTORY', True):
+        record_samples(cluster, 'node', usage['nodes'])
+        record_samples(cluster, 'pod', {f'{namespace}/{name}': values
+                                        for (namespace, name), values in usage['pods'].items()})
+    
+    return {
+        'available': True,
+        'nodes': len(usage['nodes']),
+        'pods': len(usage['pods']),
+        'updated_nodes': nodes,
+        'updated_pods': pods,
+    }
@@ -2,11 +2,28 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse
 from django.utils import timezone
-from .models import Cluster, Node, Pod, Deployment, Service
-from .serializers import (ClusterSerializer, NodeSerializer, PodSerializer,
-                          DeploymentSerializer, ServiceSerializer)
-from .k8s_client import KubernetesClient
+from .models import Cluster, Node, Pod, Deployment, ReplicaSet, Service, Tombstone
+from .serializers import (ClusterSerializer, ClusterSyncRunSerializer, NodeSerializer, PodSerializer,
+                          DeploymentSerializer, ReplicaSetSerializer, ServiceSerializer)
+from .k8s_client import client_pool
+from .tasks import enqueue_cluster_sync
+from .fleet import run_fleet, check_cluster_health
+from .capacity import cluster_capacity, fleet_capacity
+from .timeseries import parse_step, parse_timestamp, usage_range
+from .labels import selector_q
+from .registry import kind_for_model
+from .ownership import workload_rollup
+from .inventory import query_inventory
+from .revisions import current_revision, pruned_through
+from .throttle import policy_for
+from .instrumentation import prometheus_metrics
 from audit.utils import log_audit
 
 
@@ -28,145 +45,319 @@ class ClusterViewSet(viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         log_audit(self.request.user, 'DELETE', 'Cluster', instance.id,
                   f'Deleted cluster: {instance.name}')
+        client_pool.invalidate(instance.pk)
         instance.delete()
     
     @action(detail=True, methods=['post'])
     def sync(self, request, pk=None):
-        """Sync cluster data from Kubernetes API"""
+        """Queue a background sync of cluster data from Kubernetes API"""
         cluster = self.get_object()
         
-        try:
-            k8s_client = KubernetesClient(cluster)
-            
-            # Test connection
-            if not k8s_client.test_connection():
-                return Response(
-                    {'error': 'Failed to connect to cluster'},
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
-                )
-            
-            # Get cluster metrics
-            metrics = k8s_client.get_cluster_metrics()
-            version = k8s_client.get_cluster_version()
-            
-            # Update cluster
-            cluster.version = version
-            cluster.node_count = metrics['node_count']
-            cluster.pod_count = metrics['pod_count']
-            cluster.namespace_count = metrics['namespace_count']
-            cluster.status = 'healthy'
-            cluster.last_synced = timezone.now()
-            cluster.save()
-            
-            # Sync nodes
-            nodes_data = k8s_client.list_nodes()
-            for node_data in nodes_data:
-                Node.objects.update_or_create(
-                    cluster=cluster,
-                    name=node_data['name'],
-                    defaults={
-                        'status': node_data['status'],
-                        'role': node_data['role'],
-                        'version': node_data['version'],
-                        'os': node_data['os'],
-                        'cpu_capacity': node_data['cpu_capacity'],
-                        'memory_capacity': node_data['memory_capacity'],
-                    }
-                )
-            
-            # Sync pods
-            pods_data = k8s_client.list_pods()
-            for pod_data in pods_data:
-                Pod.objects.update_or_create(
-                    cluster=cluster,
-                    name=pod_data['name'],
-                    namespace=pod_data['namespace'],
-                    defaults={
-                        'status': pod_data['status'],
-                        'node': pod_data['node'],
-                        'ip': pod_data['ip'],
-                        'restarts': pod_data['restarts'],
-                    }
-                )
-            
-            # Sync deployments
-            deployments_data = k8s_client.list_deployments()
-            for deploy_data in deployments_data:
-                Deployment.objects.update_or_create(
-                    cluster=cluster,
-                    name=deploy_data['name'],
-                    namespace=deploy_data['namespace'],
-                    defaults={
-                        'replicas': deploy_data['replicas'],
-                        'ready_replicas': deploy_data['ready_replicas'],
-                        'available_replicas': deploy_data['available_replicas'],
-                    }
-                )
-            
-            log_audit(request.user, 'SYNC', 'Cluster', cluster.id,
-                      f'Synced cluster: {cluster.name}')
-            
-            return Response({
-                'status': 'synced',
-                'metrics': metrics,
-                'version': version
-            })
-            
-        except Exception as e:
-            cluster.status = 'offline'
-            cluster.save()
+        task_id = enqueue_cluster_sync(cluster)
+        if task_id is None:
+            cluster.refresh_from_db(fields=['sync_task_id'])
             return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'status': 'already_running', 'task_id': cluster.sync_task_id},
+                status=status.HTTP_409_CONFLICT
             )
+        
+        log_audit(request.user, 'SYNC', 'Cluster', cluster.id,
+                  f'Queued sync of cluster: {cluster.name}')
+        
+        return Response({'status': 'queued', 'task_id': task_id},
+                        status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['post'])
+    def health(self, request):
+        """Check connectivity of every cluster concurrently and record status and version (a write, hence POST)"""
+        clusters = list(self.get_queryset())
+        report = run_fleet(clusters, check_cluster_health,
+                           timeout=getattr(settings, 'K8S_FLEET_TIMEOUT', 10),
+                           concurrency=getattr(settings, 'K8S_FLEET_CONCURRENCY', 20))
+        
+        # Only rows whose values change are written, with conditional updates so a
+        # status written meanwhile by a running sync is never overwritten
+        by_id = {cluster.pk: cluster for cluster in clusters}
+        for entry in report['results']:
+            cluster = by_id[entry['cluster']]
+            rows = Cluster.objects.filter(pk=cluster.pk)
+            if entry['ok']:
+                version = entry['result']['version']
+                if cluster.version != version:
+                    rows.exclude(version=version).update(version=version)
+                if cluster.status == 'offline':
+                    rows.filter(status='offline').update(status='healthy')
+            elif cluster.status != 'offline':
+                rows.exclude(status='offline').update(status='offline')
+        
+        return Response(report)
+    
+    @action(detail=False, methods=['post'], url_path='sync-all')
+    def sync_all(self, request):
+        """Queue a background sync of every cluster; clusters already syncing are reported as such"""
+        results = []
+        for cluster in self.get_queryset():
+            task_id = enqueue_cluster_sync(cluster)
+            if task_id is None:
+                cluster.refresh_from_db(fields=['sync_task_id'])
+                results.append({'cluster': cluster.pk, 'name': cluster.name, 'status': 'already_running',
+                                'task_id': cluster.sync_task_id})
+            else:
+                results.append({'cluster': cluster.pk, 'name': cluster.name, 'status': 'queued',
+                                'task_id': task_id})
+        
+        queued = sum(1 for entry in results if entry['status'] == 'queued')
+        log_audit(request.user, 'SYNC', 'Cluster', '',
+                  f'Queued sync of {queued}/{len(results)} clusters')
+        
+        return Response({'total': len(results), 'queued': queued, 'already_running': len(results) - queued,
+                         'results': results}, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'], url_path='sync-runs')
+    def sync_runs(self, request, pk=None):
+        """Phase timings, query counts and bytes received of the cluster's recent syncs (paginated)"""
+        cluster = self.get_object()
+        runs = cluster.sync_runs.all()
+        mode = request.query_params.get('mode')
+        if mode:
+            runs = runs.filter(mode=mode)
+        page = self.paginate_queryset(runs)
+        return self.get_paginated_response(ClusterSyncRunSerializer(page, many=True).data)
+    
+    @action(detail=False, methods=['get'], url_path='sync-metrics')
+    def sync_metrics(self, request):
+        """Latest sync run of every cluster in the Prometheus text format"""
+        return HttpResponse(prometheus_metrics(self.get_queryset()),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    @action(detail=True, methods=['get'], url_path='api-stats')
+    def api_stats(self, request, pk=None):
+        """Circuit breaker state and request/throttle/retry counters of this process for the cluster"""
+        cluster = self.get_object()
+        return Response({'cluster': cluster.pk, **policy_for(cluster.pk).stats()})
+    
+    @action(detail=True, methods=['get'])
+    def capacity(self, request, pk=None):
+        """Allocatable, requested and used resources by node role and namespace"""
+        return Response(cluster_capacity(self.get_object()))
+    
+    @action(detail=False, methods=['get'], url_path='capacity-summary')
+    def capacity_summary(self, request):
+        """Capacity totals for every cluster"""
+        return Response(fleet_capacity(self.get_queryset()))
+    
+    @action(detail=False, methods=['get'])
+    def inventory(self, request):
+        """Fleet-wide counts from the inventory summary.
+        
+        ?kind=pods&group_by=environment,status&environment=production
+        """
+        try:
+            return Response(query_inventory(request.query_params, self.get_queryset()))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    def _cluster_objects(self, request, queryset, serializer_class):
+        """Serialize a cluster's objects, paginated when a page is requested"""
+        if 'page' in request.query_params:
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(serializer_class(page, many=True).data)
+        return Response(serializer_class(queryset, many=True).data)
     
     @action(detail=True, methods=['get'])
     def nodes(self, request, pk=None):
         """Get nodes for a specific cluster"""
         cluster = self.get_object()
-        nodes = Node.objects.filter(cluster=cluster)
-        serializer = NodeSerializer(nodes, many=True)
-        return Response(serializer.data)
+        nodes = Node.objects.filter(cluster=cluster).select_related('cluster')
+        return self._cluster_objects(request, nodes, NodeSerializer)
+    
+    @action(detail=True, methods=['get'], url_path=r'nodes/(?P<node_name>[^/]+)/usage')
+    def node_usage(self, request, pk=None, node_name=None):
+        """Usage history of a node: ?from=&to=&step= (timestamps or ISO 8601, step like 5m)"""
+        return self._usage_history(request, 'node', node_name)
+    
+    @action(detail=True, methods=['get'], url_path=r'pods/(?P<namespace>[^/]+)/(?P<pod_name>[^/]+)/usage')
+    def pod_usage(self, request, pk=None, namespace=None, pod_name=None):
+        """Usage history of a pod: ?from=&to=&step="""
+        return self._usage_history(request, 'pod', f'{namespace}/{pod_name}')
+    
+    def _usage_history(self, request, kind, entity):
+        cluster = self.get_object()
+        try:
+            end = parse_timestamp(request.query_params.get('to'), timezone.now())
+            start = parse_timestamp(request.query_params.get('from'), end - timedelta(hours=1))
+            step = parse_step(request.query_params.get('step'))
+            return Response(usage_range(cluster, kind, entity, start, end, step))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=True, methods=['get'])
     def pods(self, request, pk=None):
         """Get pods for a specific cluster"""
         cluster = self.get_object()
-        pods = Pod.objects.filter(cluster=cluster)
-        serializer = PodSerializer(pods, many=True)
-        return Response(serializer.data)
+        pods = Pod.objects.filter(cluster=cluster).select_related('cluster')
+        return self._cluster_objects(request, pods, PodSerializer)
     
     @action(detail=True, methods=['get'])
     def deployments(self, request, pk=None):
         """Get deployments for a specific cluster"""
         cluster = self.get_object()
-        deployments = Deployment.objects.filter(cluster=cluster)
-        serializer = DeploymentSerializer(deployments, many=True)
-        return Response(serializer.data)
+        deployments = Deployment.objects.filter(cluster=cluster).select_related('cluster')
+        return self._cluster_objects(request, deployments, DeploymentSerializer)
+    
+    @action(detail=True, methods=['get'])
+    def workloads(self, request, pk=None):
+        """Pods, not-ready pods and restarts per workload of a cluster"""
+        cluster = self.get_object()
+        return Response(workload_rollup(Pod.objects.filter(cluster=cluster)))
+    
+    @action(detail=True, methods=['get'])
+    def services(self, request, pk=None):
+        """Get services for a specific cluster"""
+        cluster = self.get_object()
+        services = Service.objects.filter(cluster=cluster).select_related('cluster')
+        return self._cluster_objects(request, services, ServiceSerializer)
+
+
+class LabelSelectorMixin:
+    """Filter the list by a Kubernetes label selector: ?labelSelector=app=web,tier in (a,b),!canary"""
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        selector = self.request.query_params.get('labelSelector')
+        if selector:
+            try:
+                queryset = queryset.filter(selector_q(kind_for_model(queryset.model), selector))
+            except ValueError as e:
+                raise ValidationError({'labelSelector': str(e)})
+        return queryset
+
+
+class ChangesSinceMixin:
+    """Serve ``?cluster=<id>&since=<revision>`` lists as a delta of the synced objects.
+    
+    Revisions are counted per cluster, so the cursor is the pair of the two.
+    Returns the objects written after that revision, the tombstones of the ones
+    deleted since, and the revision to pass as ``since`` next time. A page
+    holds about ``limit`` (at most K8S_CHANGES_PAGE_SIZE) objects and
+    tombstones and always ends on a whole revision; ``more`` says whether
+    later revisions are left. Answers 410 when the tombstones of that range
+    were pruned, in which case the client has to list everything again.
+    
+    ``namespace`` scopes both objects and tombstones; ``labelSelector`` only
+    scopes the objects, as the labels of a deleted object are not kept, so
+    every deletion of the kind in scope is reported.
+    """
+    
+    def list(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        if since is None:
+            return super().list(request, *args, **kwargs)
+        try:
+            since = int(since)
+        except ValueError:
+            raise ValidationError({'since': 'Must be an integer revision'})
+        try:
+            cluster = int(request.query_params['cluster'])
+        except (KeyError, ValueError):
+            raise ValidationError({'cluster': 'since needs a cluster id: revisions are counted per cluster'})
+        page_size = getattr(settings, 'K8S_CHANGES_PAGE_SIZE', 1000)
+        try:
+            limit = min(int(request.query_params.get('limit', page_size)), page_size)
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer'})
+        if limit < 1:
+            raise ValidationError({'limit': 'Must be positive'})
+        
+        # Read first: every revision up to it is committed, see reserve_revision
+        revision = current_revision(cluster)
+        if since < pruned_through(cluster):
+            return Response({'error': 'Revision is too old, list again without since',
+                             'revision': revision}, status=status.HTTP_410_GONE)
+        
+        queryset = self.filter_queryset(self.get_queryset()).filter(cluster=cluster)
+        tombstones = Tombstone.objects.filter(cluster=cluster, kind=queryset.model._meta.model_name)
+        namespace = request.query_params.get('namespace')
+        if namespace and 'namespace' in self.filterset_fields:
+            queryset = queryset.filter(namespace=namespace)
+            tombstones = tombstones.filter(namespace=namespace)
+        
+        changed = queryset.filter(revision__gt=since, revision__lte=revision)
+        deleted = tombstones.filter(revision__gt=since, revision__lte=revision)
+        through = self.page_end(changed, deleted, limit, revision)
+        return Response({
+            'revision': through,
+            'more': through < revision,
+            'changed': self.get_serializer(
+                changed.filter(revision__lte=through).order_by('revision', 'pk'), many=True
+            ).data,
+            'deleted': list(deleted.filter(revision__lte=through).values('cluster', 'namespace', 'name', 'revision')),
+        })
+    
+    def page_end(self, changed, deleted, limit: int, revision: int) -> int:
+        """Last revision of the page: the most whole revisions whose rows fit in ``limit``, at least one.
+        
+        Every revision has a row, so ``limit + 1`` revisions per queryset are
+        enough to tell whether the rest fits.
+        """
+        counts = Counter()
+        for rows in (changed, deleted):
+            counts.update(dict(
+                rows.order_by('revision').values_list('revision').annotate(Count('pk', distinct=True))[:limit + 1]
+            ))
+        
+        total, through = 0, None
+        for page_revision in sorted(counts):
+            total += counts[page_revision]
+            if total > limit and through is not None:
+                return through
+            through = page_revision
+        return revision if total <= limit else through
 
 
-class NodeViewSet(viewsets.ModelViewSet):
+class NodeViewSet(ChangesSinceMixin, LabelSelectorMixin, viewsets.ModelViewSet):
     queryset = Node.objects.all()
     serializer_class = NodeSerializer
     permission_classes = [IsAuthenticated]
     filterset_fields = ['cluster', 'status', 'role']
 
 
-class PodViewSet(viewsets.ModelViewSet):
+class PodViewSet(ChangesSinceMixin, LabelSelectorMixin, viewsets.ModelViewSet):
     queryset = Pod.objects.all()
     serializer_class = PodSerializer
     permission_classes = [IsAuthenticated]
     filterset_fields = ['cluster', 'namespace', 'status']
 
 
-class DeploymentViewSet(viewsets.ModelViewSet):
+class DeploymentViewSet(ChangesSinceMixin, LabelSelectorMixin, viewsets.ModelViewSet):
     queryset = Deployment.objects.all()
     serializer_class = DeploymentSerializer
     permission_classes = [IsAuthenticated]
     filterset_fields = ['cluster', 'namespace']
+    
+    @action(detail=True, methods=['get'])
+    def pods(self, request, pk=None):
+        """Pods of a deployment, through its replica sets"""
+        deployment = self.get_object()
+        serializer = PodSerializer(deployment.pods.all(), many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def rollup(self, request, pk=None):
+        """Pods, not-ready pods and restarts of a deployment"""
+        deployment = self.get_object()
+        rows = workload_rollup(deployment.pods.all())
+        return Response(rows[0] if rows else {'pods': 0, 'not_ready': 0, 'restarts': 0})
+
+
+class ReplicaSetViewSet(ChangesSinceMixin, LabelSelectorMixin, viewsets.ModelViewSet):
+    queryset = ReplicaSet.objects.all()
+    serializer_class = ReplicaSetSerializer
+    permission_classes = [IsAuthenticated]
+    filterset_fields = ['cluster', 'namespace', 'deployment']
 
 
-class ServiceViewSet(viewsets.ModelViewSet):
+class ServiceViewSet(ChangesSinceMixin, LabelSelectorMixin, viewsets.ModelViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
     permission_classes = [IsAuthenticated]